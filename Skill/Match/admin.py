@@ -1,5 +1,7 @@
 # Register your models here.
 from django.contrib import admin
+from django.utils import timezone
+from .search import index_services
 from .models import (
     User,
     ServiceCategory,
@@ -7,7 +9,8 @@ from .models import (
     Service,
     ServiceRequest,
     Review,
-    CompanyDocument
+    CompanyDocument,
+    EmailOutbox
 )
 
 # =========================
@@ -91,6 +94,7 @@ class ServiceAdmin(admin.ModelAdmin):
 
     def mark_as_verified(self, request, queryset):
         queryset.update(is_verified=True)
+        index_services(queryset.values_list('pk', flat=True))
         self.message_user(request, f"{queryset.count()} service(s) marked as verified.")
     mark_as_verified.short_description = "Mark selected services as verified"
 
@@ -122,4 +126,22 @@ class ReviewAdmin(admin.ModelAdmin):
 
 @admin.register(CompanyDocument)
 class CompanyDocumentAdmin(admin.ModelAdmin):
-    list_display = ('document_name', 'service_provider', 'uploaded_at')
\ No newline at end of file
+    list_display = ('document_name', 'service_provider', 'uploaded_at')
+
+
+# =========================
+# EMAIL OUTBOX
+# =========================
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject', 'recipients')
+    readonly_fields = ('attempts', 'last_error', 'created_at', 'sent_at')
+    actions = ['retry_now']
+
+    def retry_now(self, request, queryset):
+        count = queryset.exclude(status='sent').update(status='pending', attempts=0, next_attempt_at=timezone.now())
+        self.message_user(request, f"{count} email(s) queued for another attempt.")
+    retry_now.short_description = "Retry selected emails now"
@@ -0,0 +1,60 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+# =========================
+# Versioned Dashboard Cache
+# =========================
+
+DASHBOARD_CACHE_ALIAS = getattr(settings, 'DASHBOARD_CACHE_ALIAS', 'default')
+DASHBOARD_CACHE_TIMEOUT = getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 300)
+
+
+def _cache():
+    return caches[DASHBOARD_CACHE_ALIAS]
+
+
+def _version_key(kind, pk):
+    return f"dashboard:{kind}:{pk}:version"
+
+
+def dashboard_version(kind, pk):
+    """
+    Current version of a provider or user dashboard. Versions start from
+    the clock so an evicted counter never revives an old entry.
+    """
+    return _cache().get_or_set(_version_key(kind, pk), lambda: int(time.time() * 1000), None)
+
+
+def bump_dashboard(kind, pk):
+    """
+    Invalidate a cached dashboard by moving it to a new version;
+    the stale entry simply expires.
+    """
+    if pk is None:
+        return
+
+    cache = _cache()
+    key = _version_key(kind, pk)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), None)
+
+
+def cached_dashboard(kind, pk, build):
+    """
+    Return the cached dashboard data for (kind, pk), calling build()
+    to compute and store it on a miss.
+    """
+    cache = _cache()
+    key = f"dashboard:{kind}:{pk}"
+    version = dashboard_version(kind, pk)
+
+    data = cache.get(key, version=version)
+    if data is None:
+        data = build()
+        cache.set(key, data, DASHBOARD_CACHE_TIMEOUT, version=version)
+
+    return data
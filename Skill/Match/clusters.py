@@ -0,0 +1,235 @@
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Avg, Count, ExpressionWrapper, F, IntegerField
+
+from .geo import MICRODEGREES
+from .models import ServiceProvider
+
+# =========================
+# Provider Map Clusters
+# =========================
+
+# A map tile at zoom z is 360 / 2**z degrees on each side (the width of a
+# 256 px slippy-map tile), split into CLUSTER_GRID x CLUSTER_GRID cells.
+# Providers are counted per cell in SQL; a cell holding fewer than
+# CLUSTER_MIN_SIZE providers is sent as individual markers instead.
+CLUSTER_GRID = getattr(settings, 'CLUSTER_GRID', 4)
+CLUSTER_MIN_SIZE = getattr(settings, 'CLUSTER_MIN_SIZE', 5)
+MAX_CLUSTER_ZOOM = getattr(settings, 'MAX_CLUSTER_ZOOM', 20)
+MAX_CLUSTER_TILES = getattr(settings, 'MAX_CLUSTER_TILES', 256)
+
+# Tiles are cached by zoom and position; the generation counter retires
+# every tile whenever a provider appears, moves or is switched off.
+CLUSTER_CACHE_ALIAS = getattr(settings, 'CLUSTER_CACHE_ALIAS', 'default')
+CLUSTER_CACHE_TIMEOUT = getattr(settings, 'CLUSTER_CACHE_TIMEOUT', 3600)
+
+GENERATION_KEY = 'map:generation'
+
+# Cells and tiles are counted from the south-west corner of the map
+LAT_OFFSET = 90 * MICRODEGREES
+LON_OFFSET = 180 * MICRODEGREES
+
+
+def _cluster_cache():
+    return caches[CLUSTER_CACHE_ALIAS]
+
+
+def map_generation():
+    return _cluster_cache().get_or_set(GENERATION_KEY, lambda: int(time.time() * 1000), None)
+
+
+def bump_map_generation():
+    cache = _cluster_cache()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, int(time.time() * 1000), None)
+
+
+def cell_size(zoom):
+    """
+    Edge of a cluster cell at a zoom level, in microdegrees.
+    """
+    return max(360 * MICRODEGREES // (2 ** zoom * CLUSTER_GRID), 1)
+
+
+# -------------------------
+# Viewport
+# -------------------------
+
+class Viewport:
+    """
+    The tiles covering a map viewport at a zoom level. Bounds are snapped
+    outward to whole tiles, so viewports that cover the same tiles share
+    cached data and an ETag.
+    """
+
+    def __init__(self, bbox, zoom):
+        try:
+            west, south, east, north = (float(value) for value in str(bbox).split(','))
+            zoom = int(zoom)
+        except (TypeError, ValueError):
+            raise ValueError("Expected bbox=west,south,east,north and an integer zoom.")
+        if not all(math.isfinite(value) for value in (west, south, east, north)) or south > north:
+            raise ValueError("Invalid bounding box.")
+
+        self.zoom = min(max(zoom, 0), MAX_CLUSTER_ZOOM)
+        self.cell = cell_size(self.zoom)
+        self.tile = self.cell * CLUSTER_GRID
+
+        south, north = max(south, -90), min(north, 90)
+        self.rows = (self._row(south), self._row(north))
+
+        # Leaflet reports longitudes past ±180 once the map is panned across
+        # the antimeridian; such viewports become two column ranges.
+        if east - west >= 360:
+            west, east = -180, 180
+        else:
+            west, east = (west + 180) % 360 - 180, (east + 180) % 360 - 180
+        if west <= east:
+            self.cols = [(self._col(west), self._col(east))]
+        else:
+            self.cols = [(self._col(west), self._col(180)), (self._col(-180), self._col(east))]
+
+        if len(self.tiles()) > MAX_CLUSTER_TILES:
+            raise ValueError("Viewport too large for this zoom level.")
+
+    def _row(self, lat):
+        return min((round(lat * MICRODEGREES) + LAT_OFFSET) // self.tile, (2 * LAT_OFFSET - 1) // self.tile)
+
+    def _col(self, lon):
+        return min((round(lon * MICRODEGREES) + LON_OFFSET) // self.tile, (2 * LON_OFFSET - 1) // self.tile)
+
+    def tiles(self):
+        return [
+            (row, col)
+            for first, last in self.cols
+            for col in range(first, last + 1)
+            for row in range(self.rows[0], self.rows[1] + 1)
+        ]
+
+    def etag(self):
+        cols = ';'.join(f'{first}-{last}' for first, last in self.cols)
+        spec = f"{map_generation()}:{self.zoom}:{self.rows[0]}-{self.rows[1]}:{cols}"
+        return hashlib.sha1(spec.encode()).hexdigest()
+
+
+# -------------------------
+# Clustering
+# -------------------------
+
+def located_providers():
+    return ServiceProvider.objects.filter(is_active=True, lat_e6__isnull=False, lon_e6__isnull=False)
+
+
+def _cell_expression(field, offset, cell):
+    return ExpressionWrapper((F(field) + offset) / cell, output_field=IntegerField())
+
+
+def _cluster_tiles(zoom, rows, cols):
+    """
+    Clusters and markers for every tile in a rectangle of tiles, as
+    {(row, col): {'clusters': [...], 'markers': [...]}}.
+
+    One grouped query counts and averages the providers of each cell;
+    a second fetches the providers of cells too small to cluster.
+    """
+    cell = cell_size(zoom)
+    tile = cell * CLUSTER_GRID
+    providers = located_providers().filter(
+        lat_e6__range=(rows[0] * tile - LAT_OFFSET, (rows[1] + 1) * tile - LAT_OFFSET - 1),
+        lon_e6__range=(cols[0] * tile - LON_OFFSET, (cols[1] + 1) * tile - LON_OFFSET - 1),
+    )
+
+    result = {
+        (row, col): {'clusters': [], 'markers': []}
+        for row in range(rows[0], rows[1] + 1)
+        for col in range(cols[0], cols[1] + 1)
+    }
+
+    cells = (
+        providers
+        .annotate(
+            cell_row=_cell_expression('lat_e6', LAT_OFFSET, cell),
+            cell_col=_cell_expression('lon_e6', LON_OFFSET, cell),
+        )
+        .values('cell_row', 'cell_col')
+        .annotate(count=Count('id'), lat_e6=Avg('lat_e6'), lon_e6=Avg('lon_e6'))
+        .order_by()
+    )
+
+    small = set()
+    for row in cells:
+        key = (row['cell_row'] // CLUSTER_GRID, row['cell_col'] // CLUSTER_GRID)
+        if row['count'] < CLUSTER_MIN_SIZE:
+            small.add((row['cell_row'], row['cell_col']))
+            continue
+        result[key]['clusters'].append({
+            'count': row['count'],
+            'lat': round(row['lat_e6'] / MICRODEGREES, 6),
+            'lon': round(row['lon_e6'] / MICRODEGREES, 6),
+        })
+
+    if small:
+        # Keyed cell numbers keep the filtering in SQL; the range above
+        # still limits the scan to the requested tiles.
+        width = (2 * LON_OFFSET) // cell + 1
+        markers = (
+            providers
+            .alias(cell_key=ExpressionWrapper(
+                _cell_expression('lat_e6', LAT_OFFSET, cell) * width + _cell_expression('lon_e6', LON_OFFSET, cell),
+                output_field=IntegerField(),
+            ))
+            .filter(cell_key__in=[row * width + col for row, col in small])
+            .order_by('pk')
+            .values_list('id', 'company_name', 'lat_e6', 'lon_e6')
+        )
+        for pk, name, lat_e6, lon_e6 in markers:
+            key = ((lat_e6 + LAT_OFFSET) // tile, (lon_e6 + LON_OFFSET) // tile)
+            result[key]['markers'].append({
+                'id': pk,
+                'name': name,
+                'lat': lat_e6 / MICRODEGREES,
+                'lon': lon_e6 / MICRODEGREES,
+            })
+
+    return result
+
+
+def _tile_key(generation, zoom, row, col):
+    return f"map:{generation}:{zoom}:{row}:{col}"
+
+
+def viewport_clusters(viewport):
+    """
+    Clusters and markers for a viewport, built from cached tiles. Missing
+    tiles are computed together, one rectangle per column range.
+    """
+    cache = _cluster_cache()
+    generation = map_generation()
+    zoom = viewport.zoom
+    keys = {tile: _tile_key(generation, zoom, *tile) for tile in viewport.tiles()}
+    found = cache.get_many(keys.values())
+    tiles = {tile: found[key] for tile, key in keys.items() if key in found}
+
+    for first, last in viewport.cols:
+        missing = [
+            (row, col) for row, col in keys
+            if first <= col <= last and (row, col) not in tiles
+        ]
+        if not missing:
+            continue
+        cols = (min(col for _, col in missing), max(col for _, col in missing))
+        computed = _cluster_tiles(zoom, viewport.rows, cols)
+        cache.set_many({keys[tile]: computed[tile] for tile in missing}, CLUSTER_CACHE_TIMEOUT)
+        tiles.update({tile: computed[tile] for tile in missing})
+
+    clusters, markers = [], []
+    for tile in keys:
+        clusters += tiles[tile]['clusters']
+        markers += tiles[tile]['markers']
+    return {'zoom': zoom, 'clusters': clusters, 'markers': markers}
@@ -0,0 +1,306 @@
+import math
+
+from django.db.models import ExpressionWrapper, F, FloatField, Func, Q, Value
+from django.db.models.functions import ASin, Greatest, Sqrt
+
+# =========================
+# Spatial Grid Index
+# =========================
+
+EARTH_RADIUS_KM = 6371
+
+# Size of one grid cell in degrees (~55 km of latitude).
+GRID_CELL_DEGREES = 0.5
+
+GRID_ROWS = int(math.ceil(180 / GRID_CELL_DEGREES))
+GRID_COLS = int(math.ceil(360 / GRID_CELL_DEGREES))
+
+# Above this many cells a radius query is cheaper as a plain scan.
+MAX_QUERY_CELLS = 2000
+
+
+def grid_cell(lat, lon):
+    """
+    Return the grid cell key ("row:col") containing a coordinate,
+    or an empty string when the coordinate is missing.
+    """
+    if lat is None or lon is None:
+        return ''
+
+    lat = min(max(float(lat), -90.0), 90.0)
+    lon = float(lon)
+
+    row = min(int((lat + 90) // GRID_CELL_DEGREES), GRID_ROWS - 1)
+    col = int(((lon + 180) % 360) // GRID_CELL_DEGREES) % GRID_COLS
+
+    return f"{row}:{col}"
+
+
+def _finite(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def parse_origin(lat, lon):
+    """
+    (lat, lon) as floats from request parameters, or None when either is
+    missing, not a finite number or off the globe.
+    """
+    lat, lon = _finite(lat), _finite(lon)
+    if lat is None or lon is None or abs(lat) > 90 or abs(lon) > 180:
+        return None
+    return lat, lon
+
+
+def parse_radius(value):
+    """
+    A search radius in km from a request parameter, or None when it is
+    missing, not a finite number or negative.
+    """
+    radius = _finite(value)
+    return radius if radius is not None and radius >= 0 else None
+
+
+def covering_cells(lat, lon, radius_km):
+    """
+    Return the set of grid cells that may contain points within
+    radius_km of (lat, lon), or None when the circle covers too much
+    of the globe for the index to help.
+
+    Circles touching a pole take every longitude in their latitude band,
+    and longitude ranges wrap across the antimeridian.
+    """
+    lat = float(lat)
+    lon = float(lon)
+
+    angular = radius_km / EARTH_RADIUS_KM
+    if angular >= math.pi:
+        return None
+
+    dlat = math.degrees(angular)
+    lat_min = lat - dlat
+    lat_max = lat + dlat
+
+    if lat_min <= -90 or lat_max >= 90:
+        # The circle contains a pole: all longitudes are reachable.
+        lon_span = None
+    else:
+        ratio = math.sin(angular) / math.cos(math.radians(lat))
+        lon_span = None if ratio >= 1 else math.degrees(math.asin(ratio))
+
+    row_min = int((max(lat_min, -90) + 90) // GRID_CELL_DEGREES)
+    row_max = min(int((min(lat_max, 90) + 90) // GRID_CELL_DEGREES), GRID_ROWS - 1)
+
+    if lon_span is None or lon_span >= 180:
+        cols = range(GRID_COLS)
+    else:
+        col_min = int(((lon - lon_span) + 180) // GRID_CELL_DEGREES)
+        col_max = int(((lon + lon_span) + 180) // GRID_CELL_DEGREES)
+        # Modulo folds columns past either side of the antimeridian.
+        cols = sorted({c % GRID_COLS for c in range(col_min, col_max + 1)})
+
+    if (row_max - row_min + 1) * len(cols) > MAX_QUERY_CELLS:
+        return None
+
+    return {
+        f"{row}:{col}"
+        for row in range(row_min, row_max + 1)
+        for col in cols
+    }
+
+
+# =========================
+# Coordinate Representation
+# =========================
+
+# ServiceProvider (floats) and ServiceRequest (decimals) both carry these
+# columns, derived on save: integer microdegrees for range filters, and
+# the sine and cosine of each coordinate so distances need no radians()
+MICRODEGREES = 1_000_000
+COORDINATE_FIELDS = ('lat_e6', 'lon_e6', 'sin_lat', 'cos_lat', 'sin_lon', 'cos_lon')
+
+
+def coordinate_values(lat, lon):
+    """
+    {field: value} for the derived coordinate columns of a point, all
+    None when either coordinate is missing.
+    """
+    if lat is None or lon is None:
+        return dict.fromkeys(COORDINATE_FIELDS)
+
+    lat_e6 = round(float(lat) * MICRODEGREES)
+    lon_e6 = round(float(lon) * MICRODEGREES)
+    lat_r = math.radians(lat_e6 / MICRODEGREES)
+    lon_r = math.radians(lon_e6 / MICRODEGREES)
+    return {
+        'lat_e6': lat_e6,
+        'lon_e6': lon_e6,
+        'sin_lat': math.sin(lat_r),
+        'cos_lat': math.cos(lat_r),
+        'sin_lon': math.sin(lon_r),
+        'cos_lon': math.cos(lon_r),
+    }
+
+
+def trig_of(lat, lon):
+    """
+    (sin_lat, cos_lat, sin_lon, cos_lon) of a point, as utils.trig_distance
+    expects.
+    """
+    values = coordinate_values(lat, lon)
+    return values['sin_lat'], values['cos_lat'], values['sin_lon'], values['cos_lon']
+
+
+# =========================
+# SQL-Side Bounding Box & Distance
+# =========================
+
+def bounding_box(lat, lon, radius_km):
+    """
+    (lat_min, lat_max, lon_ranges) enclosing every point within radius_km
+    of (lat, lon), or None when the circle reaches too far to bound.
+
+    lon_ranges is a list of (min, max) pairs (two when the box crosses the
+    antimeridian) or None when every longitude is in reach.
+    """
+    lat = float(lat)
+    lon = float(lon)
+
+    angular = radius_km / EARTH_RADIUS_KM
+    if angular >= math.pi:
+        return None
+
+    dlat = math.degrees(angular)
+    lat_min = lat - dlat
+    lat_max = lat + dlat
+
+    if lat_min <= -90 or lat_max >= 90:
+        return max(lat_min, -90.0), min(lat_max, 90.0), None
+
+    ratio = math.sin(angular) / math.cos(math.radians(lat))
+    if ratio >= 1:
+        return lat_min, lat_max, None
+
+    dlon = math.degrees(math.asin(ratio))
+    lon_min = lon - dlon
+    lon_max = lon + dlon
+    if lon_min < -180:
+        return lat_min, lat_max, [(lon_min + 360, 180.0), (-180.0, lon_max)]
+    if lon_max > 180:
+        return lat_min, lat_max, [(lon_min, 180.0), (-180.0, lon_max - 360)]
+    return lat_min, lat_max, [(lon_min, lon_max)]
+
+
+def _e6_range(low, high):
+    # Rounded outwards, so points on the box edge stay inside
+    return math.floor(low * MICRODEGREES), math.ceil(high * MICRODEGREES)
+
+
+def bbox_q(lat, lon, radius_km, prefix=''):
+    """
+    Q restricting rows to the bounding box of the circle on the integer
+    microdegree columns, so the query can seek on the (lat_e6, lon_e6)
+    index before any distance is computed.
+    """
+    box = bounding_box(lat, lon, radius_km)
+    if box is None:
+        return Q(**{f'{prefix}lat_e6__isnull': False})
+
+    lat_min, lat_max, lon_ranges = box
+    q = Q(**{f'{prefix}lat_e6__range': _e6_range(lat_min, lat_max)})
+    if lon_ranges is None:
+        return q
+
+    lons = Q()
+    for lon_min, lon_max in lon_ranges:
+        lons |= Q(**{f'{prefix}lon_e6__range': _e6_range(lon_min, lon_max)})
+    return q & lons
+
+
+def _dot(lat, lon, prefix):
+    """
+    Dot product of the rows' unit vectors with the origin's, from the
+    stored trig columns: four multiplies and two adds per row, all native
+    SQL arithmetic. Larger is nearer.
+    """
+    sin_lat, cos_lat, sin_lon, cos_lon = trig_of(lat, lon)
+    return ExpressionWrapper(
+        F(f'{prefix}sin_lat') * Value(sin_lat)
+        + F(f'{prefix}cos_lat') * (
+            F(f'{prefix}cos_lon') * Value(cos_lat * cos_lon) + F(f'{prefix}sin_lon') * Value(cos_lat * sin_lon)
+        ),
+        output_field=FloatField(),
+    )
+
+
+def sql_arc_km(dot):
+    if dot is None:
+        return None
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(max((1 - dot) / 2, 0.0), 1.0)))
+
+
+def register_sqlite_functions(connection):
+    """
+    Make arc_km() callable from SQL on a new SQLite connection.
+    Deterministic, so SQLite may reuse results within a statement.
+    """
+    connection.connection.create_function('arc_km', 1, sql_arc_km, deterministic=True)
+
+
+class ArcKm(Func):
+    """
+    Great-circle distance in km for a unit-vector dot product (see _dot).
+
+    SQLite calls the registered arc_km() function; other databases
+    evaluate the same formula with their own trig functions.
+    """
+    function = 'arc_km'
+    arity = 1
+    output_field = FloatField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        dot, = self.get_source_expressions()
+        half_chord = Greatest(Value(0.0), (Value(1.0) - dot) / Value(2.0))
+        expression = Value(2.0 * EARTH_RADIUS_KM) * ASin(Sqrt(half_chord))
+        return compiler.compile(expression.resolve_expression(compiler.query))
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, **extra_context)
+
+
+def within_queryset(queryset, lat, lon, radius_km, prefix='provider__'):
+    """
+    Rows within radius_km of (lat, lon), annotated with distance and
+    ordered nearest first, entirely in SQL: a bounding-box prefilter on
+    the microdegree columns, then a dot-product test on the trig columns.
+    prefix reaches the located model ('provider__' from a Service, '' on
+    ServiceProvider or ServiceRequest).
+    """
+    threshold = math.cos(min(radius_km / EARTH_RADIUS_KM, math.pi))
+    return (
+        queryset
+        .filter(bbox_q(lat, lon, radius_km, prefix))
+        .alias(dot=_dot(lat, lon, prefix))
+        .filter(dot__gte=threshold)
+        .annotate(distance=ArcKm(F('dot')))
+        .order_by('-dot', 'pk')
+    )
+
+
+def nearest_queryset(queryset, lat, lon, k, prefix='provider__', start_radius_km=25):
+    """
+    within_queryset() for a radius holding at least k rows (or the whole
+    globe); slice it to [:k] for the k nearest. The radius doubles until
+    a LIMIT k count inside it comes back full.
+    """
+    radius = start_radius_km
+    max_radius = math.pi * EARTH_RADIUS_KM
+
+    while True:
+        rows = within_queryset(queryset, lat, lon, radius, prefix)
+        if radius >= max_radius or rows.order_by()[:k].count() >= k:
+            return rows
+        radius = min(radius * 2, max_radius)
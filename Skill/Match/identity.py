@@ -0,0 +1,106 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from .models import ServiceProvider
+
+# =========================
+# Cached Identity Lookups
+# =========================
+
+IDENTITY_CACHE_ALIAS = getattr(settings, 'IDENTITY_CACHE_ALIAS', 'default')
+IDENTITY_CACHE_TIMEOUT = getattr(settings, 'IDENTITY_CACHE_TIMEOUT', 300)
+
+# Session users and provider rows are only cached where every worker sees
+# the same cache: invalidation in one process cannot reach another's
+# LocMemCache, which would keep a changed password or a deactivated user
+# logged in there, and hand views provider rows that predate other
+# workers' saves and rating updates. None decides from the cache backend.
+# The short timeout bounds staleness from queryset .update() calls, which
+# skip invalidation.
+IDENTITY_CACHE_USERS = getattr(settings, 'IDENTITY_CACHE_USERS', None)
+IDENTITY_USER_CACHE_TIMEOUT = getattr(settings, 'IDENTITY_USER_CACHE_TIMEOUT', 60)
+
+# Cached in place of a provider pk for users without a profile
+NO_PROVIDER = 0
+
+
+def _cache():
+    return caches[IDENTITY_CACHE_ALIAS]
+
+
+def caches_users():
+    if IDENTITY_CACHE_USERS is not None:
+        return IDENTITY_CACHE_USERS
+    return not isinstance(_cache(), LocMemCache)
+
+
+def _user_key(user_id):
+    return f"identity:user:{user_id}"
+
+
+def _provider_of_key(user_id):
+    return f"identity:provider_of:{user_id}"
+
+
+def _provider_key(provider_id):
+    return f"identity:provider:{provider_id}"
+
+
+def invalidate_user(user_id):
+    _cache().delete_many([_user_key(user_id), _provider_of_key(user_id)])
+
+
+def invalidate_providers(provider_ids):
+    _cache().delete_many([_provider_key(provider_id) for provider_id in provider_ids])
+
+
+def get_provider(user):
+    """
+    The user's ServiceProvider (or None). With a shared cache the user ->
+    provider link and the provider row are cached separately, so rating
+    updates, which only know the provider id, can invalidate the row.
+    """
+    if user is None or not user.is_authenticated:
+        return None
+
+    if not caches_users():
+        return ServiceProvider.objects.filter(user_id=user.pk).first()
+
+    cache = _cache()
+    provider_id = cache.get(_provider_of_key(user.pk))
+    if provider_id == NO_PROVIDER:
+        return None
+
+    provider = cache.get(_provider_key(provider_id)) if provider_id is not None else None
+    if provider is None:
+        provider = ServiceProvider.objects.filter(user_id=user.pk).first()
+        cache.set(_provider_of_key(user.pk), provider.pk if provider else NO_PROVIDER, IDENTITY_CACHE_TIMEOUT)
+        if provider is not None:
+            cache.set(_provider_key(provider.pk), provider, IDENTITY_CACHE_TIMEOUT)
+
+    return provider
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend that serves the per-request session user from a shared
+    cache (see IDENTITY_CACHE_USERS). Saving or deleting the user
+    invalidates the entry, so password changes still end other sessions.
+    """
+
+    def get_user(self, user_id):
+        if not caches_users():
+            return super().get_user(user_id)
+
+        cache = _cache()
+        key = _user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(key, user, IDENTITY_USER_CACHE_TIMEOUT)
+
+        return user if self.user_can_authenticate(user) else None
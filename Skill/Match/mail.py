@@ -0,0 +1,152 @@
+import smtplib
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.mail.backends import smtp
+
+# =========================
+# Pooled SMTP Email Backend
+# =========================
+
+# Authenticated connections kept open per (host, port, user, tls, ssl)
+EMAIL_POOL_SIZE = getattr(settings, 'EMAIL_POOL_SIZE', 4)
+
+# Idle connections older than this are checked with NOOP before reuse,
+# and dropped after EMAIL_POOL_MAX_IDLE (servers close them anyway).
+EMAIL_POOL_CHECK_AFTER = getattr(settings, 'EMAIL_POOL_CHECK_AFTER', 15)
+EMAIL_POOL_MAX_IDLE = getattr(settings, 'EMAIL_POOL_MAX_IDLE', 120)
+
+_pool = {}
+_pool_lock = threading.Lock()
+_stats = Counter()
+
+
+def pool_stats():
+    """
+    Connection reuse counters for the pooled backend: connections opened,
+    reused, reconnected after a failure, discarded as stale, and messages
+    and batches sent. Also reports how many connections sit idle.
+    """
+    with _pool_lock:
+        stats = dict(_stats)
+        stats['idle'] = sum(len(idle) for idle in _pool.values())
+
+    for key in ('opened', 'reused', 'reconnected', 'discarded', 'sent', 'batches', 'idle'):
+        stats.setdefault(key, 0)
+
+    return stats
+
+
+def reset_pool():
+    """
+    Close every idle connection and zero the counters.
+    """
+    with _pool_lock:
+        idle = [connection for connections in _pool.values() for connection, _ in connections]
+        _pool.clear()
+        _stats.clear()
+
+    for connection in idle:
+        _quietly_close(connection)
+
+
+def _quietly_close(connection):
+    try:
+        connection.quit()
+    except (smtplib.SMTPException, OSError):
+        connection.close()
+
+
+def _record(key, amount=1):
+    with _pool_lock:
+        _stats[key] += amount
+
+
+class PooledEmailBackend(smtp.EmailBackend):
+    """
+    SMTP backend that hands connections back to a process-wide pool on
+    close() instead of quitting, so later messages skip the TCP, TLS and
+    login round-trips. Dead connections are replaced transparently.
+    """
+
+    def _pool_key(self):
+        return (self.host, self.port, self.username, self.use_tls, self.use_ssl)
+
+    def open(self):
+        if self.connection:
+            return False
+
+        key = self._pool_key()
+        while True:
+            with _pool_lock:
+                idle = _pool.get(key)
+                connection, released_at = idle.pop() if idle else (None, None)
+
+            if connection is None:
+                break
+
+            idle_for = time.monotonic() - released_at
+            if idle_for > EMAIL_POOL_MAX_IDLE or (idle_for > EMAIL_POOL_CHECK_AFTER and not self._alive(connection)):
+                _quietly_close(connection)
+                _record('discarded')
+                continue
+
+            self.connection = connection
+            _record('reused')
+            return True
+
+        opened = super().open()
+        if opened:
+            _record('opened')
+        return opened
+
+    def close(self):
+        if self.connection is None:
+            return super().close()
+
+        key = self._pool_key()
+        with _pool_lock:
+            idle = _pool.setdefault(key, [])
+            if len(idle) < EMAIL_POOL_SIZE:
+                idle.append((self.connection, time.monotonic()))
+                self.connection = None
+                return
+
+        super().close()
+
+    def send_messages(self, email_messages):
+        if not email_messages:
+            return 0
+
+        sent = super().send_messages(email_messages)
+        _record('batches')
+        _record('sent', sent)
+        return sent
+
+    def _send(self, email_message):
+        try:
+            return super()._send(email_message)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # The server dropped a (possibly pooled) connection: reconnect
+            # once and resend this message.
+            self._discard()
+            if not smtp.EmailBackend.open(self):
+                raise
+            _record('opened')
+            _record('reconnected')
+            return super()._send(email_message)
+
+    def _discard(self):
+        connection, self.connection = self.connection, None
+        if connection is not None:
+            _quietly_close(connection)
+            _record('discarded')
+
+    @staticmethod
+    def _alive(connection):
+        try:
+            return connection.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
@@ -0,0 +1,154 @@
+import json
+import math
+import platform
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from Match.models import Service, ServiceProvider, ServiceRequest, User
+
+
+class Rollback(Exception):
+    pass
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the hot views (search, dashboards, provider requests, create_request, submit_review) "
+        "against the current database and report p50/p95 latency and query counts as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--output', help="Write the JSON report to this file.")
+        parser.add_argument('--compare', help="Earlier JSON report to compare against.")
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help="Clear the cache before every request so cached views are measured uncached."
+        )
+
+    def handle(self, *args, **options):
+        provider = (
+            ServiceProvider.objects.filter(profile_completed=True)
+            .annotate(load=Count('services__requests'))
+            .order_by('-load')
+            .first()
+        )
+        seeker = User.objects.filter(role='user').annotate(load=Count('requests')).order_by('-load').first()
+        if provider is None or seeker is None:
+            raise CommandError("No data to benchmark; run 'manage.py seed_marketplace' first.")
+
+        service = Service.objects.filter(is_active=True, is_verified=True).first()
+        reviewable = ServiceRequest.objects.filter(user=seeker, status='completed', review=None).first()
+
+        provider_client = Client(SERVER_NAME='localhost')
+        provider_client.force_login(provider.user)
+        seeker_client = Client(SERVER_NAME='localhost')
+        seeker_client.force_login(seeker)
+
+        cases = [
+            ('search_services (text)', seeker_client, 'get', reverse('search_services'), {'q': 'repairs'}),
+            ('search_services (nearest)', seeker_client, 'get', reverse('search_services'),
+             {'lat': '-1.2864', 'lon': '36.8172'}),
+            ('search_services (radius 10km)', seeker_client, 'get', reverse('search_services'),
+             {'lat': '-1.2864', 'lon': '36.8172', 'radius': '10'}),
+            ('provider_dashboard', provider_client, 'get', reverse('provider_dashboard'), {}),
+            ('user_dashboard', seeker_client, 'get', reverse('user_dashboard'), {}),
+            ('provider_requests', provider_client, 'get', reverse('provider_requests'), {}),
+        ]
+        if service is not None:
+            cases.append(('create_request', seeker_client, 'post', reverse('create_request', args=[service.pk]),
+                          {'location': 'Nairobi', 'description': 'Benchmark', 'latitude': '-1.28', 'longitude': '36.82'}))
+        if reviewable is not None:
+            cases.append(('submit_review', seeker_client, 'post', reverse('submit_review', args=[reviewable.pk]),
+                          {'rating': 4, 'comment': 'Benchmark'}))
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'database': {
+                'vendor': connection.vendor,
+                'services': Service.objects.count(),
+                'requests': ServiceRequest.objects.count(),
+                'provider_requests': provider.load,
+            },
+            'iterations': options['iterations'],
+            'cold_cache': options['cold'],
+            'views': {},
+        }
+
+        for name, client, method, url, data in cases:
+            timings, queries = [], []
+            for i in range(options['warmup'] + options['iterations']):
+                if options['cold']:
+                    cache.clear()
+                elapsed, count, status = self.measure(client, method, url, data)
+                if status >= 400:
+                    raise CommandError(f"{name} returned HTTP {status}")
+                if i >= options['warmup']:
+                    timings.append(elapsed)
+                    queries.append(count)
+
+            report['views'][name] = {
+                'p50_ms': round(percentile(timings, 50) * 1000, 2),
+                'p95_ms': round(percentile(timings, 95) * 1000, 2),
+                'mean_ms': round(statistics.fmean(timings) * 1000, 2),
+                'queries': max(queries),
+            }
+
+        self.print_report(report, self.load(options['compare']))
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+
+    def measure(self, client, method, url, data):
+        """
+        Time one request. Writes are rolled back so every iteration sees
+        the same database.
+        """
+        result = {}
+        try:
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    response = getattr(client, method)(url, data)
+                    result['elapsed'] = time.perf_counter() - start
+                result['queries'] = len(captured)
+                result['status'] = response.status_code
+                raise Rollback
+        except Rollback:
+            pass
+        return result['elapsed'], result['queries'], result['status']
+
+    def load(self, path):
+        if not path:
+            return None
+        with open(path) as fh:
+            return json.load(fh)
+
+    def print_report(self, report, baseline):
+        self.stdout.write(f"{'view':<32} {'p50 ms':>9} {'p95 ms':>9} {'queries':>8}" + ("  vs baseline p50" if baseline else ""))
+        for name, row in report['views'].items():
+            line = f"{name:<32} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['queries']:>8}"
+            before = (baseline or {}).get('views', {}).get(name)
+            if before:
+                change = (row['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0
+                line += f"  {change:+.0f}% ({before['p50_ms']:.2f} ms, {before['queries']} queries)"
+            self.stdout.write(line)
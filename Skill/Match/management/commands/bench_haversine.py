@@ -0,0 +1,75 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Match import geo, utils
+
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmark the scalar haversine loop against the batch NumPy engine and the "
+        "precomputed-trig engine used on stored coordinates."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            type=int,
+            default=[1_000, 100_000, 1_000_000],
+            help="Number of provider coordinates per run."
+        )
+        parser.add_argument('--repeat', type=int, default=3, help="Runs per size (best is kept).")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if utils.np is None:
+            raise CommandError("NumPy is not installed; the batch engine is running in fallback mode.")
+
+        rng = random.Random(options['seed'])
+        origin = (-1.286389, 36.817223)
+
+        self.stdout.write(
+            f"{'points':>10} {'scalar (s)':>12} {'batch (s)':>12} {'speedup':>9} {'max err (km)':>14} "
+            f"{'trig (s)':>10} {'vs batch':>9} {'trig err (km)':>14}"
+        )
+
+        for size in options['sizes']:
+            lats = [rng.uniform(-90, 90) for _ in range(size)]
+            lons = [rng.uniform(-180, 180) for _ in range(size)]
+
+            scalar_time, scalar = self._best(options['repeat'], lambda: [
+                utils.haversine_distance(origin[0], origin[1], lat, lon)
+                for lat, lon in zip(lats, lons)
+            ])
+            # Both engines get prebuilt arrays so neither pays for conversion
+            lat_array, lon_array = utils.np.asarray(lats), utils.np.asarray(lons)
+            batch_time, batch = self._best(options['repeat'], lambda: utils.haversine_distances(
+                origin[0], origin[1], lat_array, lon_array
+            ))
+
+            # Trig columns are computed once, on save, so they are not timed
+            columns = [utils.np.asarray(c) for c in zip(*(geo.trig_of(lat, lon) for lat, lon in zip(lats, lons)))]
+            trig_time, trig = self._best(options['repeat'], lambda: utils.trig_distances(
+                geo.trig_of(*origin), *columns
+            ))
+
+            max_error = float(utils.np.max(utils.np.abs(batch - utils.np.asarray(scalar))))
+            trig_error = float(utils.np.max(utils.np.abs(trig - batch)))
+
+            self.stdout.write(
+                f"{size:>10} {scalar_time:>12.4f} {batch_time:>12.4f} "
+                f"{scalar_time / batch_time:>8.1f}x {max_error:>14.2e} "
+                f"{trig_time:>10.4f} {batch_time / trig_time:>8.1f}x {trig_error:>14.2e}"
+            )
+
+    def _best(self, repeat, func):
+        best = None
+        result = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
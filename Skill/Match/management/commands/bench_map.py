@@ -0,0 +1,103 @@
+import gzip
+import json
+import random
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from Match import clusters, slowlog
+from Match.management.commands.seed_marketplace import Seeder
+
+
+class Rollback(Exception):
+    pass
+
+
+# name: (bbox, zoom) -- a whole-country view, a city and a neighbourhood
+VIEWPORTS = {
+    'country z7': ('33.5,-5,42,5', 7),
+    'city z11': ('36.6,-1.45,37.05,-1.1', 11),
+    'street z15': ('36.80,-1.30,36.84,-1.27', 15),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Time clustered provider map responses against sending every provider coordinate, on "
+        "synthetic provider tables. Rows are created inside a transaction and rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--providers', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--chunk-size', type=int, default=10_000)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.rng = random.Random(options['seed'])
+
+        self.stdout.write(f"{'providers':>9} {'variant':<22} {'ms':>9} {'gzip KiB':>9} {'items':>7}")
+        for count in options['providers']:
+            try:
+                with transaction.atomic():
+                    started = time.perf_counter()
+                    self.seed(count)
+                    clusters.bump_map_generation()
+                    self.stdout.write(f"# seeded {count} providers in {time.perf_counter() - started:.1f}s")
+                    self.run(count)
+                    raise Rollback
+            except Rollback:
+                pass
+            # Tiles cached during the run refer to rolled-back rows
+            clusters.bump_map_generation()
+
+    def run(self, count):
+        variants = []
+        for name, (bbox, zoom) in VIEWPORTS.items():
+            viewport = clusters.Viewport(bbox, zoom)
+            variants.append((f'{name} cold', lambda v=viewport: clusters.viewport_clusters(v), True))
+            variants.append((f'{name} warm', lambda v=viewport: clusters.viewport_clusters(v), False))
+        variants.append(('every coordinate', self.everything, True))
+
+        for variant, func, cold in variants:
+            timings = []
+            for _ in range(self.options['repeat']):
+                if cold:
+                    cache.clear()
+                else:
+                    func()
+                start = time.perf_counter()
+                data = func()
+                body = json.dumps(data).encode()
+                timings.append(time.perf_counter() - start)
+
+            items = len(data['clusters']) + len(data['markers']) if isinstance(data, dict) else len(data)
+            self.stdout.write(
+                f"{count:>9} {variant:<22} {statistics.median(timings) * 1000:>9.2f} "
+                f"{len(gzip.compress(body)) / 1024:>9.1f} {items:>7}"
+            )
+
+        queryset = clusters.located_providers().filter(lat_e6__range=(-5_000_000, 5_000_000))
+        sql, params = queryset.values('lat_e6').query.sql_with_params()
+        for line in slowlog.explain(sql, params):
+            self.stdout.write(f"  plan: {line}")
+
+    def everything(self):
+        """
+        The naive map: every located provider sent to the browser.
+        """
+        return [
+            {'id': pk, 'name': name, 'lat': lat, 'lon': lon}
+            for pk, name, lat, lon in clusters.located_providers().values_list(
+                'id', 'company_name', 'latitude', 'longitude'
+            )
+        ]
+
+    def seed(self, count):
+        seeder = Seeder(self.rng, f"benchmap{int(time.time())}", self.options['chunk_size'])
+        for _ in seeder.provider_batches(count):
+            pass
@@ -0,0 +1,96 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from Match import matching
+from Match.management.commands.seed_marketplace import TOWNS, Seeder
+from Match.models import ServiceRequest
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Time match_request end to end (candidate loading with each provider's open workload, then the "
+        "bounded-heap ranking) on a synthetic marketplace. Rows are created inside a transaction and rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--providers', type=int, nargs='+', default=[100_000])
+        parser.add_argument('--services-per-provider', type=int, default=1)
+        parser.add_argument('--requests-per-provider', type=float, default=2,
+                            help="Seeded requests, some of them open, that make up provider workloads.")
+        parser.add_argument('--k', type=int, default=10)
+        parser.add_argument('--radius', type=float, default=25)
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--chunk-size', type=int, default=10_000)
+        parser.add_argument('--seed', type=int, default=7)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.rng = random.Random(options['seed'])
+
+        self.stdout.write(f"{'providers':>9} {'variant':<22} {'ms':>9} {'rows':>7}")
+        for count in options['providers']:
+            try:
+                with transaction.atomic():
+                    started = time.perf_counter()
+                    service_request = self.seed(count)
+                    self.stdout.write(f"# seeded {count} providers in {time.perf_counter() - started:.1f}s")
+                    self.run(count, service_request)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def run(self, count, service_request):
+        k = self.options['k']
+        radius = self.options['radius']
+        origin = (float(service_request.latitude), float(service_request.longitude))
+        category_id = service_request.service.category_id
+        loaded = matching.candidates()
+
+        variants = [
+            ('match_request', lambda: matching.match_request(service_request, k=k)),
+            (f'match_request {radius:g} km', lambda: matching.match_request(service_request, k=k, radius_km=radius)),
+            ('candidates()', matching.candidates),
+            ('rank, bounded heap', lambda: matching.rank(loaded, category_id, origin, k=k)),
+            ('rank, full sort', lambda: matching.rank(loaded, category_id, origin, k=len(loaded))),
+        ]
+        results = {}
+        for variant, func in variants:
+            timings = []
+            for _ in range(self.options['repeat']):
+                start = time.perf_counter()
+                results[variant] = func()
+                timings.append(time.perf_counter() - start)
+            self.stdout.write(
+                f"{count:>9} {variant:<22} {statistics.median(timings) * 1000:>9.2f} {len(results[variant]):>7}"
+            )
+
+        top = results['match_request']
+        assert [r.service_id for r in top] == [r.service_id for r in results['rank, full sort'][:k]]
+        self.stdout.write(f"  best match: service {top[0].service_id} score {top[0].score:.3f} at {top[0].distance:.2f} km")
+
+    def seed(self, count):
+        seeder = Seeder(self.rng, f"benchmatch{int(time.time())}", self.options['chunk_size'])
+        categories = seeder.seed_categories()
+        services = []
+        for providers in seeder.provider_batches(count):
+            services += seeder.seed_services(providers, categories, self.options['services_per_provider'], listed_rate=1)
+
+        seekers = seeder.seed_users(100, 'user')
+        requests = round(count * self.options['requests_per_provider'])
+        for _ in seeder.request_batches(seekers, services, requests, days=30):
+            pass
+
+        # The request being matched: a pin in the busiest town
+        _, lat, lon, _ = TOWNS[0]
+        return ServiceRequest.objects.create(
+            user=seekers[0], service=services[0], category_id=services[0].category_id,
+            latitude=round(lat, 6), longitude=round(lon, 6), location='Benchmark',
+        )
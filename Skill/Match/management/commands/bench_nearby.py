@@ -0,0 +1,102 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from Match import nearby, slowlog
+from Match.management.commands.seed_marketplace import Seeder, manual_timestamps
+from Match.models import Service, ServiceProvider, ServiceRequest, User
+from Match.utils import haversine_distances
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the provider nearby-requests feed against scanning every open request in the provider's "
+        "categories, on synthetic request tables. Rows are created inside a transaction and rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+        parser.add_argument('--radius', type=float, default=nearby.NEARBY_RADIUS_KM)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--chunk-size', type=int, default=10_000)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.rng = random.Random(options['seed'])
+
+        services = list(Service.objects.filter(is_active=True).only('id', 'category_id', 'provider_id'))
+        provider = ServiceProvider.objects.filter(latitude__isnull=False, services__is_active=True).first()
+        seeker = User.objects.filter(role='user').first()
+        if not services or provider is None or seeker is None:
+            raise CommandError("Needs users and located providers with services; run 'manage.py seed_marketplace'.")
+
+        categories = nearby.provider_categories(provider)
+        self.stdout.write(
+            f"provider {provider.pk} at ({provider.latitude:.3f}, {provider.longitude:.3f}), "
+            f"{len(categories)} categories, radius {options['radius']:g} km"
+        )
+        self.stdout.write(f"{'requests':>9} {'variant':<22} {'ms':>9} {'rows':>6}")
+
+        for count in options['requests']:
+            try:
+                with transaction.atomic():
+                    started = time.perf_counter()
+                    self.seed(count, seeker, services)
+                    self.stdout.write(f"# seeded {count} requests in {time.perf_counter() - started:.1f}s")
+                    self.run(count, provider, categories)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def run(self, count, provider, categories):
+        radius = self.options['radius']
+        variants = [
+            ('feed, nearest p1', lambda: nearby.nearby_page(provider, radius, 'distance').results),
+            ('feed, nearest p5', lambda: nearby.nearby_page(provider, radius, 'distance', page=5).results),
+            ('feed, newest p1', lambda: nearby.nearby_page(provider, radius, 'recent').results),
+            ('scan category + sort', lambda: self.scan(provider, categories, radius)),
+        ]
+        for variant, func in variants:
+            timings = []
+            for _ in range(self.options['repeat']):
+                start = time.perf_counter()
+                rows = func()
+                timings.append(time.perf_counter() - start)
+            self.stdout.write(f"{count:>9} {variant:<22} {statistics.median(timings) * 1000:>9.2f} {len(rows):>6}")
+
+        queryset = nearby.open_requests_near(provider.latitude, provider.longitude, categories, radius, provider)
+        sql, params = queryset.query.sql_with_params()
+        for line in slowlog.explain(sql, params):
+            self.stdout.write(f"  plan: {line}")
+
+    def scan(self, provider, categories, radius):
+        """
+        Without the feed's index: every open request in the categories,
+        distances in Python, then a full sort.
+        """
+        rows = list(
+            ServiceRequest.objects.filter(status='pending', service__category__in=categories)
+            .exclude(latitude=None).values_list('id', 'latitude', 'longitude', 'created_at')
+        )
+        if not rows:
+            return []
+        distances = haversine_distances(
+            provider.latitude, provider.longitude, [row[1] for row in rows], [row[2] for row in rows]
+        )
+        found = [(float(distance), row) for distance, row in zip(distances, rows) if distance <= radius]
+        found.sort(key=lambda item: item[0])
+        return found[:nearby.NEARBY_PAGE_SIZE]
+
+    def seed(self, count, seeker, services):
+        seeder = Seeder(self.rng, 'benchnearby', self.options['chunk_size'])
+        with manual_timestamps(ServiceRequest):
+            for _ in seeder.request_batches([seeker], services, count, days=30):
+                pass
@@ -0,0 +1,129 @@
+import math
+import random
+import statistics
+import time
+import tracemalloc
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from Match import search
+from Match.management.commands.seed_marketplace import TOWNS, Seeder
+from Match.models import Service
+from Match.utils import haversine_distances
+
+SERVICES_PER_PROVIDER = 10
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Time paged top-k search against the old load-everything-and-sort approach on synthetic "
+        "catalogues of each size. Catalogues are created inside a transaction and rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+        parser.add_argument('--page-size', type=int, default=search.SEARCH_PAGE_SIZE)
+        parser.add_argument('--deep-page', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--full-sort-max', type=int, default=100000,
+                            help="Skip the full-sort baseline above this catalogue size.")
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        origin = TOWNS[0][1:3]
+
+        self.stdout.write(f"{'services':>9} {'search':<9} {'variant':<14} {'ms':>9} {'peak KiB':>10} {'rows':>6}")
+        for size in options['sizes']:
+            try:
+                with transaction.atomic():
+                    started = time.perf_counter()
+                    self.seed(size)
+                    self.stdout.write(f"# seeded {size} services in {time.perf_counter() - started:.1f}s")
+                    for name, kwargs in (
+                        ('text', {'query': 'plumbing'}),
+                        ('nearest', {'origin': origin}),
+                        ('10 km', {'origin': origin, 'max_distance': 10}),
+                    ):
+                        self.run(size, name, kwargs)
+                    raise Rollback
+            except Rollback:
+                pass
+            # Entries cached during the run refer to rolled-back rows
+            search.bump_search_generation()
+
+    def run(self, size, name, kwargs):
+        page_size = self.options['page_size']
+        variants = [
+            ('page 1 cold', lambda: search.search_page(page=1, page_size=page_size, **kwargs), True),
+            ('page 1 warm', lambda: search.search_page(page=1, page_size=page_size, **kwargs), False),
+            (f"page {self.options['deep_page']} cold",
+             lambda: search.search_page(page=self.options['deep_page'], page_size=page_size, **kwargs), True),
+        ]
+        if size <= self.options['full_sort_max']:
+            variants.append(('full sort', lambda: self.full_sort(**kwargs), True))
+
+        for variant, func, cold in variants:
+            timings = []
+            for _ in range(self.options['repeat']):
+                if cold:
+                    cache.clear()
+                else:
+                    func()
+                start = time.perf_counter()
+                result = func()
+                timings.append(time.perf_counter() - start)
+
+            # Measured separately: tracemalloc slows allocation-heavy code
+            if cold:
+                cache.clear()
+            tracemalloc.start()
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            rows = len(result.results) if isinstance(result, search.SearchPage) else len(result)
+            self.stdout.write(
+                f"{size:>9} {name:<9} {variant:<14} {statistics.median(timings) * 1000:>9.2f} "
+                f"{peak / 1024:>10.0f} {rows:>6}"
+            )
+
+    def full_sort(self, query=None, origin=None, max_distance=None):
+        """
+        The old approach: every matching row loaded and sorted in Python.
+        """
+        services = Service.objects.filter(is_active=True, is_verified=True)
+        if origin is None:
+            rank = {pk: position for position, pk in enumerate(search.ranked_service_ids(query))}
+            rows = search.result_rows(search.filter_services(services, query))
+            rows.sort(key=lambda row: rank.get(row.id, len(rank)))
+            return rows
+
+        rows = search.result_rows(services.exclude(provider__latitude=None).exclude(provider__longitude=None))
+        distances = haversine_distances(
+            origin[0], origin[1], [row.latitude for row in rows], [row.longitude for row in rows]
+        )
+        for row, distance in zip(rows, distances):
+            row.distance = float(distance)
+        rows = [row for row in rows if not max_distance or row.distance <= max_distance]
+        rows.sort(key=lambda row: row.distance)
+        return rows
+
+    # -------------------------
+
+    def seed(self, size):
+        seeder = Seeder(self.rng, f"benchsearch{int(time.time())}", self.options['chunk_size'])
+        categories = seeder.seed_categories()
+        per_provider = min(SERVICES_PER_PROVIDER, size)
+        for providers in seeder.provider_batches(math.ceil(size / per_provider)):
+            seeder.seed_services(providers, categories, per_provider, listed_rate=1)
+
+        search.rebuild_index()
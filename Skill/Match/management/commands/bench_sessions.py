@@ -0,0 +1,89 @@
+import time
+import types
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from Match import middleware
+from Match.models import User
+
+ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+
+class SessionWriteCounter:
+    def __init__(self):
+        self.writes = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if 'django_session' in sql and sql.lstrip().upper().startswith(('INSERT', 'UPDATE', 'DELETE')):
+            self.writes += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        "Count django_session writes per 1k authenticated page views with SESSION_SAVE_EVERY_REQUEST "
+        "and with the sliding refresh, for each session engine."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--think-time', type=float, default=5,
+                            help="Simulated seconds between a user's page views.")
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(role='user').first()
+        if user is None:
+            raise CommandError("No users; run 'manage.py seed_marketplace' first.")
+
+        runs = [('every request', 'db', True)] + [(f'sliding {name}', name, False) for name in ENGINES]
+
+        self.stdout.write(
+            f"{options['requests']} requests, one every {options['think_time']:g} s "
+            f"(session age {settings.SESSION_COOKIE_AGE} s, refresh after "
+            f"{middleware.SESSION_REFRESH_FRACTION:.0%})"
+        )
+        self.stdout.write(f"{'mode':<24} {'session writes':>15} {'per 1k':>8} {'cookie sets':>12} {'ms/request':>11}")
+        for label, engine, every_request in runs:
+            writes, cookies, elapsed = self.run(user, ENGINES[engine], every_request, options)
+            per_1k = writes * 1000 / options['requests']
+            self.stdout.write(
+                f"{label:<24} {writes:>15} {per_1k:>8.0f} {cookies:>12} "
+                f"{elapsed * 1000 / options['requests']:>11.2f}"
+            )
+
+    def run(self, user, engine, every_request, options):
+        clock = [time.time()]
+        fake_time = types.SimpleNamespace(time=lambda: clock[0], perf_counter=time.perf_counter)
+
+        with override_settings(SESSION_ENGINE=engine, SESSION_SAVE_EVERY_REQUEST=every_request), \
+                mock.patch.object(middleware, 'time', fake_time):
+            cache.clear()
+            client = Client(SERVER_NAME='localhost')
+            client.force_login(user)
+            url = reverse('user_dashboard')
+
+            counter = SessionWriteCounter()
+            cookies = 0
+            started = time.perf_counter()
+            with connection.execute_wrapper(counter):
+                for _ in range(options['requests']):
+                    clock[0] += options['think_time']
+                    response = client.get(url)
+                    cookies += settings.SESSION_COOKIE_NAME in response.cookies
+            elapsed = time.perf_counter() - started
+
+            client.logout()
+
+        return counter.writes, cookies, elapsed
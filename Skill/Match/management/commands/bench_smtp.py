@@ -0,0 +1,66 @@
+import socket
+import time
+
+from django.core.mail import EmailMessage
+from django.core.mail.backends.smtp import EmailBackend
+from django.core.management.base import BaseCommand, CommandError
+
+from Match import mail
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure email throughput against a local SMTP stand-in (aiosmtpd): one connection "
+        "per message, as with send_mail, versus the pooled backend."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=500)
+        parser.add_argument('--batch-size', type=int, default=50, help="Messages per send_messages call.")
+
+    def handle(self, *args, **options):
+        try:
+            from aiosmtpd.controller import Controller
+        except ImportError:
+            raise CommandError("bench_smtp needs aiosmtpd (pip install aiosmtpd).")
+
+        class Sink:
+            async def handle_DATA(self, server, session, envelope):
+                return '250 OK'
+
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+
+        controller = Controller(Sink(), hostname='127.0.0.1', port=port)
+        controller.start()
+
+        config = dict(host='127.0.0.1', port=port, username='', password='', use_tls=False, use_ssl=False)
+        count = options['messages']
+        batch_size = options['batch_size']
+        messages = [
+            EmailMessage(f"Benchmark {n}", "Body", 'noreply@example.com', ['to@example.com'])
+            for n in range(count)
+        ]
+
+        try:
+            start = time.perf_counter()
+            for message in messages:
+                EmailBackend(**config).send_messages([message])
+            per_message = time.perf_counter() - start
+
+            mail.reset_pool()
+            start = time.perf_counter()
+            for first in range(0, count, batch_size):
+                mail.PooledEmailBackend(**config).send_messages(messages[first:first + batch_size])
+            pooled = time.perf_counter() - start
+            stats = mail.pool_stats()
+        finally:
+            mail.reset_pool()
+            controller.stop()
+
+        self.stdout.write(f"{'mode':<28} {'seconds':>9} {'msgs/s':>9}")
+        self.stdout.write(f"{'connection per message':<28} {per_message:>9.3f} {count / per_message:>9.0f}")
+        self.stdout.write(f"{'pooled, batches of %d' % batch_size:<28} {pooled:>9.3f} {count / pooled:>9.0f}")
+        self.stdout.write(f"speedup: {per_message / pooled:.1f}x (local stand-in, no TLS or login)")
+        self.stdout.write(f"pool stats: {stats}")
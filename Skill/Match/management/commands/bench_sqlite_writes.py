@@ -0,0 +1,125 @@
+import math
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+SCHEMA = """
+CREATE TABLE request (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    service_id INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    description TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX request_user_idx ON request (user_id, created_at);
+CREATE TABLE session (
+    session_key TEXT PRIMARY KEY,
+    session_data TEXT NOT NULL,
+    expire_date TEXT NOT NULL
+);
+"""
+
+# Django's defaults: rollback journal, FULL sync, 5 s sqlite3 timeout,
+# deferred transactions, a fresh connection per request.
+BASELINE = {'init_command': '', 'transaction_mode': None, 'persistent': False}
+
+
+def connect(path, profile):
+    conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+    for command in profile['init_command'].split(';'):
+        if command.strip():
+            conn.execute(command)
+    return conn
+
+
+def worker(args):
+    """
+    One gunicorn-like worker: each "request" reads the session, inserts a
+    service request and saves the session in one transaction, the way
+    create_request does.
+    """
+    path, profile, worker_id, seconds = args
+    begin = f"BEGIN {profile['transaction_mode']}" if profile['transaction_mode'] else 'BEGIN'
+    latencies, errors = [], 0
+    conn = connect(path, profile) if profile['persistent'] else None
+    session_key = f"session-{worker_id}"
+
+    deadline = time.perf_counter() + seconds
+    n = 0
+    while time.perf_counter() < deadline:
+        n += 1
+        start = time.perf_counter()
+        db = conn or connect(path, profile)
+        try:
+            db.execute(begin)
+            db.execute('SELECT session_data FROM session WHERE session_key = ?', (session_key,)).fetchone()
+            db.execute(
+                'INSERT INTO request (user_id, service_id, status, description, created_at) '
+                'VALUES (?, ?, ?, ?, datetime())',
+                (worker_id, n % 50, 'pending', 'Benchmark request ' * 4),
+            )
+            db.execute(
+                'INSERT OR REPLACE INTO session VALUES (?, ?, datetime(\'now\', \'+14 days\'))',
+                (session_key, f'{{"n": {n}}}'),
+            )
+            db.execute('COMMIT')
+            latencies.append(time.perf_counter() - start)
+        except sqlite3.OperationalError:
+            errors += 1
+            if db.in_transaction:
+                db.execute('ROLLBACK')
+        finally:
+            if conn is None:
+                db.close()
+
+    return latencies, errors
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure concurrent write throughput and 'database is locked' errors on a scratch SQLite "
+        "file with Django's default settings and with SQLITE_PRODUCTION_OPTIONS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5)
+
+    def handle(self, *args, **options):
+        production = {
+            'init_command': settings.SQLITE_PRODUCTION_OPTIONS['init_command'],
+            'transaction_mode': settings.SQLITE_PRODUCTION_OPTIONS['transaction_mode'],
+            'persistent': True,
+        }
+
+        self.stdout.write(f"{options['workers']} workers, {options['seconds']} s each")
+        self.stdout.write(f"{'profile':<12} {'writes/s':>10} {'errors':>8} {'p50 ms':>8} {'p95 ms':>8}")
+        for name, profile in (('default', BASELINE), ('production', production)):
+            writes, errors, latencies = self.run(profile, options['workers'], options['seconds'])
+            ordered = sorted(latencies) or [0]
+            p50 = ordered[len(ordered) // 2]
+            p95 = ordered[max(0, math.ceil(0.95 * len(ordered)) - 1)]
+            self.stdout.write(
+                f"{name:<12} {writes / options['seconds']:>10.0f} {errors:>8} "
+                f"{p50 * 1000:>8.2f} {p95 * 1000:>8.2f}"
+            )
+
+    def run(self, profile, workers, seconds):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.sqlite3')
+            setup = connect(path, profile)
+            setup.executescript(SCHEMA)
+            setup.close()
+
+            with multiprocessing.Pool(workers) as pool:
+                results = pool.map(worker, [(path, profile, n, seconds) for n in range(workers)])
+
+        latencies = [latency for worker_latencies, _ in results for latency in worker_latencies]
+        errors = sum(worker_errors for _, worker_errors in results)
+        return len(latencies), errors, latencies
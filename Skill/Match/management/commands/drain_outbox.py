@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Match.mail import pool_stats
+from Match.outbox import OUTBOX_MAX_ATTEMPTS, deliver_batch
+
+
+class Command(BaseCommand):
+    help = "Deliver queued notification emails from the outbox, with retries and dead-lettering."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--max-attempts', type=int, default=OUTBOX_MAX_ATTEMPTS)
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help="Keep polling for new emails instead of exiting once the outbox is drained."
+        )
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds between polls when idle.")
+
+    def handle(self, *args, **options):
+        while True:
+            sent, retried, dead = deliver_batch(options['batch_size'], options['max_attempts'])
+
+            if sent or retried or dead:
+                self.stdout.write(f"sent={sent} retried={retried} dead={dead}")
+                if options['verbosity'] > 1:
+                    self.stdout.write(f"smtp pool: {pool_stats()}")
+                # A full batch usually means more is waiting
+                if sent + retried + dead == options['batch_size']:
+                    continue
+
+            if not options['loop']:
+                break
+
+            time.sleep(options['interval'])
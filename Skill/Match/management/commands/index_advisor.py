@@ -0,0 +1,127 @@
+import re
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from Match.models import ServiceProvider, ServiceRequest, User
+from Match.pagination import encode_cursor
+from Match.slowlog import explain, fingerprint
+
+# Plan steps worth a look: full table scans and sorts/groupings in a temp B-tree
+FULL_SCAN = re.compile(r'^SCAN (\S+)(?! USING)(?!.*VIRTUAL TABLE)')
+TEMP_BTREE = re.compile(r'USE TEMP B-TREE')
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many:
+            self.statements.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run every hot view against the current (seeded) database, EXPLAIN QUERY PLAN each "
+        "statement it issues and flag full table scans and temp B-trees."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-rows', type=int, default=1000,
+                            help="Ignore full scans of tables smaller than this.")
+        parser.add_argument('--fail', action='store_true', help="Exit non-zero if anything is flagged.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("index_advisor reads SQLite's EXPLAIN QUERY PLAN output.")
+
+        provider = (
+            ServiceProvider.objects.filter(profile_completed=True)
+            .annotate(load=Count('services__requests'))
+            .order_by('-load')
+            .first()
+        )
+        seeker = User.objects.filter(role='user').annotate(load=Count('requests')).order_by('-load').first()
+        if provider is None or seeker is None:
+            raise CommandError("No data to analyse; run 'manage.py seed_marketplace' first.")
+
+        # A second-page cursor, so the keyset range predicate is checked too
+        page_end = ServiceRequest.objects.filter(service__provider=provider).order_by('-created_at', '-id')[19:20].first()
+        cursor = encode_cursor(page_end) if page_end is not None else ''
+
+        provider_client = Client(SERVER_NAME='localhost')
+        provider_client.force_login(provider.user)
+        seeker_client = Client(SERVER_NAME='localhost')
+        seeker_client.force_login(seeker)
+
+        cases = [
+            ('search_services', seeker_client, reverse('search_services'), {'q': 'repairs'}),
+            ('search_services', seeker_client, reverse('search_services'), {}),
+            ('search_services', seeker_client, reverse('search_services'), {'lat': '-1.2864', 'lon': '36.8172'}),
+            ('search_services', seeker_client, reverse('search_services'),
+             {'lat': '-1.2864', 'lon': '36.8172', 'radius': '10'}),
+            ('provider_dashboard', provider_client, reverse('provider_dashboard'), {}),
+            ('user_dashboard', seeker_client, reverse('user_dashboard'), {}),
+            ('provider_requests', provider_client, reverse('provider_requests'), {}),
+            ('provider_requests', provider_client, reverse('provider_requests'), {'status': 'pending'}),
+            ('provider_requests', provider_client, reverse('provider_requests'), {'cursor': cursor}),
+            ('my_requests', seeker_client, reverse('my_requests'), {}),
+            ('my_requests', seeker_client, reverse('my_requests'), {'status': 'completed'}),
+            ('manage_services', provider_client, reverse('manage_services'), {}),
+        ]
+
+        table_rows = {}
+        seen = set()
+        flagged = 0
+
+        for view, client, url, data in cases:
+            cache.clear()
+            recorder = QueryRecorder()
+            with connection.execute_wrapper(recorder):
+                client.get(url, data)
+
+            for sql, params in recorder.statements:
+                digest, normalized = fingerprint(sql)
+                if digest in seen:
+                    continue
+                seen.add(digest)
+
+                issues = []
+                for step in explain(sql, params) or ():
+                    scan = FULL_SCAN.search(step)
+                    if scan:
+                        table = scan.group(1)
+                        if table not in table_rows:
+                            table_rows[table] = self.count_rows(table)
+                        if table_rows[table] is not None and table_rows[table] < options['min_rows']:
+                            continue
+                        issues.append(f"{step}  ({table_rows[table]} rows)")
+                    elif TEMP_BTREE.search(step):
+                        issues.append(step)
+
+                if issues:
+                    flagged += 1
+                    self.stdout.write(self.style.WARNING(f"[{view}] {digest}"))
+                    self.stdout.write(f"  {normalized[:300]}{'...' if len(normalized) > 300 else ''}")
+                    for issue in issues:
+                        self.stdout.write(f"    {issue}")
+                    self.stdout.write("")
+
+        summary = f"{len(seen)} distinct statements checked, {flagged} flagged."
+        if flagged and options['fail']:
+            raise CommandError(summary)
+        self.stdout.write(self.style.SUCCESS(summary) if not flagged else summary)
+
+    def count_rows(self, table):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+                return cursor.fetchone()[0]
+        except DatabaseError:
+            return None
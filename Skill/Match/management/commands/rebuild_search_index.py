@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from Match.search import fts_enabled, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text service search index from existing data."
+
+    def handle(self, *args, **options):
+        if not fts_enabled():
+            self.stdout.write(self.style.WARNING("Full-text index is only used on SQLite; nothing to do."))
+            return
+
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} service(s)."))
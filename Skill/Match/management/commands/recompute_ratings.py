@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from Match.ratings import recompute_ratings
+
+
+class Command(BaseCommand):
+    help = "Recompute every provider's rating aggregates from the review table."
+
+    def handle(self, *args, **options):
+        count = recompute_ratings()
+        self.stdout.write(self.style.SUCCESS(f"Recomputed ratings for {count} provider(s)."))
@@ -0,0 +1,228 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from Match.geo import coordinate_values, grid_cell
+from Match.models import Review, Service, ServiceCategory, ServiceProvider, ServiceRequest, User
+from Match.ratings import recompute_ratings
+from Match.search import rebuild_index
+
+# Towns providers and requests cluster around: (name, lat, lon, weight)
+TOWNS = [
+    ('Nairobi', -1.2864, 36.8172, 50),
+    ('Mombasa', -4.0435, 39.6682, 15),
+    ('Kisumu', -0.0917, 34.7680, 10),
+    ('Nakuru', -0.3031, 36.0800, 10),
+    ('Eldoret', 0.5143, 35.2698, 8),
+    ('Thika', -1.0333, 37.0693, 7),
+]
+
+CATEGORIES = [
+    'Plumbing', 'Electrical', 'Cleaning', 'Painting', 'Carpentry', 'Gardening',
+    'Moving', 'Roofing', 'Pest Control', 'Appliance Repair', 'Tutoring', 'Catering',
+    'Photography', 'Tailoring', 'Masonry', 'Welding', 'IT Support', 'Security',
+]
+
+WORDS = [
+    'fast', 'reliable', 'certified', 'affordable', 'residential', 'commercial',
+    'emergency', 'repairs', 'installation', 'maintenance', 'same-day', 'quality',
+]
+
+
+@contextmanager
+def manual_timestamps(*models):
+    """
+    Let bulk_create keep the created_at values we set, instead of
+    auto_now_add stamping every row with the current time.
+    """
+    fields = [model._meta.get_field('created_at') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Seeder:
+    """
+    Bulk row builders shared by seed_marketplace and the bench_* commands.
+    The *_batches methods create and yield one chunk of rows at a time, so
+    benchmarks can seed millions of rows without holding them all.
+    """
+
+    def __init__(self, rng, prefix, chunk):
+        self.rng = rng
+        self.prefix = prefix
+        self.chunk = chunk
+
+    def bulk(self, model, objects):
+        created = []
+        for start in range(0, len(objects), self.chunk):
+            created.extend(model.objects.bulk_create(objects[start:start + self.chunk]))
+        return created
+
+    def point(self):
+        name, lat, lon, _ = self.rng.choices(TOWNS, weights=[town[3] for town in TOWNS])[0]
+        # Roughly a 10 km spread around the town centre
+        return name, lat + self.rng.gauss(0, 0.09), lon + self.rng.gauss(0, 0.09)
+
+    def past(self, days):
+        return timezone.now() - timedelta(seconds=self.rng.randrange(days * 86400))
+
+    def seed_categories(self):
+        existing = {c.name for c in ServiceCategory.objects.all()}
+        for name in CATEGORIES:
+            if name not in existing:
+                ServiceCategory.objects.create(name=name)
+        return list(ServiceCategory.objects.filter(name__in=CATEGORIES))
+
+    def user_batches(self, count, role):
+        password = make_password(None)
+        for start in range(0, count, self.chunk):
+            yield User.objects.bulk_create([
+                User(
+                    username=f"{self.prefix}_{role}_{n}",
+                    email=f"{self.prefix}_{role}_{n}@example.com",
+                    password=password,
+                    role=role,
+                )
+                for n in range(start, min(start + self.chunk, count))
+            ])
+
+    def seed_users(self, count, role):
+        return [user for users in self.user_batches(count, role) for user in users]
+
+    def provider_batches(self, count):
+        for users in self.user_batches(count, 'company'):
+            providers = []
+            for user in users:
+                town, lat, lon = self.point()
+                providers.append(ServiceProvider(
+                    user=user,
+                    company_name=f"{town} {self.rng.choice(CATEGORIES)} Co. {user.pk}",
+                    contact_number=f"+2547{self.rng.randrange(10**8):08d}",
+                    address=f"{self.rng.randrange(1, 300)} Main Street, {town}",
+                    latitude=lat,
+                    longitude=lon,
+                    geo_cell=grid_cell(lat, lon),
+                    **coordinate_values(lat, lon),
+                    profile_completed=True,
+                    is_verified=self.rng.random() < 0.8,
+                    created_at=self.past(730),
+                ))
+            yield ServiceProvider.objects.bulk_create(providers)
+
+    def seed_providers(self, count):
+        return [provider for providers in self.provider_batches(count) for provider in providers]
+
+    def seed_services(self, providers, categories, per_provider, listed_rate=None):
+        """
+        per_provider services for each provider, each in its own category.
+        listed_rate, when given, replaces the default mix of unverified and
+        inactive services: that share of services is listed, the rest not.
+        """
+        services = []
+        for provider in providers:
+            for category in self.rng.sample(categories, min(per_provider, len(categories))):
+                words = self.rng.sample(WORDS, 3)
+                if listed_rate is None:
+                    verified, active = self.rng.random() < 0.9, self.rng.random() < 0.95
+                else:
+                    verified = active = self.rng.random() < listed_rate
+                services.append(Service(
+                    provider=provider,
+                    category=category,
+                    title=f"{words[0].title()} {category.name.lower()}",
+                    description=f"{' '.join(words)} {category.name.lower()} services",
+                    is_verified=verified,
+                    is_active=active,
+                    created_at=self.past(730),
+                ))
+        return self.bulk(Service, services)
+
+    def request_batches(self, seekers, services, count, days):
+        statuses = ['pending', 'accepted', 'completed', 'rejected']
+        for start in range(0, count, self.chunk):
+            requests = []
+            for _ in range(min(self.chunk, count - start)):
+                town, lat, lon = self.point()
+                lat, lon = round(lat, 6), round(lon, 6)
+                service = self.rng.choice(services)
+                requests.append(ServiceRequest(
+                    user=self.rng.choice(seekers),
+                    service=service,
+                    category_id=service.category_id,
+                    latitude=lat,
+                    longitude=lon,
+                    geo_cell=grid_cell(lat, lon),
+                    **coordinate_values(lat, lon),
+                    location=town,
+                    description="Seeded request",
+                    status=self.rng.choices(statuses, weights=[25, 15, 50, 10])[0],
+                    created_at=self.past(days),
+                ))
+            yield ServiceRequest.objects.bulk_create(requests)
+
+    def seed_requests(self, seekers, services, count, days):
+        return [request for requests in self.request_batches(seekers, services, count, days) for request in requests]
+
+    def seed_reviews(self, requests, services, rate):
+        provider_of = {service.pk: service.provider_id for service in services}
+        reviews = [
+            Review(
+                service_request=service_request,
+                provider_id=provider_of[service_request.service_id],
+                user_id=service_request.user_id,
+                rating=self.rng.choices([1, 2, 3, 4, 5], weights=[5, 7, 15, 35, 38])[0],
+                comment="Seeded review",
+                created_at=service_request.created_at + timedelta(days=1),
+            )
+            for service_request in requests
+            if service_request.status == 'completed' and self.rng.random() < rate
+        ]
+        self.bulk(Review, reviews)
+        return len(reviews)
+
+
+class Command(BaseCommand):
+    help = "Generate a synthetic marketplace (users, providers, services, requests, reviews) for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help="Service seekers.")
+        parser.add_argument('--providers', type=int, default=500)
+        parser.add_argument('--services-per-provider', type=int, default=3)
+        parser.add_argument('--requests', type=int, default=20000)
+        parser.add_argument('--review-rate', type=float, default=0.6, help="Share of completed requests reviewed.")
+        parser.add_argument('--days', type=int, default=365, help="Spread request timestamps over this many days.")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        seeder = Seeder(random.Random(options['seed']), f"seed{int(time.time())}", options['chunk_size'])
+        started = time.perf_counter()
+
+        with transaction.atomic(), manual_timestamps(ServiceProvider, Service, ServiceRequest, Review):
+            categories = seeder.seed_categories()
+            seekers = seeder.seed_users(options['users'], 'user')
+            providers = seeder.seed_providers(options['providers'])
+            services = seeder.seed_services(providers, categories, options['services_per_provider'])
+            requests = seeder.seed_requests(seekers, services, options['requests'], options['days'])
+            reviews = seeder.seed_reviews(requests, services, options['review_rate'])
+
+        # bulk_create skips signals, so derived data is rebuilt in bulk
+        indexed = rebuild_index()
+        recompute_ratings()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(seekers)} users, {len(providers)} providers, {len(services)} services, "
+            f"{len(requests)} requests and {reviews} reviews ({indexed} services searchable) "
+            f"in {time.perf_counter() - started:.1f}s."
+        ))
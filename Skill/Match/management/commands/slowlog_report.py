@@ -0,0 +1,67 @@
+import json
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Match.slowlog import SLOW_QUERY_LOG, read_entries
+
+SORT_KEYS = {
+    'total': lambda group: group['total_ms'],
+    'count': lambda group: group['count'],
+    'max': lambda group: group['max_ms'],
+    'mean': lambda group: group['mean_ms'],
+}
+
+
+class Command(BaseCommand):
+    help = "Group the slow-query log by SQL fingerprint to find the hottest statements."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=str(SLOW_QUERY_LOG), help="Log file (rotated backups are read too).")
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument('--sort', choices=sorted(SORT_KEYS), default='total')
+        parser.add_argument('--view', help="Only entries logged under this URL name.")
+        parser.add_argument('--json', action='store_true', help="Print the groups as JSON.")
+
+    def handle(self, *args, **options):
+        groups = defaultdict(lambda: {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'views': defaultdict(int)})
+
+        for entry in read_entries(options['file']):
+            if options['view'] and entry.get('view') != options['view']:
+                continue
+
+            group = groups[entry['fingerprint']]
+            duration = entry['duration_ms']
+            group['count'] += 1
+            group['total_ms'] += duration
+            group['views'][entry.get('view')] += 1
+            group['normalized'] = entry['normalized']
+            if duration >= group['max_ms']:
+                group['max_ms'] = duration
+                group['slowest'] = {'sql': entry['sql'], 'params': entry['params'], 'plan': entry['plan']}
+
+        if not groups:
+            raise CommandError(f"No slow queries logged in {options['file']}.")
+
+        for fingerprint, group in groups.items():
+            group['fingerprint'] = fingerprint
+            group['mean_ms'] = group['total_ms'] / group['count']
+            group['views'] = dict(group['views'])
+
+        ranked = sorted(groups.values(), key=SORT_KEYS[options['sort']], reverse=True)[:options['top']]
+
+        if options['json']:
+            self.stdout.write(json.dumps(ranked, indent=2))
+            return
+
+        for group in ranked:
+            views = ', '.join(f"{view} x{count}" for view, count in sorted(group['views'].items(), key=lambda v: -v[1]))
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{group['fingerprint']}  {group['count']} calls  total {group['total_ms']:.1f} ms  "
+                f"mean {group['mean_ms']:.1f} ms  max {group['max_ms']:.1f} ms"
+            ))
+            self.stdout.write(f"  views: {views}")
+            self.stdout.write(f"  {group['normalized']}")
+            for step in group['slowest']['plan'] or ():
+                self.stdout.write(f"    plan: {step}")
+            self.stdout.write("")
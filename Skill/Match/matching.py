@@ -0,0 +1,139 @@
+import heapq
+from collections import namedtuple
+
+from django.conf import settings
+from django.db.models import Count, FloatField, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .geo import trig_of, within_queryset
+from .models import Service, ServiceRequest
+from .utils import trig_distances
+
+# =========================
+# Scored Matching Engine
+# =========================
+
+# Relative weight of each signal in the final score (each signal is 0..1).
+DEFAULT_WEIGHTS = {
+    'category': 0.4,
+    'distance': 0.3,
+    'rating': 0.2,
+    'load': 0.1,
+}
+MATCH_WEIGHTS = {**DEFAULT_WEIGHTS, **getattr(settings, 'MATCH_WEIGHTS', {})}
+
+# Distance at which the distance signal halves
+MATCH_DISTANCE_SCALE_KM = getattr(settings, 'MATCH_DISTANCE_SCALE_KM', 10)
+
+# Open jobs at which the load signal halves
+MATCH_LOAD_SCALE = getattr(settings, 'MATCH_LOAD_SCALE', 5)
+
+OPEN_STATUSES = ('pending', 'accepted')
+
+# Coordinates travel as the provider's precomputed trig columns
+Candidate = namedtuple(
+    'Candidate',
+    'service_id provider_id category_id sin_lat cos_lat sin_lon cos_lon rating_score open_requests distance',
+    defaults=(None,),
+)
+
+MatchResult = namedtuple('MatchResult', 'score service_id provider_id distance')
+
+
+def candidates(radius_km=None, origin=None):
+    """
+    Active, verified services as lightweight Candidate rows, with each
+    provider's open workload computed in the same query. With a radius,
+    the database applies the bounding box and exact distance itself and
+    fills in each candidate's distance.
+    """
+    open_requests = (
+        ServiceRequest.objects
+        .filter(service__provider=OuterRef('provider'), status__in=OPEN_STATUSES)
+        .order_by()
+        .values('service__provider')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+
+    services = Service.objects.filter(
+        is_active=True, is_verified=True, provider__is_active=True
+    )
+
+    if radius_km is not None and origin is not None:
+        services = within_queryset(services, origin[0], origin[1], radius_km).order_by()
+    else:
+        services = services.annotate(distance=Value(None, output_field=FloatField()))
+
+    rows = services.annotate(
+        open_requests=Coalesce(Subquery(open_requests, output_field=IntegerField()), Value(0))
+    ).values_list(
+        'id', 'provider_id', 'category_id',
+        'provider__sin_lat', 'provider__cos_lat', 'provider__sin_lon', 'provider__cos_lon',
+        'provider__rating_score',
+        'open_requests', 'distance',
+    )
+
+    return [Candidate._make(row) for row in rows.iterator(chunk_size=2000)]
+
+
+def rank(candidates, category_id=None, origin=None, k=5, weights=None, radius_km=None):
+    """
+    Score every candidate and return the best k as MatchResults, highest
+    score first. Only a k-sized heap is kept, not a sorted copy of all
+    candidates.
+    """
+    weights = {**MATCH_WEIGHTS, **(weights or {})}
+
+    distances = [candidate.distance for candidate in candidates]
+    if origin is not None:
+        located = [i for i, c in enumerate(candidates) if c.distance is None and c.sin_lat is not None]
+        if located:
+            found = trig_distances(
+                trig_of(*origin),
+                [candidates[i].sin_lat for i in located],
+                [candidates[i].cos_lat for i in located],
+                [candidates[i].sin_lon for i in located],
+                [candidates[i].cos_lon for i in located],
+            )
+            for i, distance in zip(located, found):
+                distances[i] = float(distance)
+
+    w_category = weights['category']
+    w_distance = weights['distance']
+    w_rating = weights['rating']
+    w_load = weights['load']
+
+    def scored():
+        for candidate, distance in zip(candidates, distances):
+            if radius_km is not None and (distance is None or distance > radius_km):
+                continue
+
+            score = w_category * (candidate.category_id == category_id)
+            if distance is not None:
+                score += w_distance / (1 + distance / MATCH_DISTANCE_SCALE_KM)
+            score += w_rating * min(max((candidate.rating_score - 1) / 4, 0), 1)
+            score += w_load / (1 + candidate.open_requests / MATCH_LOAD_SCALE)
+
+            yield MatchResult(score, candidate.service_id, candidate.provider_id, distance)
+
+    return heapq.nlargest(k, scored(), key=lambda result: result.score)
+
+
+def match_request(service_request, k=5, weights=None, radius_km=None):
+    """
+    Rank the best services for a ServiceRequest by category, distance from
+    the request's pin, provider rating and provider workload.
+    """
+    origin = None
+    if service_request.latitude is not None and service_request.longitude is not None:
+        origin = (float(service_request.latitude), float(service_request.longitude))
+
+    return rank(
+        candidates(radius_km=radius_km, origin=origin),
+        category_id=service_request.service.category_id,
+        origin=origin,
+        k=k,
+        weights=weights,
+        radius_km=radius_km if origin is not None else None,
+    )
@@ -0,0 +1,113 @@
+import threading
+from bisect import bisect_left
+from collections import Counter
+
+# =========================
+# In-Process Request Metrics
+# =========================
+
+# Upper bounds of each histogram's buckets (Prometheus "le" labels)
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+OVERHEAD_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025)
+
+# name: (help text, buckets)
+HISTOGRAMS = {
+    'match_request_duration_seconds': ("Wall time spent handling the request.", SECONDS_BUCKETS),
+    'match_request_db_seconds': ("Time spent executing SQL during the request.", SECONDS_BUCKETS),
+    'match_request_queries': ("SQL queries executed during the request.", QUERY_BUCKETS),
+    'match_response_bytes': ("Size of the response body.", BYTES_BUCKETS),
+    'match_metrics_overhead_seconds': ("Time the metrics middleware itself added.", OVERHEAD_BUCKETS),
+}
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+_histograms = {}
+_responses = Counter()
+_lock = threading.Lock()
+
+
+def record(view, status, **values):
+    """
+    Add one request's measurements (keyword per histogram name) for a view.
+    """
+    with _lock:
+        _responses[(view, status)] += 1
+        for name, value in values.items():
+            histogram = _histograms.get((name, view))
+            if histogram is None:
+                histogram = _histograms[(name, view)] = Histogram(HISTOGRAMS[name][1])
+            histogram.observe(value)
+
+
+def snapshot():
+    """
+    Copy of the current histograms as {(name, view): (counts, sum, count)}
+    plus the per-(view, status) response counter.
+    """
+    with _lock:
+        histograms = {key: (list(h.counts), h.sum, h.count) for key, h in _histograms.items()}
+        return histograms, dict(_responses)
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _responses.clear()
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(counters=None):
+    """
+    Render every metric in the Prometheus text exposition format, plus
+    any extra {name: (help text, value)} counters.
+    """
+    histograms, responses = snapshot()
+    lines = []
+    for name, (help_text, value) in (counters or {}).items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter", f"{name} {value}"]
+    lines += [
+        "# HELP match_responses_total Responses by view and status code.",
+        "# TYPE match_responses_total counter",
+    ]
+    for (view, status), count in sorted(responses.items()):
+        lines.append(f'match_responses_total{{view="{_label(view)}",status="{status}"}} {count}')
+
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for (metric, view), (counts, total, count) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            view = _label(view)
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{{view="{view}",le="{_number(bound)}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{view="{view}",le="+Inf"}} {count}')
+            lines.append(f'{name}_sum{{view="{view}"}} {_number(total)}')
+            lines.append(f'{name}_count{{view="{view}"}} {count}')
+
+    return "\n".join(lines) + "\n"
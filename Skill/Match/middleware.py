@@ -0,0 +1,219 @@
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.utils.functional import SimpleLazyObject
+
+from . import metrics, profiling, slowlog
+from .identity import get_provider
+
+# =========================
+# View Names
+# =========================
+
+
+def _view_name(request):
+    # URL name the metrics and slow-query log file a request under
+    match = getattr(request, 'resolver_match', None)
+    return (match.url_name or match.view_name) if match else 'unresolved'
+
+
+# =========================
+# Per-View Metrics Middleware
+# =========================
+
+METRICS_ENABLED = getattr(settings, 'METRICS_ENABLED', True)
+
+
+class QueryTimer:
+    """
+    connection.execute_wrapper hook counting queries and the time spent
+    in the database.
+    """
+
+    __slots__ = ('queries', 'seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.queries += 1
+
+
+class MetricsMiddleware:
+    """
+    Record wall time, DB time, query count and response size per resolved
+    URL name into the in-process histograms in metrics.py. Place it first
+    so session and auth queries are counted against the view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not METRICS_ENABLED:
+            return self.get_response(request)
+
+        entered = time.perf_counter()
+        timer = QueryTimer()
+        with connection.execute_wrapper(timer):
+            started = time.perf_counter()
+            response = self.get_response(request)
+            finished = time.perf_counter()
+
+        view = _view_name(request)
+        values = {
+            'match_request_duration_seconds': finished - started,
+            'match_request_db_seconds': timer.seconds,
+            'match_request_queries': timer.queries,
+        }
+        if not response.streaming:
+            values['match_response_bytes'] = len(response.content)
+
+        # Bookkeeping outside the view (the per-query hook is counted in DB time)
+        values['match_metrics_overhead_seconds'] = (started - entered) + (time.perf_counter() - finished)
+        metrics.record(view, response.status_code, **values)
+
+        return response
+
+
+# =========================
+# Slow-Query Log Middleware
+# =========================
+
+
+class SlowQueryMiddleware:
+    """
+    Log statements slower than SLOW_QUERY_MS, tagged with the URL name of
+    the request that ran them (see slowlog.py).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if slowlog.SLOW_QUERY_MS is None:
+            return self.get_response(request)
+
+        with connection.execute_wrapper(slowlog.SlowQueryHook(lambda: _view_name(request))):
+            return self.get_response(request)
+
+
+# =========================
+# Request Profiling Middleware
+# =========================
+
+
+class ProfilingMiddleware:
+    """
+    Profile requests selected by the staff toggles or the sample rate
+    (see profiling.py). Place it after AuthenticationMiddleware so
+    per-user toggles can see request.user.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiling.should_profile(request):
+            return self.get_response(request)
+
+        profile = profiling.Profile()
+        try:
+            profile.start()
+        except ValueError:
+            # Another profiler is already active on this thread
+            return self.get_response(request)
+
+        try:
+            response = self.get_response(request)
+        finally:
+            profile.stop()
+
+        user = getattr(request, 'user', None)
+        profile.save(
+            view=_view_name(request),
+            path=request.path,
+            method=request.method,
+            user_id=user.pk if user is not None else None,
+            status=response.status_code,
+        )
+        return response
+
+
+# =========================
+# Sliding Session Expiry
+# =========================
+
+# Share of SESSION_COOKIE_AGE that may pass before an unchanged session is
+# saved again to push its expiry forward
+SESSION_REFRESH_FRACTION = getattr(settings, 'SESSION_REFRESH_FRACTION', 0.1)
+
+SESSION_REFRESHED_KEY = '_refreshed_at'
+
+
+def stamp_session(session):
+    """
+    Record that the session's stored expiry was just pushed forward.
+    Setting the key marks the session modified, so it is saved.
+    """
+    session[SESSION_REFRESHED_KEY] = int(time.time())
+
+
+class SlidingSessionMiddleware:
+    """
+    Keep the sliding inactivity timeout of SESSION_SAVE_EVERY_REQUEST while
+    writing the session only once SESSION_REFRESH_FRACTION of its lifetime
+    has passed. A session then expires between (1 - fraction) and 1 times
+    SESSION_COOKIE_AGE after the last request. Place it after
+    SessionMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        session = getattr(request, 'session', None)
+        if (
+            session is None
+            or settings.SESSION_SAVE_EVERY_REQUEST
+            or session.modified
+            or session.is_empty()
+            or response.status_code == 500
+        ):
+            return response
+
+        refreshed_at = session.get(SESSION_REFRESHED_KEY, 0)
+        if time.time() - refreshed_at >= SESSION_REFRESH_FRACTION * session.get_expiry_age():
+            stamp_session(session)
+
+        return response
+
+
+# =========================
+# Request-Scoped Provider Profile
+# =========================
+
+
+class ProviderMiddleware:
+    """
+    Add request.provider: the signed-in user's ServiceProvider (falsy when
+    there is none), loaded on first use from the identity cache and then
+    memoized for the rest of the request. Place it after
+    AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.provider = SimpleLazyObject(lambda: get_provider(request.user))
+        return self.get_response(request)
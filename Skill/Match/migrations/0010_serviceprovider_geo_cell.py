@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:52
+
+from django.db import migrations, models
+
+# Frozen copy of Match.geo.grid_cell as of this migration
+GRID_CELL_DEGREES = 0.5
+GRID_ROWS = 360
+GRID_COLS = 720
+
+
+def grid_cell(lat, lon):
+    lat = min(max(float(lat), -90.0), 90.0)
+    lon = float(lon)
+
+    row = min(int((lat + 90) // GRID_CELL_DEGREES), GRID_ROWS - 1)
+    col = int(((lon + 180) % 360) // GRID_CELL_DEGREES) % GRID_COLS
+
+    return f"{row}:{col}"
+
+
+def populate_geo_cells(apps, schema_editor):
+    ServiceProvider = apps.get_model('Match', 'ServiceProvider')
+
+    providers = list(ServiceProvider.objects.exclude(latitude=None).exclude(longitude=None))
+    for provider in providers:
+        provider.geo_cell = grid_cell(provider.latitude, provider.longitude)
+
+    ServiceProvider.objects.bulk_update(providers, ['geo_cell'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Match', '0009_service_is_verified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='geo_cell',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=16),
+        ),
+        migrations.RunPython(populate_geo_cells, migrations.RunPython.noop),
+    ]
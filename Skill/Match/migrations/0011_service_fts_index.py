@@ -0,0 +1,45 @@
+from django.db import migrations
+
+# Frozen copy of the Match.search index SQL as of this migration; the
+# migration must not touch the search cache or follow later changes.
+FTS_TABLE = 'Match_service_fts'
+
+CREATE_INDEX_SQL = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, description, category, tokenize = 'unicode61 remove_diacritics 2'
+    )
+"""
+
+POPULATE_INDEX_SQL = f"""
+    INSERT INTO {FTS_TABLE} (rowid, title, description, category)
+    SELECT s.id, s.title, s.description, c.name
+    FROM Match_service s
+    JOIN Match_servicecategory c ON c.id = s.category_id
+    WHERE s.is_active AND s.is_verified
+"""
+
+DROP_INDEX_SQL = f"DROP TABLE IF EXISTS {FTS_TABLE}"
+
+
+def create_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(CREATE_INDEX_SQL)
+        schema_editor.execute(f"DELETE FROM {FTS_TABLE}")
+        schema_editor.execute(POPULATE_INDEX_SQL)
+        schema_editor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(DROP_INDEX_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Match', '0010_serviceprovider_geo_cell'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:55
+
+import Match.models
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+# Frozen rating prior (Match.models.RATING_PRIOR_*) as of this migration
+RATING_PRIOR_MEAN = 3.0
+RATING_PRIOR_WEIGHT = 5
+
+
+def backfill_ratings(apps, schema_editor):
+    ServiceProvider = apps.get_model('Match', 'ServiceProvider')
+    Review = apps.get_model('Match', 'Review')
+
+    prior_mean = RATING_PRIOR_MEAN
+    prior_weight = RATING_PRIOR_WEIGHT
+
+    totals = Review.objects.values('provider').annotate(count=Count('id'), total=Sum('rating'))
+    for row in totals:
+        ServiceProvider.objects.filter(pk=row['provider']).update(
+            rating_count=row['count'],
+            rating_sum=row['total'],
+            rating_score=(prior_weight * prior_mean + row['total']) / (prior_weight + row['count']),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Match', '0011_service_fts_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='rating_score',
+            field=models.FloatField(default=Match.models.prior_rating_score, editable=False),
+        ),
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Match', '0014_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='serviceprovider',
+            index=models.Index(fields=['latitude', 'longitude'], name='provider_lat_lon_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['latitude', 'longitude'], name='request_lat_lon_idx'),
+        ),
+    ]
@@ -0,0 +1,127 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:27
+
+import math
+
+from django.db import migrations, models
+
+# Frozen copy of Match.geo.coordinate_values as of this migration
+MICRODEGREES = 1_000_000
+COORDINATE_FIELDS = ('lat_e6', 'lon_e6', 'sin_lat', 'cos_lat', 'sin_lon', 'cos_lon')
+
+
+def coordinate_values(lat, lon):
+    lat_e6 = round(float(lat) * MICRODEGREES)
+    lon_e6 = round(float(lon) * MICRODEGREES)
+    lat_r = math.radians(lat_e6 / MICRODEGREES)
+    lon_r = math.radians(lon_e6 / MICRODEGREES)
+    return {
+        'lat_e6': lat_e6,
+        'lon_e6': lon_e6,
+        'sin_lat': math.sin(lat_r),
+        'cos_lat': math.cos(lat_r),
+        'sin_lon': math.sin(lon_r),
+        'cos_lon': math.cos(lon_r),
+    }
+
+
+def populate_coordinates(apps, schema_editor):
+    for name in ('ServiceProvider', 'ServiceRequest'):
+        model = apps.get_model('Match', name)
+        located = model.objects.exclude(latitude=None).exclude(longitude=None)
+
+        batch = []
+        for row in located.only('id', 'latitude', 'longitude').iterator(chunk_size=2000):
+            for field, value in coordinate_values(row.latitude, row.longitude).items():
+                setattr(row, field, value)
+            batch.append(row)
+            if len(batch) >= 2000:
+                model.objects.bulk_update(batch, COORDINATE_FIELDS, batch_size=500)
+                batch = []
+        model.objects.bulk_update(batch, COORDINATE_FIELDS, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Match', '0015_coordinate_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='serviceprovider',
+            name='provider_lat_lon_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='servicerequest',
+            name='request_lat_lon_idx',
+        ),
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='cos_lat',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='cos_lon',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='lat_e6',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='lon_e6',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='sin_lat',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='serviceprovider',
+            name='sin_lon',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='servicerequest',
+            name='cos_lat',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='servicerequest',
+            name='cos_lon',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='servicerequest',
+            name='lat_e6',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='servicerequest',
+            name='lon_e6',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='servicerequest',
+            name='sin_lat',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='servicerequest',
+            name='sin_lon',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(populate_coordinates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='serviceprovider',
+            index=models.Index(fields=['lat_e6', 'lon_e6'], name='provider_lat_lon_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['lat_e6', 'lon_e6'], name='request_lat_lon_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+# Frozen copy of Match.geo.grid_cell as of this migration
+GRID_CELL_DEGREES = 0.5
+GRID_ROWS = 360
+GRID_COLS = 720
+
+
+def grid_cell(lat, lon):
+    lat = min(max(float(lat), -90.0), 90.0)
+    lon = float(lon)
+
+    row = min(int((lat + 90) // GRID_CELL_DEGREES), GRID_ROWS - 1)
+    col = int(((lon + 180) % 360) // GRID_CELL_DEGREES) % GRID_COLS
+
+    return f"{row}:{col}"
+
+
+def populate_requests(apps, schema_editor):
+    Service = apps.get_model('Match', 'Service')
+    ServiceRequest = apps.get_model('Match', 'ServiceRequest')
+
+    ServiceRequest.objects.update(
+        category_id=Subquery(Service.objects.filter(pk=OuterRef('service_id')).values('category_id')[:1])
+    )
+
+    batch = []
+    located = ServiceRequest.objects.exclude(latitude=None).exclude(longitude=None)
+    for service_request in located.only('id', 'latitude', 'longitude').iterator(chunk_size=2000):
+        service_request.geo_cell = grid_cell(service_request.latitude, service_request.longitude)
+        batch.append(service_request)
+        if len(batch) >= 2000:
+            ServiceRequest.objects.bulk_update(batch, ['geo_cell'], batch_size=500)
+            batch = []
+    ServiceRequest.objects.bulk_update(batch, ['geo_cell'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Match', '0016_coordinate_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicerequest',
+            name='category',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='Match.servicecategory'),
+        ),
+        migrations.AddField(
+            model_name='servicerequest',
+            name='geo_cell',
+            field=models.CharField(blank=True, editable=False, max_length=16),
+        ),
+        migrations.RunPython(populate_requests, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['status', 'category', 'geo_cell', 'created_at'], name='request_open_nearby_idx'),
+        ),
+    ]
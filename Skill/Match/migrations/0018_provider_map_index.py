@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Match', '0017_nearby_requests'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='serviceprovider',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['lat_e6', 'lon_e6', 'is_active'], name='provider_map_idx'),
+        ),
+    ]
@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 from django.utils.text import slugify
 
 # =========================
@@ -20,11 +22,56 @@ class User(AbstractUser):
         return f"{self.username} ({self.get_role_display()})"
 
 
+# =========================
+# Coordinates
+# =========================
+
+class Located(models.Model):
+    """
+    Derived coordinate columns for a model with latitude and longitude:
+    the spatial grid cell, integer microdegrees and the sine/cosine of
+    each coordinate (see Match.geo), kept in step on save.
+    """
+    geo_cell = models.CharField(max_length=16, blank=True, editable=False)
+    lat_e6 = models.IntegerField(null=True, blank=True, editable=False)
+    lon_e6 = models.IntegerField(null=True, blank=True, editable=False)
+    sin_lat = models.FloatField(null=True, blank=True, editable=False)
+    cos_lat = models.FloatField(null=True, blank=True, editable=False)
+    sin_lon = models.FloatField(null=True, blank=True, editable=False)
+    cos_lon = models.FloatField(null=True, blank=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        from .geo import COORDINATE_FIELDS, coordinate_values, grid_cell
+
+        self.geo_cell = grid_cell(self.latitude, self.longitude)
+        for name, value in coordinate_values(self.latitude, self.longitude).items():
+            setattr(self, name, value)
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geo_cell', *COORDINATE_FIELDS}
+
+        super().save(*args, **kwargs)
+
+
 # =========================
 # Service Provider Profile
 # =========================
 
-class ServiceProvider(models.Model):
+# Bayesian rating prior: every provider starts with RATING_PRIOR_WEIGHT
+# imaginary reviews of RATING_PRIOR_MEAN stars (see Match.ratings), so a
+# single 5-star review does not outrank a long track record.
+RATING_PRIOR_MEAN = getattr(settings, 'RATING_PRIOR_MEAN', 3.0)
+RATING_PRIOR_WEIGHT = getattr(settings, 'RATING_PRIOR_WEIGHT', 5)
+
+
+def prior_rating_score():
+    return RATING_PRIOR_MEAN
+
+class ServiceProvider(Located):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     company_name = models.CharField(max_length=255)
     contact_number = models.CharField(max_length=20)
@@ -38,9 +85,32 @@ class ServiceProvider(models.Model):
     latitude = models.FloatField(blank=True, null=True)
     longitude = models.FloatField(blank=True, null=True)
 
+    # Spatial grid key derived from latitude/longitude (see Match.geo)
+    geo_cell = models.CharField(max_length=16, blank=True, db_index=True, editable=False)
+
+    # Review aggregates, maintained incrementally (see Match.ratings)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_score = models.FloatField(default=prior_rating_score, editable=False)  # Bayesian-smoothed
 
     created_at = models.DateTimeField(auto_now_add=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Bounding-box prefilter for radius and nearest searches
+            models.Index(fields=['lat_e6', 'lon_e6'], name='provider_lat_lon_idx'),
+            # Covers map clustering, which reads only the coordinates of active providers
+            models.Index(
+                fields=['lat_e6', 'lon_e6', 'is_active'], condition=models.Q(is_active=True), name='provider_map_idx'
+            ),
+        ]
+
+    @property
+    def rating_average(self):
+        if not self.rating_count:
+            return None
+        return round(self.rating_sum / self.rating_count, 1)
+
     def __str__(self):
         return self.company_name
 
@@ -80,6 +150,23 @@ class Service(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Partial indexes over listed services only: the ORM renders boolean
+        # filters as bare columns, which SQLite can match against an index
+        # condition but not use as equality terms of a composite index.
+        indexes = [
+            models.Index(
+                fields=['category'],
+                condition=models.Q(is_active=True, is_verified=True),
+                name='service_listed_idx',
+            ),
+            models.Index(
+                fields=['provider'],
+                condition=models.Q(is_active=True, is_verified=True),
+                name='service_provider_listed_idx',
+            ),
+        ]
+
     def __str__(self):
         return f"{self.title} - {self.provider.company_name}"
 
@@ -105,7 +192,7 @@ class CompanyDocument(models.Model):
 # Service Requests
 # =========================
 
-class ServiceRequest(models.Model):
+class ServiceRequest(Located):
     user = models.ForeignKey(
         'User', 
         on_delete=models.CASCADE, 
@@ -129,6 +216,31 @@ class ServiceRequest(models.Model):
     status = models.CharField(max_length=20, choices=status_choices, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # The service's category, copied so open requests can be found by
+    # category without joining services (kept in step by Match.signals)
+    category = models.ForeignKey(
+        ServiceCategory, on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='+'
+    )
+
+    class Meta:
+        indexes = [
+            # Provider inboxes and stats reach requests through their services
+            models.Index(fields=['service', 'status', 'created_at'], name='request_service_status_idx'),
+            models.Index(fields=['service', 'created_at'], name='request_service_created_idx'),
+            # "My requests" and the user dashboard
+            models.Index(fields=['user', 'status', 'created_at'], name='request_user_status_idx'),
+            models.Index(fields=['user', 'created_at'], name='request_user_created_idx'),
+            # Bounding-box prefilter on the request pin
+            models.Index(fields=['lat_e6', 'lon_e6'], name='request_lat_lon_idx'),
+            # Providers' "nearby open requests" feed
+            models.Index(fields=['status', 'category', 'geo_cell', 'created_at'], name='request_open_nearby_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.category_id is None and self.service_id is not None:
+            self.category_id = self.service.category_id
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.service.title} requested by {self.user.username}"
 
@@ -159,5 +271,47 @@ class Review(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Latest reviews on the provider dashboard
+            models.Index(fields=['provider', 'created_at'], name='review_provider_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.provider.company_name} - {self.rating}⭐"
+
+# =========================
+# Email Outbox
+# =========================
+
+class EmailOutbox(models.Model):
+    """
+    Notification emails queued in the same transaction as the state change
+    that caused them, and delivered by the drain_outbox worker.
+    """
+    status_choices = (
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('dead', 'Dead'),
+    )
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)
+    recipients = models.JSONField(default=list)
+
+    status = models.CharField(max_length=20, choices=status_choices, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.provider.company_name} - {self.rating}⭐"
\ No newline at end of file
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
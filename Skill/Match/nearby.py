@@ -0,0 +1,120 @@
+from dataclasses import dataclass
+
+from django.conf import settings
+
+from . import geo
+from .models import Service, ServiceRequest
+
+# =========================
+# Nearby Open Requests (Provider Feed)
+# =========================
+
+NEARBY_RADIUS_KM = getattr(settings, 'NEARBY_RADIUS_KM', 25)
+MAX_NEARBY_RADIUS_KM = getattr(settings, 'MAX_NEARBY_RADIUS_KM', 200)
+NEARBY_PAGE_SIZE = getattr(settings, 'NEARBY_PAGE_SIZE', 20)
+NEARBY_RADIUS_CHOICES = (5, 10, 25, 50, 100, 200)
+
+# sort name: ORDER BY (the within_queryset "dot" alias grows as distance shrinks)
+NEARBY_SORTS = {
+    'distance': ('-dot', '-created_at', '-id'),
+    'recent': ('-created_at', '-id'),
+}
+
+
+@dataclass(slots=True)
+class NearbyRequest:
+    id: int
+    service_title: str
+    category_name: str
+    location: str
+    description: str
+    latitude: float
+    longitude: float
+    created_at: object
+    distance: float
+
+
+NEARBY_FIELDS = (
+    'id',
+    'service__title',
+    'category__name',
+    'location',
+    'description',
+    'latitude',
+    'longitude',
+    'created_at',
+    'distance',
+)
+
+
+@dataclass
+class NearbyPage:
+    results: list
+    page: int
+    page_size: int
+    has_next: bool
+    radius_km: float
+    sort: str
+
+    @property
+    def has_previous(self):
+        return self.page > 1
+
+
+def provider_categories(provider):
+    return list(
+        Service.objects.filter(provider=provider, is_active=True)
+        .order_by().values_list('category_id', flat=True).distinct()
+    )
+
+
+def open_requests_near(lat, lon, category_ids, radius_km, exclude_provider=None):
+    """
+    Pending requests in the given categories within radius_km of
+    (lat, lon), annotated with distance, nearest first.
+
+    The (status, category, geo_cell, created_at) index narrows the table
+    to the covering grid cells of each category before the bounding box
+    and exact distance are applied.
+    """
+    requests = ServiceRequest.objects.filter(status='pending', category_id__in=category_ids)
+
+    cells = geo.covering_cells(lat, lon, radius_km)
+    if cells is not None:
+        requests = requests.filter(geo_cell__in=cells)
+
+    if exclude_provider is not None:
+        # Their own requests are already in the provider inbox
+        requests = requests.exclude(service__provider=exclude_provider)
+
+    return geo.within_queryset(requests, lat, lon, radius_km, prefix='')
+
+
+def clamp_radius(value):
+    radius = geo.parse_radius(value)
+    if radius is None:
+        return NEARBY_RADIUS_KM
+    return min(max(radius, 1), MAX_NEARBY_RADIUS_KM)
+
+
+def nearby_page(provider, radius_km=NEARBY_RADIUS_KM, sort='distance', page=1, page_size=NEARBY_PAGE_SIZE):
+    """
+    One page of open requests near the provider's pin in the provider's
+    categories, nearest (or newest) first. Empty when the provider has no
+    pin or no active services.
+    """
+    sort = sort if sort in NEARBY_SORTS else 'distance'
+    page = max(int(page), 1)
+
+    categories = provider_categories(provider)
+    if provider.latitude is None or provider.longitude is None or not categories:
+        return NearbyPage([], page, page_size, False, radius_km, sort)
+
+    requests = open_requests_near(provider.latitude, provider.longitude, categories, radius_km, provider)
+    start = (page - 1) * page_size
+    rows = [
+        NearbyRequest(*row)
+        for row in requests.order_by(*NEARBY_SORTS[sort]).values_list(*NEARBY_FIELDS)[start:start + page_size + 1]
+    ]
+
+    return NearbyPage(rows[:page_size], page, page_size, len(rows) > page_size, radius_km, sort)
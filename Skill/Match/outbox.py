@@ -0,0 +1,135 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+# =========================
+# Email Outbox Delivery
+# =========================
+
+OUTBOX_MAX_ATTEMPTS = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 6)
+OUTBOX_BACKOFF_SECONDS = getattr(settings, 'OUTBOX_BACKOFF_SECONDS', 30)
+OUTBOX_MAX_BACKOFF_SECONDS = getattr(settings, 'OUTBOX_MAX_BACKOFF_SECONDS', 3600)
+
+# How long a worker owns a claimed row before another worker may retry it
+OUTBOX_LEASE_SECONDS = getattr(settings, 'OUTBOX_LEASE_SECONDS', 300)
+
+
+def enqueue_email(subject, message, recipients, from_email=None):
+    """
+    Queue an email for the outbox worker. Call it inside the same
+    transaction as the change it reports so both commit or neither does.
+    """
+    if isinstance(recipients, str):
+        recipients = [recipients]
+
+    recipients = [address for address in recipients if address]
+    if not recipients:
+        return None
+
+    return EmailOutbox.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=recipients,
+    )
+
+
+def backoff_delay(attempts):
+    """
+    Exponential backoff after the given number of failed attempts.
+    """
+    return timedelta(seconds=min(OUTBOX_BACKOFF_SECONDS * 2 ** (attempts - 1), OUTBOX_MAX_BACKOFF_SECONDS))
+
+
+def claim_batch(batch_size):
+    """
+    Lease up to batch_size due emails to this worker. A row is only
+    claimed if nobody else moved its lease first.
+    """
+    now = timezone.now()
+    due = EmailOutbox.objects.filter(status='pending', next_attempt_at__lte=now).order_by('next_attempt_at', 'id')
+
+    claimed = []
+    for email in due[:batch_size]:
+        lease = now + timedelta(seconds=OUTBOX_LEASE_SECONDS)
+        won = EmailOutbox.objects.filter(
+            pk=email.pk, status='pending', next_attempt_at=email.next_attempt_at
+        ).update(next_attempt_at=lease)
+        if won:
+            email.next_attempt_at = lease
+            claimed.append(email)
+
+    return claimed
+
+
+def deliver_batch(batch_size=50, max_attempts=OUTBOX_MAX_ATTEMPTS, connection=None):
+    """
+    Send one batch of due emails over a single connection.
+    Returns (sent, retried, dead) counts.
+    """
+    emails = claim_batch(batch_size)
+    if not emails:
+        return 0, 0, 0
+
+    sent = retried = dead = 0
+    connection = connection or get_connection()
+
+    try:
+        connection.open()
+    except Exception as e:
+        # Nothing can go out; every claimed email counts as a failed attempt
+        for email in emails:
+            if _record_failure(email, e, max_attempts):
+                dead += 1
+            else:
+                retried += 1
+        return sent, retried, dead
+
+    try:
+        for email in emails:
+            message = EmailMessage(
+                email.subject, email.body, email.from_email, email.recipients, connection=connection
+            )
+            try:
+                # Backends that swallow errors report a refused message as 0 sent
+                if not message.send():
+                    raise RuntimeError("Backend delivered 0 messages")
+            except Exception as e:
+                if _record_failure(email, e, max_attempts):
+                    dead += 1
+                else:
+                    retried += 1
+            else:
+                email.status = 'sent'
+                email.attempts += 1
+                email.sent_at = timezone.now()
+                email.last_error = ''
+                email.save(update_fields=['status', 'attempts', 'sent_at', 'last_error'])
+                sent += 1
+    finally:
+        connection.close()
+
+    return sent, retried, dead
+
+
+def _record_failure(email, error, max_attempts):
+    email.attempts += 1
+    email.last_error = f"{type(error).__name__}: {error}"
+
+    if email.attempts >= max_attempts:
+        email.status = 'dead'
+        logger.error("Email %s dead-lettered after %s attempts: %s", email.pk, email.attempts, email.last_error)
+    else:
+        email.next_attempt_at = timezone.now() + backoff_delay(email.attempts)
+        logger.warning("Email %s failed (attempt %s): %s", email.pk, email.attempts, email.last_error)
+
+    email.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt_at'])
+
+    return email.status == 'dead'
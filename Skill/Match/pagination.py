@@ -0,0 +1,65 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+
+# =========================
+# Keyset (Cursor) Pagination
+# =========================
+
+REQUESTS_PAGE_SIZE = getattr(settings, 'REQUESTS_PAGE_SIZE', 20)
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(obj):
+    """
+    Opaque cursor pointing just past obj in (-created_at, -id) order.
+    """
+    raw = f"{obj.created_at.isoformat()}|{obj.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Return (created_at, pk) for a cursor, or None if it is missing or
+    malformed (callers then start from the first page).
+    """
+    if not cursor:
+        return None
+
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def page_size_from(value, default=REQUESTS_PAGE_SIZE):
+    try:
+        return min(max(int(value), 1), MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        return default
+
+
+def keyset_page(queryset, cursor=None, page_size=REQUESTS_PAGE_SIZE):
+    """
+    One page of a queryset, newest first, seeking past the cursor with
+    (created_at, id) < (cursor) instead of OFFSET, so deep pages cost the
+    same as the first. Returns (items, next_cursor or None).
+    """
+    queryset = queryset.order_by('-created_at', '-id')
+
+    position = decode_cursor(cursor)
+    if position is not None:
+        created_at, pk = position
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+
+    items = list(queryset[:page_size + 1])
+    next_cursor = encode_cursor(items[page_size - 1]) if len(items) > page_size else None
+
+    return items[:page_size], next_cursor
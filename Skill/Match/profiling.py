@@ -0,0 +1,220 @@
+import cProfile
+import io
+import json
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+# =========================
+# Sampling Request Profiler
+# =========================
+
+PROFILE_DIR = Path(getattr(settings, 'PROFILE_DIR', Path(settings.BASE_DIR) / 'profiles'))
+
+# Profiles kept on disk; older ones are deleted
+PROFILE_KEEP = getattr(settings, 'PROFILE_KEEP', 200)
+
+# Seconds between stack samples for the collapsed-stack output
+PROFILE_SAMPLE_INTERVAL = getattr(settings, 'PROFILE_SAMPLE_INTERVAL', 0.005)
+
+# Share of all requests profiled regardless of the staff toggles
+PROFILE_SAMPLE_RATE = getattr(settings, 'PROFILE_SAMPLE_RATE', 0.0)
+
+# Staff toggles switch themselves off after this many seconds
+PROFILE_TOGGLE_TIMEOUT = getattr(settings, 'PROFILE_TOGGLE_TIMEOUT', 3600)
+
+TOGGLE_KEY = 'profiling:toggles'
+
+PROFILE_NAME = re.compile(r'^[\w-]+$')
+
+
+# -------------------------
+# Toggles
+# -------------------------
+
+def get_toggles():
+    """
+    Active staff toggles: {'views': [...], 'users': [...], 'rate': float}.
+    Kept in the cache so every process sharing it sees them.
+    """
+    toggles = cache.get(TOGGLE_KEY) or {}
+    return {
+        'views': toggles.get('views', []),
+        'users': toggles.get('users', []),
+        'rate': toggles.get('rate', 0.0),
+    }
+
+
+def set_toggles(views=(), users=(), rate=0.0, timeout=PROFILE_TOGGLE_TIMEOUT):
+    toggles = {'views': sorted(set(views)), 'users': sorted(set(users)), 'rate': rate}
+    if any(toggles.values()):
+        cache.set(TOGGLE_KEY, toggles, timeout)
+    else:
+        cache.delete(TOGGLE_KEY)
+
+
+def should_profile(request):
+    """
+    Whether a request matches a staff toggle or falls in the sample.
+    Needs request.user, so runs after AuthenticationMiddleware.
+    """
+    toggles = get_toggles()
+
+    user = getattr(request, 'user', None)
+    if toggles['users'] and user is not None and user.pk in toggles['users']:
+        return True
+
+    if toggles['views']:
+        try:
+            if resolve(request.path_info).url_name in toggles['views']:
+                return True
+        except Resolver404:
+            pass
+
+    rate = max(toggles['rate'], PROFILE_SAMPLE_RATE)
+    return rate > 0 and random.random() < rate
+
+
+# -------------------------
+# Profiling
+# -------------------------
+
+class StackSampler(threading.Thread):
+    """
+    Sample one thread's stack every interval seconds, counting collapsed
+    stacks ("outer;inner;leaf") for flamegraph tools.
+    """
+
+    def __init__(self, thread_id, interval=PROFILE_SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+class Profile:
+    """
+    cProfile plus a stack sampler around one block of code. start()
+    raises ValueError if another profiler is already active.
+    """
+
+    def start(self):
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+        self.sampler = StackSampler(threading.get_ident())
+        self.sampler.start()
+        self.started = time.perf_counter()
+
+    def stop(self):
+        self.duration = time.perf_counter() - self.started
+        self.profiler.disable()
+        self.sampler.stop()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def save(self, **meta):
+        """
+        Write <name>.pstats, <name>.collapsed and <name>.json to PROFILE_DIR
+        and return the profile name.
+        """
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        started_at = timezone.now()
+        label = re.sub(r'[^\w-]', '_', str(meta.get('view') or 'request'))
+        name = f"{started_at:%Y%m%dT%H%M%S%f}-{label}"
+
+        self.profiler.dump_stats(PROFILE_DIR / f"{name}.pstats")
+        with open(PROFILE_DIR / f"{name}.collapsed", 'w', encoding='utf-8') as fh:
+            for stack, count in self.sampler.stacks.most_common():
+                fh.write(f"{stack} {count}\n")
+        with open(PROFILE_DIR / f"{name}.json", 'w', encoding='utf-8') as fh:
+            json.dump({
+                **meta,
+                'name': name,
+                'started_at': started_at.isoformat(),
+                'duration_ms': round(self.duration * 1000, 2),
+                'samples': sum(self.sampler.stacks.values()),
+            }, fh)
+
+        prune()
+        return name
+
+
+# -------------------------
+# Stored Profiles
+# -------------------------
+
+def prune(keep=PROFILE_KEEP):
+    for meta in sorted(PROFILE_DIR.glob('*.json'))[:-keep or None]:
+        for suffix in ('.json', '.pstats', '.collapsed'):
+            meta.with_suffix(suffix).unlink(missing_ok=True)
+
+
+def recent_profiles(limit=100):
+    """
+    Metadata of the newest profiles, newest first.
+    """
+    if not PROFILE_DIR.exists():
+        return []
+
+    profiles = []
+    for path in sorted(PROFILE_DIR.glob('*.json'), reverse=True)[:limit]:
+        with open(path, encoding='utf-8') as fh:
+            profiles.append(json.load(fh))
+    return profiles
+
+
+def profile_path(name, suffix):
+    """
+    Path of a stored profile file, or None for unknown or unsafe names.
+    """
+    if not PROFILE_NAME.match(name):
+        return None
+    path = PROFILE_DIR / f"{name}{suffix}"
+    return path if path.exists() else None
+
+
+def top_functions(name, sort='cumulative', limit=30):
+    """
+    The pstats report for a profile's top functions, as text.
+    """
+    path = profile_path(name, '.pstats')
+    if path is None:
+        return None
+
+    stream = io.StringIO()
+    stats = pstats.Stats(str(path), stream=stream)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
@@ -0,0 +1,67 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Sum, Value
+
+from .identity import invalidate_providers
+from .models import RATING_PRIOR_MEAN as PRIOR_MEAN, RATING_PRIOR_WEIGHT as PRIOR_WEIGHT
+from .models import Review, ServiceProvider
+
+# =========================
+# Provider Rating Aggregates
+# =========================
+
+
+def bayesian_score(count, total):
+    return (PRIOR_WEIGHT * PRIOR_MEAN + total) / (PRIOR_WEIGHT + count)
+
+
+def apply_review(provider_id, rating, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) one review from a provider's
+    aggregates in a single UPDATE, so concurrent reviews cannot race.
+    """
+    count = F('rating_count') + sign
+    total = F('rating_sum') + sign * rating
+
+    ServiceProvider.objects.filter(pk=provider_id).update(
+        rating_count=count,
+        rating_sum=total,
+        rating_score=ExpressionWrapper(
+            (Value(float(PRIOR_WEIGHT * PRIOR_MEAN)) + total) / (Value(float(PRIOR_WEIGHT)) + count),
+            output_field=FloatField()
+        ),
+    )
+    transaction.on_commit(partial(invalidate_providers, [provider_id]))
+
+
+def recompute_ratings(provider_ids=None):
+    """
+    Rebuild aggregates from the review table with one grouped query.
+    Returns the number of providers updated.
+    """
+    reviews = Review.objects.all()
+    providers = ServiceProvider.objects.only('id')
+    if provider_ids is not None:
+        reviews = reviews.filter(provider_id__in=provider_ids)
+        providers = providers.filter(pk__in=provider_ids)
+
+    totals = {
+        row['provider']: (row['count'], row['total'])
+        for row in reviews.values('provider').annotate(count=Count('id'), total=Sum('rating'))
+    }
+
+    updated = []
+    for provider in providers.iterator(chunk_size=2000):
+        count, total = totals.get(provider.pk, (0, 0))
+        provider.rating_count = count
+        provider.rating_sum = total
+        provider.rating_score = bayesian_score(count, total)
+        updated.append(provider)
+
+    ServiceProvider.objects.bulk_update(
+        updated, ['rating_count', 'rating_sum', 'rating_score'], batch_size=500
+    )
+    transaction.on_commit(partial(invalidate_providers, [provider.pk for provider in updated]))
+
+    return len(updated)
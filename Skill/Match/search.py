@@ -0,0 +1,488 @@
+import hashlib
+import heapq
+import math
+import re
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.db.models.expressions import RawSQL
+
+from . import geo
+from .utils import haversine_distance, trig_distances
+
+# =========================
+# Full-Text Search Index (SQLite FTS5)
+# =========================
+
+FTS_TABLE = 'Match_service_fts'
+
+# Rows come straight from the service and category tables so the index can
+# be (re)built in a single statement.
+INDEX_SELECT = """
+    SELECT s.id, s.title, s.description, c.name
+    FROM Match_service s
+    JOIN Match_servicecategory c ON c.id = s.category_id
+    WHERE s.is_active AND s.is_verified
+"""
+
+CREATE_INDEX_SQL = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, description, category, tokenize = 'unicode61 remove_diacritics 2'
+    )
+"""
+
+DROP_INDEX_SQL = f"DROP TABLE IF EXISTS {FTS_TABLE}"
+
+
+def fts_enabled(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def build_match_query(text):
+    """
+    Turn free text into an FTS5 query: every word must match, and the
+    words are treated as prefixes ("plumb" finds "plumbing").
+    Returns None when the text has no searchable words.
+    """
+    words = re.findall(r'\w+', text or '')
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def _chunks(ids, size=500):
+    for start in range(0, len(ids), size):
+        chunk = ids[start:start + size]
+        yield chunk, ', '.join(['%s'] * len(chunk))
+
+
+def index_services(service_ids):
+    """
+    Refresh the index rows for the given services. Services that are not
+    active and verified are dropped from the index.
+    """
+    service_ids = [int(pk) for pk in service_ids]
+    if not service_ids:
+        return
+
+    # Every path that changes what a search can return passes through here;
+    # the bump waits for the commit so no search caches the old rows anew
+    transaction.on_commit(bump_search_generation)
+    if not fts_enabled():
+        return
+
+    with connection.cursor() as cursor:
+        for chunk, placeholders in _chunks(service_ids):
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", chunk)
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, description, category) "
+                f"{INDEX_SELECT} AND s.id IN ({placeholders})",
+                chunk
+            )
+
+
+def remove_services(service_ids):
+    service_ids = [int(pk) for pk in service_ids]
+    if not service_ids:
+        return
+
+    transaction.on_commit(bump_search_generation)
+    if not fts_enabled():
+        return
+
+    with connection.cursor() as cursor:
+        for chunk, placeholders in _chunks(service_ids):
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", chunk)
+
+
+def rebuild_index(using=connection):
+    """
+    Recreate the whole index from the service table in bulk.
+    Returns the number of indexed services.
+    """
+    transaction.on_commit(bump_search_generation, using=using.alias)
+    if not fts_enabled(using):
+        return 0
+
+    with using.cursor() as cursor:
+        cursor.execute(CREATE_INDEX_SQL)
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(f"INSERT INTO {FTS_TABLE} (rowid, title, description, category) {INDEX_SELECT}")
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f"SELECT COUNT(*) FROM {FTS_TABLE}")
+        return cursor.fetchone()[0]
+
+
+def ranked_service_ids(text, limit=None):
+    """
+    Service ids matching the text, best BM25 match first (at most limit
+    of them; SQLite keeps only the top rows while ranking).
+    """
+    match = build_match_query(text)
+    if match is None or not fts_enabled():
+        return []
+
+    sql = f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY bm25({FTS_TABLE})"
+    params = [match]
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def filter_services(services, text):
+    """
+    Restrict a Service queryset to full-text matches on title,
+    description and category name.
+    """
+    match = build_match_query(text)
+    if match is None:
+        return services
+
+    if not fts_enabled():
+        return services.filter(
+            Q(title__icontains=text)
+            | Q(description__icontains=text)
+            | Q(category__name__icontains=text)
+        )
+
+    return services.filter(
+        id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (match,))
+    )
+
+
+# =========================
+# Search Result Rows
+# =========================
+
+@dataclass(slots=True)
+class SearchResult:
+    """
+    One row of search results: just the columns the results page shows,
+    read in the same query as the service itself.
+    """
+    id: int
+    title: str
+    description: str
+    category_name: str
+    provider_name: str
+    provider_address: str
+    latitude: float
+    longitude: float
+    rating_count: int
+    distance: float = None
+
+
+RESULT_FIELDS = (
+    'id',
+    'title',
+    'description',
+    'category__name',
+    'provider__company_name',
+    'provider__address',
+    'provider__latitude',
+    'provider__longitude',
+    'provider__rating_count',
+)
+
+
+def result_rows(services):
+    """
+    Project a Service queryset onto SearchResult rows with one joined query.
+    """
+    return [SearchResult(*row) for row in services.values_list(*RESULT_FIELDS)]
+
+
+def rows_for_ids(ids):
+    """
+    SearchResult rows for the given service ids, in the given order.
+    Services no longer listed are skipped, since cached candidates may
+    predate a change another worker made.
+    """
+    from .models import Service
+
+    listed = Service.objects.filter(is_active=True, is_verified=True)
+    found = {}
+    for start in range(0, len(ids), 500):
+        for row in result_rows(listed.filter(id__in=ids[start:start + 500])):
+            found[row.id] = row
+    return [found[pk] for pk in ids if pk in found]
+
+
+# =========================
+# Search Result Cache
+# =========================
+
+# Ranked candidates are cached per normalized query and origin tile; the
+# generation counter retires every entry whenever a listed service or a
+# provider location changes.
+SEARCH_CACHE_ALIAS = getattr(settings, 'SEARCH_CACHE_ALIAS', 'default')
+SEARCH_CACHE_TIMEOUT = getattr(settings, 'SEARCH_CACHE_TIMEOUT', 300)
+
+# Results per page, and how deep paging may go: no search computes more
+# than MAX_SEARCH_WINDOW ranked candidates, in steps of SEARCH_WINDOW_STEP
+SEARCH_PAGE_SIZE = getattr(settings, 'SEARCH_PAGE_SIZE', 20)
+SEARCH_WINDOW_STEP = getattr(settings, 'SEARCH_WINDOW_STEP', 100)
+MAX_SEARCH_WINDOW = getattr(settings, 'MAX_SEARCH_WINDOW', 1000)
+
+# Origins are snapped to tiles of this many degrees (~1.1 km at 0.01)
+SEARCH_TILE_DEGREES = getattr(settings, 'SEARCH_TILE_DEGREES', 0.01)
+
+GENERATION_KEY = 'search:generation'
+HITS_KEY = 'search:hits'
+MISSES_KEY = 'search:misses'
+
+
+def _search_cache():
+    return caches[SEARCH_CACHE_ALIAS]
+
+
+def search_generation():
+    return _search_cache().get_or_set(GENERATION_KEY, lambda: int(time.time() * 1000), None)
+
+
+def bump_search_generation():
+    cache = _search_cache()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, int(time.time() * 1000), None)
+
+
+def _count(key):
+    cache = _search_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def search_cache_stats():
+    cache = _search_cache()
+    counts = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits, misses = counts.get(HITS_KEY, 0), counts.get(MISSES_KEY, 0)
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+    }
+
+
+def normalize_query(text):
+    return ' '.join(re.findall(r'\w+', (text or '').lower()))
+
+
+def tile_of(lat, lon):
+    """
+    Index (row, col) and centre of the tile containing a coordinate.
+    """
+    row = math.floor(lat / SEARCH_TILE_DEGREES)
+    col = math.floor(lon / SEARCH_TILE_DEGREES)
+    centre = ((row + 0.5) * SEARCH_TILE_DEGREES, (col + 0.5) * SEARCH_TILE_DEGREES)
+    return (row, col), centre
+
+
+def _tile_pad_km():
+    """
+    Furthest any origin can be from its tile centre (tiles are widest at
+    the equator).
+    """
+    half = SEARCH_TILE_DEGREES / 2
+    return haversine_distance(0, 0, half, half) * 1.0001
+
+
+def _location_counts(query, services):
+    """
+    (located, unlocated) matching services, counted once per query and
+    generation (not per tile): the total for nearest searches, which have
+    no radius to count within, and the unlocated services listed after
+    every located one.
+    """
+    cache = _search_cache()
+    digest = hashlib.sha1(query.encode()).hexdigest()
+    key = f"search:{search_generation()}:located:{digest}"
+    counts = cache.get(key)
+    if counts is None:
+        counts = services.aggregate(
+            located=Count('id', filter=~Q(provider__geo_cell='')),
+            unlocated=Count('id', filter=Q(provider__geo_cell='')),
+        )
+        counts = (counts['located'], counts['unlocated'])
+        cache.set(key, counts, SEARCH_CACHE_TIMEOUT)
+    return counts
+
+
+def _matching_services(query):
+    from .models import Service
+
+    services = Service.objects.filter(is_active=True, is_verified=True)
+    return filter_services(services, query) if query else services
+
+
+def _candidates(query, centre, radius_km, window):
+    """
+    (total, complete, candidates) for every origin in a tile, where
+    candidates are ranked ids (text searches) or (id, sin_lat, cos_lat,
+    sin_lon, cos_lon) and cover the first `window` results.
+
+    Text searches are ranked and cut off in SQL. Location searches are run
+    from the tile centre (bounding box, distance, ORDER BY and LIMIT all in
+    SQL), widened by the tile's half-diagonal, so the list is a superset of
+    the exact top `window` for any origin inside the tile. total counts every match
+    (within the widened radius for radius searches); complete is True when
+    the candidates hold all of them.
+    """
+    services = _matching_services(query)
+
+    if centre is None:
+        total = services.count()
+        if query and fts_enabled():
+            ids = ranked_service_ids(query, limit=window)
+        else:
+            ids = list(services.order_by('id').values_list('id', flat=True)[:window])
+        return total, len(ids) >= total, ids
+
+    pad = _tile_pad_km()
+    fields = ('id', 'provider__sin_lat', 'provider__cos_lat', 'provider__sin_lon', 'provider__cos_lon', 'distance')
+    if radius_km:
+        reach = radius_km + pad
+        within = geo.within_queryset(services, centre[0], centre[1], reach)
+        points = list(within.values_list(*fields)[:window])
+        total = within.order_by().count()
+        complete = total <= window
+    else:
+        points = list(geo.nearest_queryset(services, centre[0], centre[1], window).values_list(*fields)[:window])
+        total = _location_counts(query, services)[0]
+        complete = False
+        reach = None
+
+    if len(points) >= window:
+        # Anything among the first `window` for an origin in the tile is
+        # within the centre's window-th distance plus twice the pad
+        widened = points[-1][-1] + 2 * pad
+        if reach is None or widened < reach:
+            points = list(geo.within_queryset(services, centre[0], centre[1], widened).values_list(*fields))
+
+    return total, complete, [point[:-1] for point in points]
+
+
+@dataclass
+class SearchPage:
+    """
+    One page of search results. total is exact unless total_is_estimate,
+    and pages stop at MAX_SEARCH_WINDOW results however many match.
+    """
+    results: list
+    page: int
+    page_size: int
+    total: int
+    has_next: bool
+    total_is_estimate: bool = False
+
+    @property
+    def has_previous(self):
+        return self.page > 1
+
+    @property
+    def previous_page(self):
+        return self.page - 1
+
+    @property
+    def next_page(self):
+        return self.page + 1
+
+
+def _window(end):
+    """
+    Candidates to compute for results up to `end`, rounded up so nearby
+    pages share one cache entry.
+    """
+    return min(math.ceil(end / SEARCH_WINDOW_STEP) * SEARCH_WINDOW_STEP, MAX_SEARCH_WINDOW)
+
+
+def search_page(query=None, origin=None, max_distance=None, page=1, page_size=SEARCH_PAGE_SIZE):
+    """
+    One page of active, verified services: text matches best first
+    without an origin, within max_distance km nearest first, or nearest
+    first followed by services with no location. Only the top page * page_size candidates are computed (capped
+    at MAX_SEARCH_WINDOW) and cached per query and tile; exact distances
+    to the real origin are recomputed from the cached trig columns and rows
+    are loaded only for the page.
+    """
+    page_size = max(1, min(int(page_size), MAX_SEARCH_WINDOW))
+    page = max(1, min(int(page), MAX_SEARCH_WINDOW // page_size))
+    start, end = (page - 1) * page_size, page * page_size
+
+    query = normalize_query(query)
+    centre = None
+    tile = None
+    if origin is not None:
+        tile, centre = tile_of(*origin)
+
+    window = _window(end)
+    if origin is None:
+        mode = ('text',)
+    elif max_distance:
+        mode = ('radius', max_distance)
+    else:
+        mode = ('nearest',)
+    digest = hashlib.sha1(repr((query, tile, mode, window)).encode()).hexdigest()
+    key = f"search:{search_generation()}:{digest}"
+
+    cache = _search_cache()
+    entry = cache.get(key)
+    if entry is None:
+        _count(MISSES_KEY)
+        entry = _candidates(query, centre, max_distance, window)
+        cache.set(key, entry, SEARCH_CACHE_TIMEOUT)
+    else:
+        _count(HITS_KEY)
+    total, complete, candidates = entry
+
+    if origin is None:
+        rows = rows_for_ids(candidates[start:end])
+        return SearchPage(rows, page, page_size, total, end < min(total, MAX_SEARCH_WINDOW))
+
+    ranked = []
+    if candidates:
+        _, sin_lats, cos_lats, sin_lons, cos_lons = zip(*candidates)
+        found = trig_distances(geo.trig_of(*origin), sin_lats, cos_lats, sin_lons, cos_lons)
+        ranked = [
+            (float(distance), position)
+            for position, distance in enumerate(found)
+            if not max_distance or distance <= max_distance
+        ]
+    top = heapq.nsmallest(end, ranked)[start:end]
+
+    # Services removed since the candidates were cached have no row
+    distances = {candidates[position][0]: distance for distance, position in top}
+    rows = rows_for_ids(list(distances))
+    for row in rows:
+        row.distance = distances[row.id]
+
+    if not max_distance:
+        # Services without a location follow every located one, with no
+        # distance, in id order
+        located, unlocated = _location_counts(query, _matching_services(query))
+        total = located + unlocated
+        if unlocated and len(rows) < page_size and end > located:
+            offset = max(start - located, 0)
+            ids = (
+                _matching_services(query).filter(provider__geo_cell='')
+                .order_by('id').values_list('id', flat=True)[offset:offset + page_size - len(rows)]
+            )
+            rows += rows_for_ids(list(ids))
+
+    if complete:
+        # Every match within the widened radius is cached; count exactly
+        total = len(ranked)
+    has_next = end < min(total, MAX_SEARCH_WINDOW)
+    return SearchPage(rows, page, page_size, total, has_next, bool(max_distance) and not complete)
@@ -0,0 +1,154 @@
+from functools import partial
+
+from django.contrib.auth.signals import user_logged_in
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import clusters, geo, ratings, search
+from .cache import bump_dashboard
+from .identity import invalidate_providers, invalidate_user
+from .middleware import stamp_session
+from .models import Review, Service, ServiceCategory, ServiceProvider, ServiceRequest, User
+
+
+# =========================
+# Full-Text Search Index
+# =========================
+
+@receiver(post_save, sender=Service)
+def reindex_service(sender, instance, **kwargs):
+    search.index_services([instance.pk])
+
+
+@receiver(post_delete, sender=Service)
+def unindex_service(sender, instance, **kwargs):
+    search.remove_services([instance.pk])
+
+
+@receiver(post_save, sender=ServiceCategory)
+def reindex_category(sender, instance, created, **kwargs):
+    if not created:
+        search.index_services(instance.service_set.values_list('pk', flat=True))
+
+
+# Service changes reach the search cache through the index updates above;
+# providers only matter when they move or are switched off.
+# Cache invalidation in this module waits for the surrounding transaction
+# to commit: a read between an early bump and the commit would cache the
+# old rows under the new version.
+SEARCH_PROVIDER_FIELDS = {'latitude', 'longitude', 'geo_cell', 'is_active'}
+
+
+@receiver(post_save, sender=ServiceProvider)
+def invalidate_provider_searches(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    if update_fields is None or SEARCH_PROVIDER_FIELDS & set(update_fields):
+        transaction.on_commit(search.bump_search_generation)
+
+
+# =========================
+# Provider Rating Aggregates
+# =========================
+
+@receiver(post_save, sender=Review)
+def add_review_to_aggregates(sender, instance, created, **kwargs):
+    if created:
+        ratings.apply_review(instance.provider_id, instance.rating)
+    else:
+        # Edited in the admin: the old rating is unknown, so recount
+        ratings.recompute_ratings([instance.provider_id])
+
+    transaction.on_commit(partial(bump_dashboard, 'provider', instance.provider_id))
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_from_aggregates(sender, instance, **kwargs):
+    ratings.apply_review(instance.provider_id, instance.rating, sign=-1)
+    transaction.on_commit(partial(bump_dashboard, 'provider', instance.provider_id))
+
+
+# =========================
+# Dashboard Cache Invalidation
+# =========================
+
+@receiver(post_save, sender=ServiceRequest)
+@receiver(post_delete, sender=ServiceRequest)
+def invalidate_request_dashboards(sender, instance, **kwargs):
+    # Created, accepted, rejected, completed or removed: both sides change
+    transaction.on_commit(partial(bump_dashboard, 'user', instance.user_id))
+
+    try:
+        transaction.on_commit(partial(bump_dashboard, 'provider', instance.service.provider_id))
+    except ObjectDoesNotExist:
+        pass  # Service removed in the same cascade
+
+
+# =========================
+# Cached Identity Invalidation
+# =========================
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidate_user, instance.pk))
+
+
+@receiver(post_save, sender=ServiceProvider)
+@receiver(post_delete, sender=ServiceProvider)
+def invalidate_cached_provider(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidate_providers, [instance.pk]))
+    transaction.on_commit(partial(invalidate_user, instance.user_id))
+
+
+# =========================
+# Sliding Sessions
+# =========================
+
+@receiver(user_logged_in)
+def stamp_new_session(sender, request, user, **kwargs):
+    # A fresh login is saved anyway; no refresh needed for a while
+    if request is not None and hasattr(request, 'session'):
+        stamp_session(request.session)
+
+
+# =========================
+# Request Categories
+# =========================
+
+@receiver(post_save, sender=Service)
+def sync_request_categories(sender, instance, created, **kwargs):
+    # Requests copy their service's category for the nearby feed
+    if not created:
+        instance.requests.exclude(category_id=instance.category_id).update(category_id=instance.category_id)
+
+
+# =========================
+# Provider Map Tiles
+# =========================
+
+MAP_PROVIDER_FIELDS = {'latitude', 'longitude', 'is_active', 'company_name'}
+
+
+@receiver(post_save, sender=ServiceProvider)
+def invalidate_map_tiles(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or MAP_PROVIDER_FIELDS & set(update_fields):
+        transaction.on_commit(clusters.bump_map_generation)
+
+
+@receiver(post_delete, sender=ServiceProvider)
+def remove_from_map_tiles(sender, instance, **kwargs):
+    transaction.on_commit(clusters.bump_map_generation)
+
+
+# =========================
+# SQL Functions
+# =========================
+
+@receiver(connection_created)
+def register_sql_functions(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        geo.register_sqlite_functions(connection)
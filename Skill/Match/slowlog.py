@@ -0,0 +1,175 @@
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+# =========================
+# Slow-Query Log
+# =========================
+
+# Statements slower than this are logged; None turns the hook off
+SLOW_QUERY_MS = getattr(settings, 'SLOW_QUERY_MS', 100)
+
+SLOW_QUERY_LOG = Path(getattr(settings, 'SLOW_QUERY_LOG', Path(settings.BASE_DIR) / 'logs' / 'slow_queries.jsonl'))
+SLOW_QUERY_LOG_MAX_BYTES = getattr(settings, 'SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024)
+SLOW_QUERY_LOG_BACKUPS = getattr(settings, 'SLOW_QUERY_LOG_BACKUPS', 5)
+
+# Longest repr kept per parameter
+MAX_PARAM_LENGTH = 200
+
+EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+
+_writer = None
+_writer_lock = threading.Lock()
+
+_IN_LIST = re.compile(r'\bIN \((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?\b')
+_SPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """
+    Normalize a statement so executions that differ only in literal values
+    or IN-list length group together. Returns (hash, normalized SQL).
+    """
+    normalized = _STRING.sub('?', sql)
+    normalized = _NUMBER.sub('?', normalized)
+    normalized = normalized.replace('%s', '?')
+    normalized = _IN_LIST.sub('IN (...)', normalized)
+    normalized = _SPACE.sub(' ', normalized).strip()
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12], normalized
+
+
+def _jsonable(value):
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    text = str(value)
+    return text if len(text) <= MAX_PARAM_LENGTH else text[:MAX_PARAM_LENGTH] + '...'
+
+
+def explain(sql, params):
+    """
+    EXPLAIN QUERY PLAN rows for a statement, run on the raw sqlite3
+    connection so it is neither timed nor logged itself. Returns None on
+    other databases or for statements that cannot be explained.
+    """
+    if connection.vendor != 'sqlite' or connection.connection is None:
+        return None
+    if not sql.lstrip().upper().startswith(EXPLAINABLE):
+        return None
+    if params is not None and not isinstance(params, (list, tuple)):
+        return None
+
+    try:
+        if params is None:
+            cursor = connection.connection.execute('EXPLAIN QUERY PLAN ' + sql)
+        else:
+            query = sql % tuple('?' * len(params))
+            cursor = connection.connection.execute('EXPLAIN QUERY PLAN ' + query, tuple(params))
+        return [row[-1] for row in cursor.fetchall()]
+    except (sqlite3.Error, TypeError, ValueError):
+        return None
+
+
+def _log():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            SLOW_QUERY_LOG.parent.mkdir(parents=True, exist_ok=True)
+            handler = RotatingFileHandler(
+                SLOW_QUERY_LOG,
+                maxBytes=SLOW_QUERY_LOG_MAX_BYTES,
+                backupCount=SLOW_QUERY_LOG_BACKUPS,
+                encoding='utf-8',
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            writer = logging.getLogger('Match.slowlog')
+            writer.setLevel(logging.INFO)
+            writer.propagate = False
+            writer.addHandler(handler)
+            _writer = writer
+        return _writer
+
+
+def write_entry(entry):
+    _log().info(json.dumps(entry, default=str))
+
+
+class SlowQueryHook:
+    """
+    connection.execute_wrapper hook writing every statement slower than
+    threshold_ms to the slow-query log. view is a string or a callable
+    returning one at log time (the URL is resolved after the first
+    middleware queries run).
+    """
+
+    def __init__(self, view, threshold_ms=None):
+        self.view = view
+        self.threshold = (SLOW_QUERY_MS if threshold_ms is None else threshold_ms) / 1000
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            if duration >= self.threshold:
+                self.log(sql, params, many, duration)
+
+    def log(self, sql, params, many, duration):
+        digest, normalized = fingerprint(sql)
+        write_entry({
+            'at': timezone.now().isoformat(),
+            'view': self.view() if callable(self.view) else self.view,
+            'fingerprint': digest,
+            'normalized': normalized,
+            'sql': sql,
+            'params': None if many else [_jsonable(p) for p in (params or ())],
+            'many': many,
+            'duration_ms': round(duration * 1000, 3),
+            'plan': None if many else explain(sql, params),
+        })
+
+
+@contextmanager
+def log_slow_queries(view, threshold_ms=None):
+    """
+    Log slow statements run inside the block under the given view label,
+    e.g. from a management command.
+    """
+    threshold_ms = SLOW_QUERY_MS if threshold_ms is None else threshold_ms
+    if threshold_ms is None:
+        yield
+        return
+
+    with connection.execute_wrapper(SlowQueryHook(view, threshold_ms)):
+        yield
+
+
+def read_entries(path=SLOW_QUERY_LOG):
+    """
+    Entries from the log and its rotated backups, oldest file first.
+    """
+    path = Path(path)
+    backups = [p for p in path.parent.glob(path.name + '.*') if p.suffix[1:].isdigit()]
+    backups.sort(key=lambda p: int(p.suffix[1:]), reverse=True)
+    for file in backups + [path]:
+        if not file.exists():
+            continue
+        with open(file, encoding='utf-8') as fh:
+            for line in fh:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
@@ -0,0 +1,53 @@
+from datetime import datetime
+
+from dateutil.relativedelta import relativedelta
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+# =========================
+# Dashboard Request Stats
+# =========================
+
+STATUSES = ('pending', 'accepted', 'completed', 'rejected')
+
+
+def request_stats(requests_qs, months=6):
+    """
+    Status counts and a monthly request trend for a ServiceRequest queryset,
+    in two queries: one conditional aggregate and one TruncMonth grouping.
+    """
+    requests_qs = requests_qs.order_by()
+
+    counts = requests_qs.aggregate(
+        total=Count('id'),
+        **{status: Count('id', filter=Q(status=status)) for status in STATUSES}
+    )
+
+    # Calendar months in the window, oldest first
+    this_month = timezone.localdate().replace(day=1)
+    month_starts = [this_month - relativedelta(months=i) for i in range(months - 1, -1, -1)]
+    window_start = timezone.make_aware(datetime.combine(month_starts[0], datetime.min.time()))
+
+    per_month = {
+        (row['month'].year, row['month'].month): row['count']
+        for row in requests_qs
+        .filter(created_at__gte=window_start)
+        .annotate(month=TruncMonth('created_at'))
+        .values('month')
+        .annotate(count=Count('id'))
+    }
+
+    total = counts['total']
+    completed = counts['completed']
+
+    return {
+        'total_requests': total,
+        'pending_requests': counts['pending'],
+        'accepted_requests': counts['accepted'],
+        'completed_requests': completed,
+        'rejected_requests': counts['rejected'],
+        'completion_rate': round((completed / total) * 100, 1) if total else 0,
+        'months': [start.strftime("%b %Y") for start in month_starts],
+        'monthly_requests': [per_month.get((start.year, start.month), 0) for start in month_starts],
+    }
@@ -1,3 +1,1579 @@
-from django.test import TestCase
+import io
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import unittest
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail import EmailMessage
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    clusters, geo, identity, mail as pooled_mail, matching, metrics, middleware, nearby, outbox, profiling, ratings, search, slowlog,
+)
+from .cache import dashboard_version
+from .pagination import decode_cursor, keyset_page
+from .stats import request_stats
+from .geo import covering_cells, grid_cell
+from .models import User, ServiceProvider, ServiceCategory, Service, ServiceRequest, Review, EmailOutbox
+from .utils import (
+    find_best_company, haversine_distance, haversine_distances, haversine_pairwise, np, trig_distance,
+    trig_distances,
+)
+
+
+# Whole-page query budgets: session + user, profile lookup, two stats
+# queries and the recent lists. A freshly stamped session is not saved.
+PROVIDER_DASHBOARD_QUERIES = 7
+USER_DASHBOARD_QUERIES = 5
+
+# Once user, profile and stats are cached: the session and the recent lists
+WARM_PROVIDER_DASHBOARD_QUERIES = 3
+
+# Search page: session, user, candidates, match count and the page's rows
+SEARCH_QUERIES = 5
+# Location searches past one candidate window re-query a widened radius
+WIDENED_SEARCH_QUERIES = SEARCH_QUERIES + 1
+
+
+def make_provider(username, lat=None, lon=None, **extra):
+    user = User.objects.create_user(username=username, role='company')
+    return ServiceProvider.objects.create(
+        user=user,
+        company_name=f"{username} Ltd",
+        contact_number='0700000000',
+        address='Nairobi',
+        latitude=lat,
+        longitude=lon,
+        profile_completed=True,
+        **extra
+    )
+
+
+def make_service(provider, title='Plumbing', category=None, **extra):
+    if category is None:
+        category, _ = ServiceCategory.objects.get_or_create(name='Plumbing')
+    extra.setdefault('is_verified', True)
+    return Service.objects.create(
+        provider=provider,
+        category=category,
+        title=title,
+        description=f"{title} services",
+        **extra
+    )
+
+
+# =========================
+# Spatial Grid Index
+# =========================
+
+class GridCellTests(TestCase):
+
+    def test_cell_kept_in_sync_on_save(self):
+        provider = make_provider('acme', -1.28, 36.82)
+        self.assertEqual(provider.geo_cell, grid_cell(-1.28, 36.82))
+
+        provider.latitude, provider.longitude = 51.5, -0.12
+        provider.save(update_fields=['latitude', 'longitude'])
+        provider.refresh_from_db()
+        self.assertEqual(provider.geo_cell, grid_cell(51.5, -0.12))
+
+    def test_missing_coordinates_have_no_cell(self):
+        self.assertEqual(make_provider('nowhere').geo_cell, '')
+
+    def test_cells_wrap_across_antimeridian(self):
+        cells = covering_cells(0, 179.9, 50)
+        self.assertIn(grid_cell(0, -179.9), cells)
+        self.assertIn(grid_cell(0, 179.9), cells)
+
+    def test_cells_near_pole_cover_all_longitudes(self):
+        cells = covering_cells(89.9, 0, 50)
+        self.assertIn(grid_cell(89.9, 180), cells)
+        self.assertIn(grid_cell(89.9, -90), cells)
+
+    def test_huge_radius_disables_index(self):
+        self.assertIsNone(covering_cells(0, 0, 20000))
+
+
+class GeoQueryTests(TestCase):
+
+    def setUp(self):
+        self.near = make_service(make_provider('near', -1.29, 36.82))
+        self.mid = make_service(make_provider('mid', -1.0, 37.0))
+        self.far = make_service(make_provider('far', 51.5, -0.12))
+        self.dateline = make_service(make_provider('fiji', -17.0, -179.95))
+        make_service(make_provider('unlocated'))
+        self.services = Service.objects.filter(is_active=True, is_verified=True)
+
+    def test_radius_query_is_exact(self):
+        results = geo.within_queryset(self.services, -1.28, 36.82, 50)
+        self.assertEqual([row.id for row in results], [self.near.pk, self.mid.pk])
+        for row in results:
+            self.assertLessEqual(row.distance, 50)
+
+    def test_radius_query_across_antimeridian(self):
+        results = geo.within_queryset(self.services, -17.0, 179.95, 20)
+        self.assertEqual([row.id for row in results], [self.dateline.pk])
+
+    def test_nearest_expands_until_k_found(self):
+        results = geo.nearest_queryset(self.services, -1.28, 36.82, 3)[:3]
+        self.assertEqual([row.id for row in results], [self.near.pk, self.mid.pk, self.far.pk])
+        self.assertAlmostEqual(
+            results[2].distance, haversine_distance(-1.28, 36.82, 51.5, -0.12), places=3
+        )
+
+    def test_search_view_radius(self):
+        seeker = User.objects.create_user(username='seeker', role='user')
+        self.client.force_login(seeker)
+
+        response = self.client.get(
+            reverse('search_services'),
+            {'lat': '-1.28', 'lon': '36.82', 'radius': '10'}
+        )
+
+        self.assertEqual(
+            [row.id for row in response.context['services']],
+            [self.near.pk]
+        )
+
+    def test_search_view_lists_unlocated_services_last(self):
+        unlocated = Service.objects.get(provider__company_name='unlocated Ltd')
+        self.client.force_login(User.objects.create_user(username='seeker', role='user'))
+
+        response = self.client.get(reverse('search_services'), {'q': 'plumb', 'lat': '-1.28', 'lon': '36.82'})
+        services = response.context['services']
+        self.assertEqual(services[-1].id, unlocated.pk)
+        self.assertIsNone(services[-1].distance)
+        self.assertContains(response, 'Distance unavailable')
+
+    def test_search_view_ignores_unusable_coordinates(self):
+        self.client.force_login(User.objects.create_user(username='seeker', role='user'))
+        url = reverse('search_services')
+
+        for lat in ('nan', 'inf', '-inf', '1e308', '91', 'x'):
+            with self.subTest(lat=lat):
+                response = self.client.get(url, {'lat': lat, 'lon': '36.82'})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.context['services']), 5)  # Text order, no origin
+                self.assertTrue(all(row.distance is None for row in response.context['services']))
+
+        response = self.client.get(url, {'lat': '-1.28', 'lon': '181'})
+        self.assertTrue(all(row.distance is None for row in response.context['services']))
+
+    def test_search_view_ignores_unusable_radius(self):
+        self.client.force_login(User.objects.create_user(username='seeker', role='user'))
+        url = reverse('search_services')
+
+        for radius in ('nan', 'inf', '-inf', '1e999', '-5'):
+            with self.subTest(radius=radius):
+                response = self.client.get(url, {'lat': '-1.28', 'lon': '36.82', 'max_distance': radius})
+                self.assertEqual(response.status_code, 200)
+                self.assertIsNone(response.context['max_distance'])
+                self.assertEqual(response.context['services'][0].id, self.near.pk)  # Nearest first
+
+
+# =========================
+# Batch Haversine
+# =========================
+
+class BatchHaversineTests(SimpleTestCase):
+    lats = [-1.286389, 51.5, -33.9, 89.99, -17.0, 0.0]
+    lons = [36.817223, -0.12, 18.4, 45.0, -179.95, 180.0]
+
+    def test_batch_matches_scalar(self):
+        distances = haversine_distances(-1.0, 37.0, self.lats, self.lons)
+        for lat, lon, distance in zip(self.lats, self.lons, distances):
+            self.assertAlmostEqual(distance, haversine_distance(-1.0, 37.0, lat, lon), delta=1e-9)
+
+    def test_pairwise_matches_scalar(self):
+        matrix = haversine_pairwise(self.lats[:2], self.lons[:2], self.lats, self.lons)
+        for i in range(2):
+            for j, (lat, lon) in enumerate(zip(self.lats, self.lons)):
+                expected = haversine_distance(self.lats[i], self.lons[i], lat, lon)
+                self.assertAlmostEqual(matrix[i][j], expected, delta=1e-9)
+
+
+# =========================
+# Full-Text Search
+# =========================
+
+class FullTextSearchTests(TestCase):
+
+    def setUp(self):
+        provider = make_provider('acme')
+        electrical, _ = ServiceCategory.objects.get_or_create(name='Electrical')
+        self.plumbing = make_service(provider, 'Plumbing repairs')
+        self.wiring = make_service(provider, 'House wiring', category=electrical)
+        self.pending = make_service(provider, 'Plumbing installs', is_verified=False)
+
+    def test_matches_title_description_and_category_by_prefix(self):
+        self.assertEqual(search.ranked_service_ids('plumb'), [self.plumbing.pk])
+        self.assertEqual(search.ranked_service_ids('electric'), [self.wiring.pk])
+        self.assertEqual(search.ranked_service_ids('wiring services'), [self.wiring.pk])
+
+    def test_index_follows_edits_verification_and_deletes(self):
+        self.wiring.title = 'Solar panels'
+        self.wiring.description = 'Rooftop solar'
+        self.wiring.save()
+        self.assertEqual(search.ranked_service_ids('solar'), [self.wiring.pk])
+        self.assertEqual(search.ranked_service_ids('wiring'), [])
+
+        Service.objects.filter(pk=self.pending.pk).update(is_verified=True)
+        search.index_services([self.pending.pk])
+        self.assertCountEqual(search.ranked_service_ids('plumbing'), [self.plumbing.pk, self.pending.pk])
+
+        self.plumbing.delete()
+        self.assertEqual(search.ranked_service_ids('plumbing'), [self.pending.pk])
+
+    def test_category_rename_reindexes_services(self):
+        category = self.wiring.category
+        category.name = 'Electrician'
+        category.save()
+        self.assertEqual(search.ranked_service_ids('electrician'), [self.wiring.pk])
+
+    def test_rebuild_index(self):
+        self.assertEqual(search.rebuild_index(), 2)
+
+    def test_filter_services(self):
+        services = search.filter_services(Service.objects.all(), 'plumbing "repairs')
+        self.assertEqual(list(services), [self.plumbing])
+
+
+# =========================
+# Rating Aggregates
+# =========================
+
+class RatingAggregateTests(TestCase):
+
+    def setUp(self):
+        self.provider = make_provider('acme')
+        self.service = make_service(self.provider)
+        self.seeker = User.objects.create_user(username='seeker', role='user')
+
+    def review(self, rating):
+        service_request = ServiceRequest.objects.create(
+            user=self.seeker, service=self.service, location='Nairobi', status='completed'
+        )
+        return Review.objects.create(
+            service_request=service_request, provider=self.provider, user=self.seeker, rating=rating
+        )
+
+    def test_new_provider_scores_the_prior(self):
+        self.assertEqual(self.provider.rating_score, ratings.PRIOR_MEAN)
+        self.assertIsNone(self.provider.rating_average)
+
+    def test_create_and_delete_update_aggregates(self):
+        self.review(5)
+        low = self.review(2)
+        self.provider.refresh_from_db()
+        self.assertEqual((self.provider.rating_count, self.provider.rating_sum), (2, 7))
+        self.assertEqual(self.provider.rating_average, 3.5)
+        self.assertAlmostEqual(self.provider.rating_score, ratings.bayesian_score(2, 7))
+
+        low.delete()
+        self.provider.refresh_from_db()
+        self.assertEqual((self.provider.rating_count, self.provider.rating_sum), (1, 5))
+        self.assertAlmostEqual(self.provider.rating_score, ratings.bayesian_score(1, 5))
+
+    def test_recompute_repairs_drift(self):
+        self.review(4)
+        ServiceProvider.objects.update(rating_count=9, rating_sum=1, rating_score=0)
+
+        with self.assertNumQueries(3):  # grouped read, provider scan, bulk update
+            ratings.recompute_ratings()
+
+        self.provider.refresh_from_db()
+        self.assertEqual((self.provider.rating_count, self.provider.rating_sum), (1, 4))
+        self.assertAlmostEqual(self.provider.rating_score, ratings.bayesian_score(1, 4))
+
+
+# =========================
+# Dashboard Stats
+# =========================
+
+class DashboardStatsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.provider = make_provider('acme')
+        self.service = make_service(self.provider)
+        self.seeker = User.objects.create_user(username='seeker', role='user')
+
+        now = timezone.now()
+        for days_ago, status in [(0, 'pending'), (0, 'completed'), (40, 'completed'), (100, 'rejected'), (400, 'accepted')]:
+            service_request = ServiceRequest.objects.create(
+                user=self.seeker, service=self.service, location='Nairobi', status=status
+            )
+            ServiceRequest.objects.filter(pk=service_request.pk).update(created_at=now - timedelta(days=days_ago))
+
+    def test_counts_and_trend_in_two_queries(self):
+        with self.assertNumQueries(2):
+            stats = request_stats(ServiceRequest.objects.filter(user=self.seeker), months=6)
+
+        self.assertEqual(stats['total_requests'], 5)
+        self.assertEqual(
+            [stats[f'{s}_requests'] for s in ('pending', 'accepted', 'completed', 'rejected')],
+            [1, 1, 2, 1]
+        )
+        self.assertEqual(stats['completion_rate'], 40.0)
+        self.assertEqual(len(stats['months']), 6)
+        self.assertEqual(stats['monthly_requests'][-1], 2)
+        self.assertEqual(sum(stats['monthly_requests']), 4)
+
+    def test_window_length_is_configurable(self):
+        stats = request_stats(ServiceRequest.objects.all(), months=24)
+        self.assertEqual(len(stats['monthly_requests']), 24)
+        self.assertEqual(sum(stats['monthly_requests']), 5)
+
+    def test_empty_queryset(self):
+        stats = request_stats(ServiceRequest.objects.none(), months=3)
+        self.assertEqual(stats['completion_rate'], 0)
+        self.assertEqual(stats['monthly_requests'], [0, 0, 0])
+
+    def test_provider_dashboard_query_budget(self):
+        self.client.force_login(self.provider.user)
+        with self.assertNumQueries(PROVIDER_DASHBOARD_QUERIES):
+            self.client.get(reverse('provider_dashboard'))
+
+    def test_user_dashboard_query_budget(self):
+        self.client.force_login(self.seeker)
+        with self.assertNumQueries(USER_DASHBOARD_QUERIES):
+            self.client.get(reverse('user_dashboard'))
+
+
+# =========================
+# Dashboard Cache
+# =========================
+
+class DashboardCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.provider = make_provider('acme')
+        self.service = make_service(self.provider)
+        self.seeker = User.objects.create_user(username='seeker', role='user')
+        self.service_request = ServiceRequest.objects.create(
+            user=self.seeker, service=self.service, location='Nairobi'
+        )
+
+    def dashboard(self, user, name):
+        self.client.force_login(user)
+        return self.client.get(reverse(name)).context
+
+    @mock.patch.object(identity, 'IDENTITY_CACHE_USERS', True)
+    def test_warm_dashboard_skips_stats_queries(self):
+        self.dashboard(self.provider.user, 'provider_dashboard')
+        with self.assertNumQueries(WARM_PROVIDER_DASHBOARD_QUERIES):
+            self.client.get(reverse('provider_dashboard'))
+
+    def test_state_changes_invalidate_both_dashboards(self):
+        self.assertEqual(self.dashboard(self.provider.user, 'provider_dashboard')['pending_requests'], 1)
+        self.assertEqual(self.dashboard(self.seeker, 'user_dashboard')['pending_requests'], 1)
+
+        self.client.force_login(self.provider.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('complete_request', args=[self.service_request.pk]))
+
+        context = self.dashboard(self.provider.user, 'provider_dashboard')
+        self.assertEqual((context['pending_requests'], context['completed_requests']), (0, 1))
+        self.assertEqual(self.dashboard(self.seeker, 'user_dashboard')['completed_requests'], 1)
+
+        self.client.force_login(self.seeker)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('submit_review', args=[self.service_request.pk]), {'rating': 4})
+        self.assertEqual(self.dashboard(self.provider.user, 'provider_dashboard')['avg_rating'], 4.0)
+
+    def test_versions_move_only_after_commit(self):
+        versions = dashboard_version('user', self.seeker.pk), dashboard_version('provider', self.provider.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.service_request.status = 'accepted'
+            self.service_request.save()
+            # Still uncommitted: a dashboard rebuilt now must not take a new version
+            self.assertEqual(
+                (dashboard_version('user', self.seeker.pk), dashboard_version('provider', self.provider.pk)),
+                versions,
+            )
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(dashboard_version('user', self.seeker.pk), versions[0])
+        self.assertNotEqual(dashboard_version('provider', self.provider.pk), versions[1])
+
+
+# =========================
+# Email Outbox
+# =========================
+
+class FailingBackend(locmem.EmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionRefusedError("SMTP down")
+
+
+class SilentBackend(locmem.EmailBackend):
+    def send_messages(self, messages):
+        return 0
+
+
+class EmailOutboxTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.provider = make_provider('acme')
+        self.provider.user.email = 'acme@example.com'
+        self.provider.user.save()
+        self.service = make_service(self.provider)
+        self.seeker = User.objects.create_user(username='seeker', email='seeker@example.com', role='user')
+
+    def test_views_queue_instead_of_sending(self):
+        self.client.force_login(self.seeker)
+        self.client.post(reverse('create_request', args=[self.service.pk]), {'location': 'Nairobi', 'description': 'Leaking tap'})
+        service_request = ServiceRequest.objects.get()
+
+        self.client.force_login(self.provider.user)
+        with self.settings(EMAIL_BACKEND='Match.tests.FailingBackend'):
+            response = self.client.get(reverse('accept_request', args=[service_request.pk]))
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(
+            list(EmailOutbox.objects.order_by('id').values_list('recipients', flat=True)),
+            [['acme@example.com'], ['seeker@example.com']]
+        )
+
+    def test_worker_delivers_batch(self):
+        outbox.enqueue_email('One', 'Body', 'a@example.com')
+        outbox.enqueue_email('Two', 'Body', ['b@example.com'])
+
+        self.assertEqual(outbox.deliver_batch(), (2, 0, 0))
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertFalse(EmailOutbox.objects.exclude(status='sent').exists())
+        self.assertEqual(outbox.deliver_batch(), (0, 0, 0))
+
+    def test_failures_back_off_then_dead_letter(self):
+        email = outbox.enqueue_email('One', 'Body', 'a@example.com')
+        failing = FailingBackend()
+
+        with self.assertLogs('Match.outbox', 'WARNING'):
+            self.assertEqual(outbox.deliver_batch(max_attempts=2, connection=failing), (0, 1, 0))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('pending', 1))
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertIn('SMTP down', email.last_error)
+
+        # Not due yet
+        self.assertEqual(outbox.deliver_batch(max_attempts=2, connection=failing), (0, 0, 0))
+
+        EmailOutbox.objects.update(next_attempt_at=timezone.now())
+        with self.assertLogs('Match.outbox', 'ERROR'):
+            self.assertEqual(outbox.deliver_batch(max_attempts=2, connection=failing), (0, 0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'dead')
+
+    def test_zero_sent_counts_as_failure(self):
+        email = outbox.enqueue_email('One', 'Body', 'a@example.com')
+
+        with self.assertLogs('Match.outbox', 'WARNING'):
+            self.assertEqual(outbox.deliver_batch(max_attempts=2, connection=SilentBackend()), (0, 1, 0))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('pending', 1))
+        self.assertIn('0 messages', email.last_error)
+
+    def test_backoff_is_exponential_and_capped(self):
+        self.assertLess(outbox.backoff_delay(1), outbox.backoff_delay(2))
+        self.assertEqual(outbox.backoff_delay(50).total_seconds(), outbox.OUTBOX_MAX_BACKOFF_SECONDS)
+
+
+# =========================
+# Pooled SMTP Backend
+# =========================
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:  # Optional test dependency
+    Controller = None
+
+
+class CollectingHandler:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return '250 OK'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@unittest.skipIf(Controller is None, "aiosmtpd is not installed")
+class PooledEmailBackendTests(SimpleTestCase):
+
+    def setUp(self):
+        pooled_mail.reset_pool()
+        self.handler = CollectingHandler()
+        self.controller = Controller(self.handler, hostname='127.0.0.1', port=free_port())
+        self.controller.start()
+        self.addCleanup(self.controller.stop)
+        self.addCleanup(pooled_mail.reset_pool)
+
+    def backend(self):
+        return pooled_mail.PooledEmailBackend(
+            host='127.0.0.1', port=self.controller.port, username='', password='', use_tls=False
+        )
+
+    def message(self, n):
+        return EmailMessage(f"Message {n}", "Body", 'noreply@example.com', ['to@example.com'])
+
+    def test_connections_are_reused_across_backends(self):
+        self.assertEqual(self.backend().send_messages([self.message(1), self.message(2)]), 2)
+        self.assertEqual(self.backend().send_messages([self.message(3)]), 1)
+
+        stats = pooled_mail.pool_stats()
+        self.assertEqual((stats['opened'], stats['reused'], stats['sent'], stats['batches']), (1, 1, 3, 2))
+        self.assertEqual(stats['idle'], 1)
+        self.assertEqual(len(self.handler.messages), 3)
+
+    def test_reconnects_when_pooled_connection_died(self):
+        self.backend().send_messages([self.message(1)])
+
+        # Simulate the server dropping the idle connection
+        connection, _ = next(iter(pooled_mail._pool.values()))[0]
+        connection.sock.shutdown(socket.SHUT_RDWR)
+
+        self.assertEqual(self.backend().send_messages([self.message(2)]), 1)
+        stats = pooled_mail.pool_stats()
+        self.assertEqual((stats['reconnected'], stats['discarded']), (1, 1))
+        self.assertEqual(len(self.handler.messages), 2)
+
+
+# =========================
+# Matching Engine
+# =========================
+
+class MatchingEngineTests(TestCase):
+
+    def setUp(self):
+        self.plumbing, _ = ServiceCategory.objects.get_or_create(name='Plumbing')
+        self.painting, _ = ServiceCategory.objects.get_or_create(name='Painting')
+        self.seeker = User.objects.create_user(username='seeker', role='user')
+
+        self.near = make_service(make_provider('near', -1.29, 36.82), category=self.plumbing)
+        self.far = make_service(make_provider('far', -0.5, 37.5), category=self.plumbing)
+        self.painter = make_service(make_provider('painter', -1.29, 36.82), category=self.painting)
+        make_service(make_provider('hidden', -1.29, 36.82), category=self.plumbing, is_verified=False)
+
+    def request_for(self, service, lat=-1.29, lon=36.82):
+        return ServiceRequest.objects.create(
+            user=self.seeker, service=service, location='Nairobi', latitude=lat, longitude=lon
+        )
+
+    def test_ranks_category_then_distance(self):
+        results = matching.match_request(self.request_for(self.far), k=3)
+        self.assertEqual(
+            [r.service_id for r in results],
+            [self.near.pk, self.far.pk, self.painter.pk]
+        )
+        self.assertEqual(results[0].distance, 0)
+
+    def test_top_k_is_bounded(self):
+        self.assertEqual(len(matching.match_request(self.request_for(self.far), k=1)), 1)
+
+    def test_radius_limits_candidates(self):
+        results = matching.match_request(self.request_for(self.far), k=5, radius_km=20)
+        self.assertEqual({r.service_id for r in results}, {self.near.pk, self.painter.pk})
+
+    def test_load_and_weights(self):
+        # Pile open work on the nearby plumber; with load dominating, the far one wins
+        for _ in range(10):
+            self.request_for(self.near)
+
+        results = matching.match_request(
+            self.request_for(self.far), k=1,
+            weights={'category': 0, 'distance': 0, 'rating': 0, 'load': 1}
+        )
+        self.assertNotEqual(results[0].provider_id, self.near.provider_id)
+
+    def test_rating_breaks_ties(self):
+        twin = make_service(make_provider('twin', -1.29, 36.82), category=self.plumbing)
+        ServiceProvider.objects.filter(pk=twin.provider_id).update(rating_score=4.8)
+
+        results = matching.match_request(self.request_for(self.far), k=1)
+        self.assertEqual(results[0].service_id, twin.pk)
+
+    def test_find_best_company(self):
+        self.assertEqual(find_best_company(self.request_for(self.far)), self.near.provider)
+
+
+# =========================
+# Keyset Pagination
+# =========================
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        self.provider = make_provider('acme')
+        self.service = make_service(self.provider)
+        self.seeker = User.objects.create_user(username='seeker', role='user')
+
+        # Several requests share a timestamp so the id tiebreak matters
+        now = timezone.now()
+        for n in range(7):
+            service_request = ServiceRequest.objects.create(
+                user=self.seeker, service=self.service, location='Nairobi',
+                status='completed' if n % 2 else 'pending'
+            )
+            ServiceRequest.objects.filter(pk=service_request.pk).update(created_at=now - timedelta(hours=n // 3))
+
+    def test_pages_cover_history_once_in_order(self):
+        expected = list(ServiceRequest.objects.order_by('-created_at', '-id'))
+
+        seen, cursor = [], None
+        while True:
+            page, cursor = keyset_page(ServiceRequest.objects.all(), cursor, page_size=3)
+            seen.extend(page)
+            if cursor is None:
+                break
+
+        self.assertEqual(seen, expected)
+
+    def test_bad_cursor_starts_over(self):
+        self.assertIsNone(decode_cursor('not-a-cursor'))
+        page, _ = keyset_page(ServiceRequest.objects.all(), 'garbage', page_size=2)
+        self.assertEqual(len(page), 2)
+
+    def test_provider_feed_with_status_filter(self):
+        self.client.force_login(self.provider.user)
+        url = reverse('provider_requests_feed')
+
+        first = self.client.get(url, {'status': 'pending', 'page_size': 3}).json()
+        self.assertEqual(len(first['results']), 3)
+        self.assertEqual({row['status'] for row in first['results']}, {'pending'})
+
+        second = self.client.get(url, {'status': 'pending', 'page_size': 3, 'cursor': first['next_cursor']}).json()
+        self.assertEqual(len(second['results']), 1)
+        self.assertIsNone(second['next_cursor'])
+
+    def test_page_views_render_one_page(self):
+        self.client.force_login(self.seeker)
+        response = self.client.get(reverse('my_requests'), {'status': 'completed'})
+        self.assertEqual(len(response.context['requests']), 3)
+
+        self.client.force_login(self.provider.user)
+        response = self.client.get(reverse('provider_requests'))
+        self.assertEqual(len(response.context['service_requests']), 7)
+        self.assertIsNone(response.context['next_cursor'])
+
+        self.assertEqual(self.client.get(reverse('my_requests_feed')).status_code, 403)
+
+
+# =========================
+# Search Result Rows
+# =========================
+
+class SearchQueryCountTests(TestCase):
+
+    def setUp(self):
+        self.seeker = User.objects.create_user(username='seeker', role='user')
+        self.category, _ = ServiceCategory.objects.get_or_create(name='Plumbing')
+
+    def add_services(self, count):
+        start = User.objects.count()
+        providers = [
+            ServiceProvider(
+                user=User.objects.create(username=f'p{start + n}', role='company'),
+                company_name=f'Provider {n}', contact_number='0700', address='Nairobi',
+                latitude=-1.28 + n / 10000, longitude=36.82, geo_cell=grid_cell(-1.28 + n / 10000, 36.82),
+                **geo.coordinate_values(-1.28 + n / 10000, 36.82),
+            )
+            for n in range(count)
+        ]
+        ServiceProvider.objects.bulk_create(providers)
+        Service.objects.bulk_create(
+            Service(provider=p, category=self.category, title='Plumbing', description='Pipes', is_verified=True)
+            for p in ServiceProvider.objects.filter(services=None)
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            search.rebuild_index()
+
+    def search_queries(self, params):
+        self.client.force_login(self.seeker)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('search_services'), params)
+        return len(queries), response.context['page']
+
+    def test_query_count_is_constant(self):
+        for params, windowed in (
+            ({'q': 'plumb'}, SEARCH_QUERIES),
+            ({'lat': '-1.28', 'lon': '36.82', 'radius': '100'}, WIDENED_SEARCH_QUERIES),
+        ):
+            self.add_services(1)
+            count, page = self.search_queries(params)
+            self.assertEqual(len(page.results), 1)
+            self.assertEqual(count, SEARCH_QUERIES)
+
+            # Once the candidate window fills, a location search widens its
+            # candidates once; from there the count no longer grows
+            for added, total in ((299, 300), (300, 600)):
+                self.add_services(added)
+                count, page = self.search_queries(params)
+                self.assertEqual(len(page.results), search.SEARCH_PAGE_SIZE)
+                self.assertEqual(page.total, total)
+                self.assertEqual(count, windowed, total)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                Service.objects.all().delete()
+                ServiceProvider.objects.all().delete()
+
+    def test_result_rows_project_in_one_query(self):
+        self.add_services(3)
+        with self.assertNumQueries(1):
+            rows = search.result_rows(Service.objects.all())
+        self.assertEqual(rows[0].category_name, 'Plumbing')
+        self.assertFalse(hasattr(rows[0], '__dict__'))
+
+
+# =========================
+# Marketplace Seeding
+# =========================
+
+class SeedMarketplaceTests(TestCase):
+    def test_seeds_consistent_marketplace(self):
+        call_command(
+            'seed_marketplace', users=20, providers=10, services_per_provider=2,
+            requests=200, days=90, chunk_size=50, stdout=open(os.devnull, 'w'),
+        )
+
+        self.assertEqual(ServiceProvider.objects.count(), 10)
+        self.assertEqual(Service.objects.count(), 20)
+        self.assertEqual(ServiceRequest.objects.count(), 200)
+
+        # Timestamps are spread out, not all stamped "now"
+        oldest = ServiceRequest.objects.order_by('created_at').first().created_at
+        self.assertLess(oldest, timezone.now() - timedelta(days=7))
+
+        # Derived data bulk_create skipped is rebuilt
+        self.assertFalse(ServiceProvider.objects.filter(geo_cell='').exists())
+        reviewed = ServiceProvider.objects.filter(reviews__isnull=False).distinct()
+        for provider in reviewed:
+            self.assertEqual(provider.rating_count, provider.reviews.count())
+        self.assertTrue(search.ranked_service_ids('services'))
+
+
+# =========================
+# Per-View Metrics
+# =========================
+
+class MetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.seeker = User.objects.create_user(username='seeker', role='user')
+        self.client.force_login(self.seeker)
+
+    def test_records_per_view_histograms(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('search_services'), {'q': 'plumb'})
+
+        histograms, responses = metrics.snapshot()
+        self.assertEqual(responses[('search_services', 200)], 1)
+
+        counts, total, count = histograms[('match_request_queries', 'search_services')]
+        self.assertEqual((total, count), (len(queries), 1))
+        for name in ('match_request_duration_seconds', 'match_request_db_seconds',
+                     'match_response_bytes', 'match_metrics_overhead_seconds'):
+            self.assertEqual(histograms[(name, 'search_services')][2], 1)
+
+    def test_prometheus_buckets_are_cumulative(self):
+        metrics.record('demo', 200, match_request_queries=3)
+        metrics.record('demo', 200, match_request_queries=30)
+        text = metrics.render_prometheus()
+
+        self.assertIn('match_request_queries_bucket{view="demo",le="5"} 1', text)
+        self.assertIn('match_request_queries_bucket{view="demo",le="50"} 2', text)
+        self.assertIn('match_request_queries_bucket{view="demo",le="+Inf"} 2', text)
+        self.assertIn('match_request_queries_sum{view="demo"} 33', text)
+        self.assertIn('match_responses_total{view="demo",status="200"} 2', text)
+
+    def test_endpoint_is_staff_only(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 302)
+
+        self.seeker.is_staff = True
+        self.seeker.save()
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('# TYPE match_request_duration_seconds histogram', response.content.decode())
+
+
+# =========================
+# Slow-Query Log
+# =========================
+
+class SlowQueryLogTests(TestCase):
+    def setUp(self):
+        self.entries = []
+        patcher = mock.patch.object(slowlog, 'write_entry', self.entries.append)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_fingerprint_ignores_literals_and_in_list_length(self):
+        one, normalized = slowlog.fingerprint('SELECT * FROM "t" WHERE "id" IN (%s, %s) AND "n" = 5')
+        two, _ = slowlog.fingerprint('SELECT *  FROM "t" WHERE "id" IN (%s) AND "n" = 7')
+        self.assertEqual(one, two)
+        self.assertEqual(normalized, 'SELECT * FROM "t" WHERE "id" IN (...) AND "n" = ?')
+
+    def test_logs_view_params_and_query_plan(self):
+        seeker = User.objects.create_user(username='seeker', role='user')
+        self.client.force_login(seeker)
+        with mock.patch.object(slowlog, 'SLOW_QUERY_MS', 0):
+            self.client.get(reverse('user_dashboard'))
+
+        entry = next(e for e in self.entries if 'Match_servicerequest' in e['sql'])
+        self.assertEqual(entry['view'], 'user_dashboard')
+        self.assertIn(seeker.pk, entry['params'])
+        self.assertTrue(entry['plan'])
+        self.assertGreaterEqual(entry['duration_ms'], 0)
+
+    def test_fast_queries_are_not_logged(self):
+        with slowlog.log_slow_queries('test', threshold_ms=10_000):
+            list(User.objects.all())
+        self.assertEqual(self.entries, [])
+
+    def test_report_groups_by_fingerprint(self):
+        with slowlog.log_slow_queries('test', threshold_ms=0):
+            for pk in (1, 2, 3):
+                list(User.objects.filter(pk=pk))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'slow.jsonl')
+            # Oldest entries live in the rotated backup
+            with open(path + '.1', 'w') as fh:
+                fh.write(json.dumps(self.entries[0]) + '\n')
+            with open(path, 'w') as fh:
+                fh.writelines(json.dumps(e) + '\n' for e in self.entries[1:])
+
+            out = io.StringIO()
+            call_command('slowlog_report', file=path, json=True, stdout=out)
+
+        groups = json.loads(out.getvalue())
+        self.assertEqual(len(groups), 1)
+        self.assertEqual(groups[0]['count'], 3)
+        self.assertEqual(groups[0]['views'], {'test': 3})
+
+
+# =========================
+# Request Profiling
+# =========================
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch.object(profiling, 'PROFILE_DIR', Path(tmp.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.staff = User.objects.create_user(username='staff', role='user', is_staff=True)
+        self.seeker = User.objects.create_user(username='seeker', role='user')
+        self.client.force_login(self.seeker)
+
+    def test_only_toggled_requests_are_profiled(self):
+        self.client.get(reverse('user_dashboard'))
+        self.assertEqual(profiling.recent_profiles(), [])
+
+        profiling.set_toggles(views=['user_dashboard'])
+        self.client.get(reverse('user_dashboard'))
+        self.client.get(reverse('my_requests'))
+
+        profiles = profiling.recent_profiles()
+        self.assertEqual([p['view'] for p in profiles], ['user_dashboard'])
+        name = profiles[0]['name']
+        self.assertIsNotNone(profiling.profile_path(name, '.pstats'))
+        self.assertIsNotNone(profiling.profile_path(name, '.collapsed'))
+        self.assertIn('user_dashboard', profiling.top_functions(name))
+
+    def test_user_toggle(self):
+        profiling.set_toggles(users=[self.seeker.pk])
+        self.client.get(reverse('my_requests'))
+        self.assertEqual(profiling.recent_profiles()[0]['user_id'], self.seeker.pk)
+
+    def test_staff_pages(self):
+        profiling.set_toggles(views=['user_dashboard'])
+        self.client.get(reverse('user_dashboard'))
+        name = profiling.recent_profiles()[0]['name']
+
+        self.assertEqual(self.client.get(reverse('profiles')).status_code, 302)
+
+        self.client.force_login(self.staff)
+        self.client.post(reverse('profiles'), {'views': 'search_services', 'users': 'seeker', 'rate': '0.5'})
+        self.assertEqual(
+            profiling.get_toggles(),
+            {'views': ['search_services'], 'users': [self.seeker.pk], 'rate': 0.5},
+        )
+
+        response = self.client.get(reverse('profile_detail', args=[name]))
+        self.assertContains(response, 'cumulative')
+        response = self.client.get(reverse('profile_download', args=[name, 'collapsed']))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(reverse('profile_download', args=[name, 'json'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('profile_detail', args=['..'])).status_code, 404)
+
+
+# =========================
+# Hot-Path Indexes
+# =========================
+
+class HotPathIndexTests(TestCase):
+    def plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        return slowlog.explain(sql, params)
+
+    def test_user_request_pages_avoid_sorting(self):
+        user = User.objects.create_user(username='seeker', role='user')
+        queryset = ServiceRequest.objects.filter(user=user, status='pending').order_by('-created_at', '-id')
+        plan = ' '.join(self.plan(queryset))
+        self.assertIn('request_user_status_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_listed_services_use_partial_indexes(self):
+        provider = make_provider('acme')
+        listed = Service.objects.filter(is_active=True, is_verified=True)
+        self.assertIn('service_listed_idx', ' '.join(self.plan(listed.filter(category_id=1))))
+        self.assertIn('service_provider_listed_idx', ' '.join(self.plan(listed.filter(provider=provider))))
+
+    def test_index_advisor_reports(self):
+        call_command('seed_marketplace', users=10, providers=5, requests=50, stdout=io.StringIO())
+        out = io.StringIO()
+        call_command('index_advisor', min_rows=0, stdout=out)
+        self.assertIn('distinct statements checked', out.getvalue())
+
+
+# =========================
+# SQL-Side Distance
+# =========================
+
+class SQLDistanceTests(TestCase):
+    def setUp(self):
+        rng = random.Random(11)
+        self.seeker = User.objects.create_user(username='seeker', role='user')
+        for n in range(40):
+            lat, lon = -1.28 + rng.uniform(-0.3, 0.3), 36.82 + rng.uniform(-0.3, 0.3)
+            service = make_service(make_provider(f'p{n}', lat, lon))
+            ServiceRequest.objects.create(
+                user=self.seeker, service=service, location='x', description='x',
+                latitude=round(lat, 6), longitude=round(lon, 6),
+            )
+
+    def test_bounding_box_wraps_antimeridian_and_poles(self):
+        lat_min, lat_max, lons = geo.bounding_box(-17.0, 179.95, 20)
+        self.assertEqual(len(lons), 2)
+        self.assertEqual(lons[0][1], 180.0)
+        self.assertIsNone(geo.bounding_box(89.9, 0, 50)[2])
+        self.assertIsNone(geo.bounding_box(0, 0, 30000))
+
+    def test_sql_distance_matches_python_for_float_and_decimal(self):
+        origin = (-1.3, 36.8)
+        for queryset, prefix in ((Service.objects.all(), 'provider__'), (ServiceRequest.objects.all(), '')):
+            lat_field, lon_field = f'{prefix}latitude', f'{prefix}longitude'
+            rows = list(geo.within_queryset(queryset, *origin, 15, prefix).values_list('pk', 'distance'))
+            expected = sorted(
+                (haversine_distance(*origin, lat, lon), pk)
+                for pk, lat, lon in queryset.values_list('pk', lat_field, lon_field)
+                if haversine_distance(*origin, lat, lon) <= 15
+            )
+            self.assertEqual([pk for pk, _ in rows], [pk for _, pk in expected])
+            # Microdegree storage moves points by at most ~0.1 m
+            for (_, distance), (exact, _) in zip(rows, expected):
+                self.assertAlmostEqual(distance, exact, delta=1e-3)
+
+    def test_nearest_orders_and_limits_in_sql(self):
+        nearest = geo.nearest_queryset(ServiceRequest.objects.all(), -1.28, 36.82, 3, prefix='')
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(nearest[:3])
+        self.assertEqual(len(rows), 3)
+        self.assertIn('arc_km', queries[0]['sql'])
+        self.assertIn('LIMIT 3', queries[0]['sql'])
+        self.assertLessEqual(rows[0].distance, rows[2].distance)
+
+    def test_bounding_box_uses_coordinate_index(self):
+        queryset = geo.within_queryset(ServiceRequest.objects.all(), -1.28, 36.82, 5, prefix='')
+        sql, params = queryset.query.sql_with_params()
+        self.assertIn('request_lat_lon_idx', ' '.join(slowlog.explain(sql, params)))
+
+
+# =========================
+# Coordinate Columns
+# =========================
+
+class CoordinateColumnTests(TestCase):
+    def test_derived_columns_follow_saves(self):
+        provider = make_provider('acme', -1.2864, 36.8172)
+        self.assertEqual((provider.lat_e6, provider.lon_e6), (-1286400, 36817200))
+
+        provider.latitude = 51.5
+        provider.save(update_fields=['latitude'])
+        provider.refresh_from_db()
+        self.assertEqual(provider.lat_e6, 51500000)
+        self.assertAlmostEqual(provider.sin_lat, math.sin(math.radians(51.5)))
+
+        provider.latitude = None
+        provider.save()
+        provider.refresh_from_db()
+        self.assertIsNone(provider.cos_lon)
+
+    def test_trig_distance_matches_haversine(self):
+        rng = random.Random(2)
+        origin = (-1.286389, 36.817223)
+        points = [(rng.uniform(-90, 90), rng.uniform(-180, 180)) for _ in range(500)]
+        points += [(origin[0] + rng.uniform(-1e-4, 1e-4), origin[1] + rng.uniform(-1e-4, 1e-4)) for _ in range(50)]
+
+        trig = [geo.trig_of(lat, lon) for lat, lon in points]
+        batch = trig_distances(geo.trig_of(*origin), *zip(*trig))
+        for (lat, lon), point, distance in zip(points, trig, batch):
+            # Both sides rounded to microdegrees: within ~0.2 m
+            expected = haversine_distance(*origin, lat, lon)
+            self.assertAlmostEqual(trig_distance(geo.trig_of(*origin), point), expected, delta=2e-4)
+            self.assertAlmostEqual(float(distance), expected, delta=2e-4)
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_trig_distances_match_haversine_on_arrays(self):
+        # Timing lives in bench_haversine; here both engines get the same arrays
+        rng = random.Random(4)
+        lats = np.asarray([rng.uniform(-60, 60) for _ in range(1000)])
+        lons = np.asarray([rng.uniform(-180, 180) for _ in range(1000)])
+        columns = [np.asarray(column) for column in zip(*(geo.trig_of(lat, lon) for lat, lon in zip(lats, lons)))]
+
+        trig = trig_distances(geo.trig_of(-1.28, 36.82), *columns)
+        haversine = haversine_distances(-1.28, 36.82, lats, lons)
+        self.assertLess(float(np.max(np.abs(trig - haversine))), 2e-4)
+
+
+# =========================
+# Nearby Open Requests
+# =========================
+
+class NearbyRequestsTests(TestCase):
+    def setUp(self):
+        self.plumbing = ServiceCategory.objects.create(name='Plumbing')
+        self.cleaning = ServiceCategory.objects.create(name='Cleaning')
+        self.provider = make_provider('acme', -1.28, 36.82)
+        make_service(self.provider, category=self.plumbing)
+
+        other = make_provider('rival', -1.30, 36.80)
+        self.rival_plumbing = make_service(other, 'Pipes', category=self.plumbing)
+        rival_cleaning = make_service(other, 'Mops', category=self.cleaning)
+        own = make_service(self.provider, 'Drains', category=self.plumbing)
+
+        self.seeker = User.objects.create_user(username='seeker', role='user')
+        self.expected = []
+        for n, (lat, lon) in enumerate([(-1.281, 36.821), (-1.35, 36.9), (-1.2, 36.7), (-1.5, 37.0)]):
+            self.expected.append(self.request(self.rival_plumbing, lat, lon, f'r{n}'))
+        self.request(self.rival_plumbing, -1.281, 36.821, status='accepted')
+        self.request(rival_cleaning, -1.281, 36.821)
+        self.request(own, -1.281, 36.821)
+        self.request(self.rival_plumbing, 0.5, 35.3)  # Eldoret, ~250 km away
+        self.request(self.rival_plumbing, None, None)
+
+    def request(self, service, lat, lon, location='x', status='pending'):
+        return ServiceRequest.objects.create(
+            user=self.seeker, service=service, location=location, description='x',
+            latitude=lat, longitude=lon, status=status,
+        )
+
+    def test_only_pending_in_category_in_radius_from_others(self):
+        page = nearby.nearby_page(self.provider, 50)
+        self.assertEqual([row.id for row in page.results], [r.pk for r in self.expected])
+        distances = [row.distance for row in page.results]
+        self.assertEqual(distances, sorted(distances))
+        self.assertAlmostEqual(distances[0], haversine_distance(-1.28, 36.82, -1.281, 36.821), delta=1e-3)
+
+        recent = nearby.nearby_page(self.provider, 50, 'recent')
+        self.assertEqual([row.id for row in recent.results], [r.pk for r in reversed(self.expected)])
+
+    def test_radius_and_pages(self):
+        self.assertEqual(len(nearby.nearby_page(self.provider, 5).results), 1)
+
+        first = nearby.nearby_page(self.provider, 50, page_size=3)
+        second = nearby.nearby_page(self.provider, 50, page=2, page_size=3)
+        self.assertTrue(first.has_next)
+        self.assertFalse(second.has_next)
+        self.assertEqual([row.id for row in first.results + second.results], [r.pk for r in self.expected])
+
+    def test_category_follows_service(self):
+        self.assertEqual(self.expected[0].category_id, self.plumbing.pk)
+
+        self.rival_plumbing.category = self.cleaning
+        self.rival_plumbing.save()
+        self.assertEqual(ServiceRequest.objects.filter(pk=self.expected[0].pk, category=self.cleaning).count(), 1)
+        self.assertEqual(nearby.nearby_page(self.provider, 50).results, [])
+
+    def test_query_uses_nearby_index(self):
+        queryset = nearby.open_requests_near(-1.28, 36.82, [self.plumbing.pk], 25, self.provider)
+        sql, params = queryset.query.sql_with_params()
+        self.assertIn('request_open_nearby_idx', ' '.join(slowlog.explain(sql, params)))
+
+    def test_feed_and_page_views(self):
+        self.client.force_login(self.provider.user)
+        data = self.client.get(reverse('nearby_requests_feed'), {'radius': 50, 'page_size': 2}).json()
+        self.assertEqual([row['id'] for row in data['results']], [r.pk for r in self.expected[:2]])
+        self.assertEqual(data['next_page'], 2)
+        self.assertEqual(set(data['results'][0]), {
+            'id', 'service', 'category', 'location', 'latitude', 'longitude', 'distance_km', 'created_at',
+        })
+        self.assertEqual(data['results'][0]['category'], 'Plumbing')
+
+        response = self.client.get(reverse('nearby_requests'), {'radius': 50, 'sort': 'recent'})
+        self.assertContains(response, 'r3')
+        self.assertEqual(response.context['page'].sort, 'recent')
+
+        for radius in ('nan', 'inf', '-5'):
+            data = self.client.get(reverse('nearby_requests_feed'), {'radius': radius}).json()
+            self.assertEqual(data['radius_km'], nearby.NEARBY_RADIUS_KM)
+
+        self.client.force_login(self.seeker)
+        self.assertEqual(self.client.get(reverse('nearby_requests_feed')).status_code, 403)
+
+
+# =========================
+# SQLite Production Profile
+# =========================
+
+class SQLiteProductionProfileTests(SimpleTestCase):
+    def test_pragmas_applied_on_connect(self):
+        from django.db.backends.sqlite3.base import DatabaseWrapper
+
+        with tempfile.TemporaryDirectory() as tmp:
+            wrapper = DatabaseWrapper({
+                **connection.settings_dict,
+                'NAME': os.path.join(tmp, 'profile.sqlite3'),
+                'OPTIONS': settings.SQLITE_PRODUCTION_OPTIONS,
+            }, alias='profile')
+            try:
+                with wrapper.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], 'wal')
+                    cursor.execute('PRAGMA synchronous')
+                    self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+                    cursor.execute('PRAGMA busy_timeout')
+                    self.assertEqual(cursor.fetchone()[0], 5000)
+                self.assertEqual(wrapper.transaction_mode, 'IMMEDIATE')
+            finally:
+                wrapper.close()
+
+
+# =========================
+# Sliding Sessions
+# =========================
+
+class SlidingSessionTests(TestCase):
+    def setUp(self):
+        self.seeker = User.objects.create_user(username='seeker', role='user')
+        self.client.force_login(self.seeker)
+
+    def test_unknown_session_backend_is_named(self):
+        result = subprocess.run(
+            [sys.executable, '-c', 'import Skill.settings'],
+            cwd=settings.BASE_DIR, env={**os.environ, 'SESSION_BACKEND': 'cahce'},
+            capture_output=True, text=True,
+        )
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn('ImproperlyConfigured', result.stderr)
+        self.assertIn('signed_cookies', result.stderr)
+
+    def session_writes(self, at):
+        writes = []
+
+        def count(execute, sql, params, many, context):
+            if 'django_session' in sql and not sql.startswith('SELECT'):
+                writes.append(sql)
+            return execute(sql, params, many, context)
+
+        with mock.patch('Match.middleware.time.time', return_value=at), connection.execute_wrapper(count):
+            response = self.client.get(reverse('my_requests'))
+        return len(writes), response
+
+    def test_refreshes_only_after_fraction_of_lifetime(self):
+        stamped = self.client.session[middleware.SESSION_REFRESHED_KEY]
+        threshold = middleware.SESSION_REFRESH_FRACTION * settings.SESSION_COOKIE_AGE
+
+        writes, response = self.session_writes(stamped + threshold - 1)
+        self.assertEqual(writes, 0)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+        writes, response = self.session_writes(stamped + threshold)
+        self.assertGreater(writes, 0)
+        self.assertIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertEqual(self.client.session[middleware.SESSION_REFRESHED_KEY], stamped + threshold)
+
+
+# =========================
+# Cached Identity
+# =========================
+
+class CachedIdentityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # As with a shared cache backend
+        patcher = mock.patch.object(identity, 'IDENTITY_CACHE_USERS', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.provider = make_provider('acme', -1.28, 36.82)
+        self.client.force_login(self.provider.user)
+        self.client.get(reverse('manage_services'))  # warm the identity cache
+
+    def identity_queries(self, name):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(name))
+        identity = [
+            q['sql'] for q in queries
+            if 'FROM "Match_user"' in q['sql'] or 'FROM "Match_serviceprovider"' in q['sql']
+        ]
+        return identity, response
+
+    def test_provider_pages_make_no_identity_queries(self):
+        for name in ('manage_services', 'provider_requests', 'add_service', 'profile'):
+            identity, response = self.identity_queries(name)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(identity, [], name)
+            self.assertEqual(response.wsgi_request.provider.pk, self.provider.pk)
+
+    def test_saves_invalidate_cached_identity(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('profile'), {
+                'company_name': 'Renamed Ltd', 'contact_number': '0711111111',
+                'address': 'Nairobi', 'latitude': '-1.28', 'longitude': '36.82',
+            })
+        _, response = self.identity_queries('manage_services')
+        self.assertEqual(response.wsgi_request.provider.company_name, 'Renamed Ltd')
+
+        self.provider.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.provider.user.save()
+        self.assertEqual(self.client.get(reverse('manage_services')).status_code, 302)
+
+    def test_rating_updates_invalidate_cached_provider(self):
+        seeker = User.objects.create_user(username='seeker', role='user')
+        service_request = ServiceRequest.objects.create(
+            user=seeker, service=make_service(self.provider), location='Nairobi', status='completed'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(service_request=service_request, provider=self.provider, user=seeker, rating=5)
+
+        _, response = self.identity_queries('manage_services')
+        self.assertEqual(response.wsgi_request.provider.rating_count, 1)
+
+    def test_invalidation_waits_for_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.provider.company_name = 'Renamed Ltd'
+            self.provider.save()
+            # A request before the commit still sees the cached row
+            _, response = self.identity_queries('manage_services')
+            self.assertEqual(response.wsgi_request.provider.company_name, 'acme Ltd')
+        for callback in callbacks:
+            callback()
+        _, response = self.identity_queries('manage_services')
+        self.assertEqual(response.wsgi_request.provider.company_name, 'Renamed Ltd')
+
+    def test_process_local_cache_does_not_hold_users(self):
+        with mock.patch.object(identity, 'IDENTITY_CACHE_USERS', None):
+            self.assertFalse(identity.caches_users())  # Tests use LocMemCache
+            # Another worker deactivates the user without touching this cache
+            User.objects.filter(pk=self.provider.user.pk).update(is_active=False)
+            self.assertEqual(self.client.get(reverse('manage_services')).status_code, 302)
+
+    def test_process_local_cache_does_not_hold_providers(self):
+        with mock.patch.object(identity, 'IDENTITY_CACHE_USERS', None):
+            # Another worker records a review and switches the provider off
+            ServiceProvider.objects.filter(pk=self.provider.pk).update(rating_count=1, is_active=False)
+            _, response = self.identity_queries('manage_services')
+            provider = response.wsgi_request.provider
+            self.assertEqual((provider.rating_count, provider.is_active), (1, False))
+
+    def test_add_service_keeps_concurrent_rating_updates(self):
+        ServiceProvider.objects.filter(pk=self.provider.pk).update(profile_completed=False)
+        # A stale row, as read before another worker recorded a review
+        stale = ServiceProvider.objects.get(pk=self.provider.pk)
+        ServiceProvider.objects.filter(pk=self.provider.pk).update(rating_count=1, rating_sum=5)
+        with mock.patch.object(middleware, 'get_provider', return_value=stale):
+            self.client.post(reverse('add_service'), {
+                'title': 'Leaks', 'category': 'Plumbing', 'description': 'Fixes',
+            })
+        self.provider.refresh_from_db()
+        self.assertTrue(self.provider.profile_completed)
+        self.assertEqual((self.provider.rating_count, self.provider.rating_sum), (1, 5))
+
+    def test_sessions_from_model_backend_stay_valid(self):
+        self.client.force_login(self.provider.user, backend='django.contrib.auth.backends.ModelBackend')
+        self.assertEqual(self.client.get(reverse('manage_services')).status_code, 200)
+
+    def test_seekers_have_no_provider(self):
+        seeker = User.objects.create_user(username='seeker', role='user')
+        self.client.force_login(seeker)
+        self.client.get(reverse('user_dashboard'))
+        identity, response = self.identity_queries('user_dashboard')
+        self.assertEqual(identity, [])
+        self.assertFalse(response.wsgi_request.provider)
+
+
+# =========================
+# Search Result Cache
+# =========================
+
+class SearchResultCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        rng = random.Random(3)
+        self.category = ServiceCategory.objects.create(name='Plumbing')
+        for n in range(60):
+            provider = make_provider(f'p{n}', -1.28 + rng.uniform(-0.2, 0.2), 36.82 + rng.uniform(-0.2, 0.2))
+            make_service(provider, f'Plumbing {n}', self.category)
+
+    def listed(self):
+        return Service.objects.filter(is_active=True, is_verified=True)
+
+    def test_repeat_search_is_a_hit(self):
+        first = search.search_page('Plumbing', (-1.28, 36.82), page_size=10).results
+        with self.assertNumQueries(1):  # rows for the returned ids only
+            second = search.search_page('  plumbing ', (-1.28, 36.82), page_size=10).results
+        self.assertEqual([r.id for r in first], [r.id for r in second])
+        self.assertEqual(search.search_cache_stats()['hits'], 1)
+
+    def test_cached_tile_answers_are_exact_for_any_origin(self):
+        base = search.tile_of(-1.28, 36.82)[1]
+        step = search.SEARCH_TILE_DEGREES * 0.45
+        for dlat, dlon in ((0, 0), (step, step), (-step, step), (step, -step)):
+            origin = (base[0] + dlat, base[1] + dlon)
+
+            nearest = search.search_page(origin=origin, page_size=7).results
+            expected = geo.nearest_queryset(self.listed(), origin[0], origin[1], 7)[:7]
+            self.assertEqual([r.id for r in nearest], [r.id for r in expected])
+
+            within = search.search_page(origin=origin, max_distance=8, page_size=50).results
+            expected = geo.within_queryset(self.listed(), origin[0], origin[1], 8)
+            self.assertEqual([r.id for r in within], [r.id for r in expected])
+            for row, exact in zip(within, expected):
+                # Cached candidates carry microdegree coordinates
+                self.assertAlmostEqual(row.distance, exact.distance, delta=1e-3)
+
+        self.assertGreater(search.search_cache_stats()['hits'], 0)
+
+    def test_service_and_provider_changes_invalidate(self):
+        origin = (-1.28, 36.82)
+        closest = search.search_page(None, origin, page_size=1).results[0]
+
+        Service.objects.filter(pk=closest.id).update(is_active=False)  # bypasses signals
+        # The stale candidate list still names it, but the row is not shown
+        self.assertEqual(search.search_page(None, origin, page_size=1).results, [])
+
+        service = Service.objects.get(pk=closest.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            service.save()
+        self.assertNotEqual(search.search_page(None, origin, page_size=1).results[0].id, closest.id)
+
+        far = ServiceProvider.objects.exclude(services__id=closest.id).order_by('pk').first()
+        far.latitude, far.longitude = origin
+        with self.captureOnCommitCallbacks(execute=True):
+            far.save(update_fields=['latitude', 'longitude'])
+        self.assertEqual(search.search_page(None, origin, page_size=1).results[0].provider_name, far.company_name)
+
+    def test_metrics_expose_hit_rate(self):
+        staff = User.objects.create_user(username='staff', role='user', is_staff=True)
+        self.client.force_login(staff)
+        self.client.get(reverse('search_services'), {'q': 'plumbing'})
+        self.client.get(reverse('search_services'), {'q': 'plumbing'})
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('match_search_cache_hits_total 1', body)
+        self.assertIn('match_search_cache_misses_total 1', body)
+
+
+# =========================
+# Search Pagination
+# =========================
+
+class SearchPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        rng = random.Random(5)
+        self.category = ServiceCategory.objects.create(name='Plumbing')
+        for n in range(45):
+            provider = make_provider(f'p{n}', -1.28 + rng.uniform(-0.1, 0.1), 36.82 + rng.uniform(-0.1, 0.1))
+            make_service(provider, f'Plumbing {n}', self.category)
+        self.listed = Service.objects.filter(is_active=True, is_verified=True)
+        self.origin = (-1.283, 36.817)
+
+    def pages(self, **kwargs):
+        ids, page = [], search.search_page(page=1, page_size=10, **kwargs)
+        while True:
+            ids += [row.id for row in page.results]
+            if not page.has_next:
+                return ids, page
+            page = search.search_page(page=page.next_page, page_size=10, **kwargs)
+
+    def test_pages_concatenate_to_full_ordering(self):
+        expected = geo.within_queryset(self.listed, *self.origin, 500)
+        ids, last = self.pages(origin=self.origin)
+        self.assertEqual(ids, [row.id for row in expected])
+        self.assertEqual((last.page, last.total), (5, 45))
+
+        expected = list(geo.within_queryset(self.listed, *self.origin, 6))
+        ids, last = self.pages(origin=self.origin, max_distance=6)
+        self.assertEqual(ids, [row.id for row in expected])
+        self.assertEqual(last.total, len(expected))
+        self.assertFalse(last.total_is_estimate)
+
+        ids, last = self.pages(query='plumbing')
+        self.assertEqual(ids, search.ranked_service_ids('plumbing'))
+
+    def test_unlocated_services_follow_located_pages(self):
+        nowhere = [make_service(make_provider(f'nowhere{n}'), f'Plumbing far {n}', self.category) for n in range(7)]
+        ids, last = self.pages(origin=self.origin)
+        self.assertEqual(ids[45:], [service.pk for service in nowhere])
+        self.assertEqual((last.page, last.total), (6, 52))
+        self.assertIsNone(last.results[-1].distance)
+
+        # Not within any radius
+        ids, _ = self.pages(origin=self.origin, max_distance=500)
+        self.assertEqual(len(ids), 45)
+
+    def test_missing_rows_keep_their_own_distances(self):
+        expected = search.search_page(origin=self.origin).results
+        rows_for_ids = search.rows_for_ids
+        # As if the nearest service was deleted after the candidates were cached
+        with mock.patch.object(search, 'rows_for_ids', lambda ids: rows_for_ids(ids[1:])):
+            page = search.search_page(origin=self.origin)
+        self.assertEqual(
+            [(row.id, row.distance) for row in page.results],
+            [(row.id, row.distance) for row in expected[1:]],
+        )
+
+    def test_nearest_matches_full_sort(self):
+        expected = list(geo.within_queryset(self.listed, *self.origin, 500))
+        top = geo.nearest_queryset(self.listed, *self.origin, 5)[:5]
+        self.assertEqual([row.id for row in top], [row.id for row in expected[:5]])
+
+    def test_window_bounds_deep_pages(self):
+        with mock.patch.object(search, 'MAX_SEARCH_WINDOW', 20):
+            page = search.search_page(origin=self.origin, page=50, page_size=10)
+        self.assertEqual(page.page, 2)
+        self.assertFalse(page.has_next)
+        self.assertEqual(page.total, 45)
+
+    def test_view_pages_and_links(self):
+        self.client.force_login(User.objects.create_user(username='seeker', role='user'))
+        url = reverse('search_services')
+        params = {'lat': self.origin[0], 'lon': self.origin[1], 'max_distance': 50, 'page_size': 20}
+
+        first = self.client.get(url, params)
+        second = self.client.get(url, {**params, 'page': 2})
+        self.assertEqual(len(first.context['services']), 20)
+        self.assertFalse({row.id for row in first.context['services']} & {row.id for row in second.context['services']})
+        self.assertContains(first, 'page=2')
+        self.assertEqual(self.client.get(url, {**params, 'page': 'x'}).context['page'].page, 1)
+
+
+# =========================
+# Provider Map Clusters
+# =========================
+
+class ProviderMapTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        rng = random.Random(5)
+        # A dense town and a few scattered providers
+        self.town = [make_provider(f't{n}', -1.28 + rng.uniform(-0.01, 0.01), 36.82 + rng.uniform(-0.01, 0.01))
+                     for n in range(30)]
+        self.scattered = [make_provider(f's{n}', lat, lon) for n, (lat, lon) in enumerate([(0.5, 35.3), (-4.0, 39.6)])]
+        make_provider('unlocated')
+        make_provider('inactive', -1.28, 36.82, is_active=False)
+        self.seeker = User.objects.create_user(username='seeker', role='user')
+        self.client.force_login(self.seeker)
+
+    def viewport(self, zoom, bbox='33,-5,42,5'):
+        return clusters.viewport_clusters(clusters.Viewport(bbox, zoom))
+
+    def test_counts_and_centroids(self):
+        data = self.viewport(7)
+        self.assertEqual(len(data['clusters']), 1)
+        cluster = data['clusters'][0]
+        self.assertEqual(cluster['count'], 30)
+        self.assertAlmostEqual(cluster['lat'], sum(p.latitude for p in self.town) / 30, places=5)
+        self.assertAlmostEqual(cluster['lon'], sum(p.longitude for p in self.town) / 30, places=5)
+        self.assertEqual({m['id'] for m in data['markers']}, {p.pk for p in self.scattered})
+
+    def test_high_zoom_sends_individual_markers(self):
+        data = self.viewport(16, '36.80,-1.30,36.84,-1.26')
+        total = sum(c['count'] for c in data['clusters']) + len(data['markers'])
+        self.assertEqual(total, 30)
+        self.assertGreater(len(data['markers']), 0)
+
+    def test_antimeridian_viewport(self):
+        fiji = make_provider('fiji', -17.0, 179.9)
+        samoa = make_provider('samoa', -13.8, -171.8)
+        data = self.viewport(4, '170,-20,190,-10')
+        self.assertEqual({m['id'] for m in data['markers']}, {fiji.pk, samoa.pk})
+
+    def test_tiles_are_cached_until_providers_change(self):
+        self.viewport(7)
+        with self.assertNumQueries(0):
+            self.viewport(7)
+
+        self.scattered[0].latitude = 0.6
+        with self.captureOnCommitCallbacks(execute=True):
+            self.scattered[0].save(update_fields=['latitude'])
+        data = self.viewport(7)
+        self.assertIn(0.6, [m['lat'] for m in data['markers']])
+
+    def test_view_gzip_and_etag(self):
+        url = reverse('provider_map')
+        params = {'bbox': '36.78,-1.32,36.86,-1.24', 'zoom': 14}
+        response = self.client.get(url, params, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        etag = response['ETag']
+
+        # Same tiles, slightly different viewport: not modified
+        moved = {'bbox': '36.7801,-1.32,36.86,-1.24', 'zoom': 14}
+        self.assertEqual(self.client.get(url, moved, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_provider('newcomer', -1.28, 36.83)
+        self.assertEqual(self.client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_bad_viewport(self):
+        url = reverse('provider_map')
+        self.assertEqual(self.client.get(url, {'bbox': 'x', 'zoom': 5}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'bbox': '-180,-90,180,90', 'zoom': 12}).status_code, 400)
+
+    def test_provider_names_are_not_rendered_as_html(self):
+        markup = '<img src=x onerror=alert(1)>'
+        provider = make_provider('markup', 0.5, 35.31)
+        provider.company_name = markup
+        provider.save(update_fields=['company_name'])
+        response = self.client.get(reverse('provider_map'), {'bbox': '35.2,0.4,35.4,0.6', 'zoom': 12})
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn(markup, [m['name'] for m in response.json()['markers']])
+
+        # The signup map binds names as text nodes, never as HTML strings
+        company = User.objects.create_user(username='newcompany', role='company')
+        self.client.force_login(company)
+        page = self.client.get(reverse('provider_signup_step2')).content.decode()
+        self.assertIn('.bindTooltip(textLabel(m.name))', page)
+        self.assertIn('label.textContent = text', page)
+        self.assertNotIn('.bindTooltip(m.name)', page)
@@ -20,6 +20,7 @@ urlpatterns = [
     path('search/', views.search_services, name='search_services'),
     path('request/<int:service_id>/', views.create_request, name='create_request'),
     path('profile/', views.profile_view, name='profile'),
+    path('map/providers/', views.provider_map, name='provider_map'),
 
     path('service/add/', views.add_service, name='add_service'),
     path('service/edit/<int:service_id>/', views.edit_service, name='edit_service'),
@@ -27,11 +28,20 @@ urlpatterns = [
 
     # Provider Requests
     path('provider/requests/', views.provider_requests, name='provider_requests'),
+    path('provider/requests/feed/', views.provider_requests_feed, name='provider_requests_feed'),
     path('provider/requests/accept/<int:request_id>/', views.accept_request, name='accept_request'),
     path('provider/requests/reject/<int:request_id>/', views.reject_request, name='reject_request'),
     path('provider/requests/complete/<int:request_id>/', views.complete_request, name='complete_request'),
+    path('provider/nearby/', views.nearby_requests, name='nearby_requests'),
+    path('provider/nearby/feed/', views.nearby_requests_feed, name='nearby_requests_feed'),
     path('user/requests/', views.my_requests, name='my_requests'),
+    path('user/requests/feed/', views.my_requests_feed, name='my_requests_feed'),
     path('review/<int:request_id>/', views.submit_review, name='submit_review'),
 
     path('provider/services/', views.manage_services, name='manage_services'),
+
+    path('metrics/', views.metrics_view, name='metrics'),
+    path('profiles/', views.profiles_view, name='profiles'),
+    path('profiles/<str:name>/', views.profile_detail, name='profile_detail'),
+    path('profiles/<str:name>/<str:kind>/', views.profile_download, name='profile_download'),
 ]
\ No newline at end of file
@@ -1,25 +1,24 @@
 from .models import ServiceProvider
 import math
 
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; batch helpers fall back to math
+    np = None
+
 def find_best_company(service_request):
     """
     Matches a user's service request to the best available verified company.
-    Based on service category, location, and rating.
+    Based on service category, distance, rating and current workload
+    (see Match.matching for the scoring).
     """
-    # Step 1: Filter by service category
-    companies = ServiceProvider.objects.filter(
-        service_category__icontains=service_request.service_type,
-        verified=True
-    )
-
-    # Step 2: Filter by location match
-    companies = companies.filter(location__icontains=service_request.location)
+    from .matching import match_request
 
-    # Step 3: Sort by rating (highest first)
-    companies = companies.order_by('-rating')
+    best = match_request(service_request, k=1)
+    if not best:
+        return None
 
-    # Step 4: Pick best match
-    return companies.first() if companies.exists() else None
+    return ServiceProvider.objects.filter(pk=best[0].provider_id).first()
 
 
 def haversine_distance(lat1, lon1, lat2, lon2):
@@ -42,15 +41,83 @@ def haversine_distance(lat1, lon1, lat2, lon2):
 
     return R * c
 
-# utils.py
-from django.core.mail import send_mail
-from django.conf import settings
 
+def haversine_distances(lat, lon, lats, lons):
+    """
+    Distances in KM from one origin to many coordinates in a single pass.
+    Returns a NumPy array (or a list when NumPy is not installed).
+    """
+    if np is None:
+        return [haversine_distance(lat, lon, lat2, lon2) for lat2, lon2 in zip(lats, lons)]
+
+    lat1 = np.radians(float(lat))
+    lon1 = np.radians(float(lon))
+    lat2 = np.radians(np.asarray(lats, dtype=np.float64))
+    lon2 = np.radians(np.asarray(lons, dtype=np.float64))
+
+    return _haversine_np(lat1, lon1, lat2, lon2)
+
+
+def haversine_pairwise(lats1, lons1, lats2, lons2):
+    """
+    Many-to-many distances in KM: result[i][j] is the distance from
+    point i of the first set to point j of the second.
+    """
+    if np is None:
+        return [
+            [haversine_distance(a, b, c, d) for c, d in zip(lats2, lons2)]
+            for a, b in zip(lats1, lons1)
+        ]
+
+    lat1 = np.radians(np.asarray(lats1, dtype=np.float64))[:, None]
+    lon1 = np.radians(np.asarray(lons1, dtype=np.float64))[:, None]
+    lat2 = np.radians(np.asarray(lats2, dtype=np.float64))[None, :]
+    lon2 = np.radians(np.asarray(lons2, dtype=np.float64))[None, :]
+
+    return _haversine_np(lat1, lon1, lat2, lon2)
+
+
+def _haversine_np(lat1, lon1, lat2, lon2):
+    # Same formula as haversine_distance so results agree to float precision
+    R = 6371
+
+    a = np.sin((lat2 - lat1) / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    return R * c
+
+def trig_distance(a, b):
+    """
+    Distance in KM between two points given as precomputed
+    (sin_lat, cos_lat, sin_lon, cos_lon), via the chord between their
+    unit vectors: a few multiplies, no radians() or float() per call.
+    """
+    dx = a[1] * a[3] - b[1] * b[3]
+    dy = a[1] * a[2] - b[1] * b[2]
+    dz = a[0] - b[0]
+    return 2 * 6371 * math.asin(min(math.sqrt(dx * dx + dy * dy + dz * dz) / 2, 1.0))
+
+
+def trig_distances(origin, sin_lats, cos_lats, sin_lons, cos_lons):
+    """
+    trig_distance() from one origin to many points given as parallel
+    sequences. Returns a NumPy array (or a list without NumPy).
+    """
+    if np is None:
+        return [trig_distance(origin, point) for point in zip(sin_lats, cos_lats, sin_lons, cos_lons)]
+
+    cos_lats = np.asarray(cos_lats, dtype=np.float64)
+    dx = origin[1] * origin[3] - cos_lats * np.asarray(cos_lons, dtype=np.float64)
+    dy = origin[1] * origin[2] - cos_lats * np.asarray(sin_lons, dtype=np.float64)
+    dz = origin[0] - np.asarray(sin_lats, dtype=np.float64)
+    return 2 * 6371 * np.arcsin(np.minimum(np.sqrt(dx * dx + dy * dy + dz * dz) / 2, 1.0))
+
+# utils.py
 def send_notification_email(subject, message, recipient_email):
-    send_mail(
-        subject,
-        message,
-        settings.DEFAULT_FROM_EMAIL,  # e.g., "noreply@yourdomain.com"
-        [recipient_email],
-        fail_silently=False
-    )
\ No newline at end of file
+    """
+    Queue a notification email; the drain_outbox worker delivers it.
+    Call inside the transaction that makes the change being reported.
+    """
+    from .outbox import enqueue_email
+
+    return enqueue_email(subject, message, recipient_email)
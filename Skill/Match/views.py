@@ -1,11 +1,13 @@
 # service_provider/views.py
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition
 from django.contrib import messages
-from django.core.mail import send_mail
 from django.conf import settings
-from django.core.mail import send_mail
 from django.middleware.csrf import rotate_token
 from .forms import (
     UserRegistrationForm,
@@ -17,13 +19,28 @@ from .forms import (
     ReviewForm
 )
 from .models import User, ServiceProvider, Service, ServiceRequest, ServiceCategory
-from django.db.models import Count, Avg
+from django.db import transaction
+from django.db.models import Count
 from django.db.models.functions import TruncMonth
 from django.utils import timezone
 from datetime import timedelta
 import json
-from .utils import haversine_distance
+from .search import SEARCH_PAGE_SIZE, search_cache_stats, search_page
+from .stats import request_stats
+from .cache import cached_dashboard
+from .identity import get_provider
+from .clusters import Viewport, viewport_clusters
+from .geo import parse_origin, parse_radius
+from .nearby import NEARBY_PAGE_SIZE, NEARBY_RADIUS_CHOICES, clamp_radius, nearby_page
+from .metrics import render_prometheus
+from . import profiling
+from .pagination import keyset_page, page_size_from
+from .utils import send_notification_email
 from decimal import Decimal
+
+# Length of the monthly request trend on both dashboards
+DASHBOARD_MONTHS = getattr(settings, 'DASHBOARD_MONTHS', 6)
+
 # =========================
 # Landing Pages
 # =========================
@@ -87,7 +104,7 @@ def login_view(request):
 
             #  SERVICE PROVIDER
             if user.role == 'company':
-                provider = ServiceProvider.objects.filter(user=user).first()
+                provider = get_provider(user)
 
                 if provider and provider.profile_completed:
                     return redirect('provider_dashboard')
@@ -143,10 +160,10 @@ def provider_signup_step2(request):
     if request.user.role != 'company':
         return redirect('login')
 
-    provider, created = ServiceProvider.objects.get_or_create(
+    provider = request.provider or ServiceProvider.objects.get_or_create(
         user=request.user,
         defaults={'profile_completed': False}
-    )
+    )[0]
 
     if provider.profile_completed:
         return redirect('provider_dashboard')
@@ -222,7 +239,9 @@ def add_service(request):
     if request.user.role != 'company':
         return redirect('login')
 
-    provider = get_object_or_404(ServiceProvider, user=request.user)
+    provider = request.provider
+    if not provider:
+        raise Http404("No provider profile.")
     categories = ServiceCategory.objects.all()
 
     if request.method == 'POST':
@@ -233,20 +252,21 @@ def add_service(request):
             service.provider = provider
             service.is_active = True
             service.is_verified = False
-            service.save()
 
-            if not provider.profile_completed:
-                provider.profile_completed = True
-                provider.save()
+            with transaction.atomic():
+                service.save()
 
-            # ===== GET ADMIN EMAIL =====
-            admins = User.objects.filter(is_superuser=True)
-            admin_emails = [admin.email for admin in admins if admin.email]
+                if not provider.profile_completed:
+                    provider.profile_completed = True
+                    provider.save(update_fields=['profile_completed'])
 
-            # ===== SEND EMAIL =====
-            if admin_emails:
-                try:
-                    send_mail(
+                # ===== GET ADMIN EMAIL =====
+                admins = User.objects.filter(is_superuser=True)
+                admin_emails = [admin.email for admin in admins if admin.email]
+
+                # ===== QUEUE EMAIL =====
+                if admin_emails:
+                    send_notification_email(
                         "New Service Needs Verification",
                         f"""
 Hello Admin,
@@ -259,12 +279,8 @@ Provider: {provider.company_name}
 Please log in to the admin panel to verify it.
 
 """,
-                        settings.DEFAULT_FROM_EMAIL,
-                        admin_emails,
-                        fail_silently=True
+                        admin_emails
                     )
-                except Exception as e:
-                    print("Email error:", e)
 
             messages.success(request, f"{service.title} has been added successfully and is awaiting admin verification.")
             return redirect('manage_services')
@@ -305,7 +321,9 @@ def edit_service(request, service_id):
 @login_required
 def manage_services(request):
 
-    provider = ServiceProvider.objects.get(user=request.user)
+    provider = request.provider
+    if not provider:
+        raise Http404("No provider profile.")
 
     services = Service.objects.filter(provider=provider)
 
@@ -343,52 +361,27 @@ def user_dashboard(request):
     requests_qs = ServiceRequest.objects.filter(user=request.user)
 
     # =============================
-    # REQUEST STATS
+    # REQUEST STATS & MONTHLY TREND
     # =============================
-    total_requests = requests_qs.count()
-    pending_requests = requests_qs.filter(status='pending').count()
-    accepted_requests = requests_qs.filter(status='accepted').count()
-    completed_requests = requests_qs.filter(status='completed').count()
-    rejected_requests = requests_qs.filter(status='rejected').count()
+    stats = cached_dashboard(
+        'user', request.user.pk,
+        lambda: request_stats(requests_qs, months=DASHBOARD_MONTHS)
+    )
 
     # =============================
     # RECENT REQUESTS
     # =============================
-    recent_requests = requests_qs.order_by('-created_at')[:5]
-
-    # =============================
-    # MONTHLY REQUEST TREND
-    # =============================
-    from datetime import date
-    from dateutil.relativedelta import relativedelta
-    import json
-
-    today = date.today()
-    months = []
-    monthly_requests = []
-
-    for i in range(5, -1, -1):
-        month_start = today.replace(day=1) - relativedelta(months=i)
-        month_end = month_start + relativedelta(months=1)
-
-        months.append(month_start.strftime("%b %Y"))
-
-        count = requests_qs.filter(
-            created_at__gte=month_start,
-            created_at__lt=month_end
-        ).count()
-
-        monthly_requests.append(count)
+    recent_requests = requests_qs.select_related('service').order_by('-created_at')[:5]
 
     context = {
-        'total_requests': total_requests,
-        'pending_requests': pending_requests,
-        'accepted_requests': accepted_requests,
-        'completed_requests': completed_requests,
-        'rejected_requests': rejected_requests,
+        'total_requests': stats['total_requests'],
+        'pending_requests': stats['pending_requests'],
+        'accepted_requests': stats['accepted_requests'],
+        'completed_requests': stats['completed_requests'],
+        'rejected_requests': stats['rejected_requests'],
         'recent_requests': recent_requests,
-        'months': json.dumps(months),
-        'monthly_requests': json.dumps(monthly_requests),
+        'months': json.dumps(stats['months']),
+        'monthly_requests': json.dumps(stats['monthly_requests']),
     }
 
     return render(request, 'Match/user_dashboard.html', context)
@@ -398,7 +391,7 @@ def provider_dashboard(request):
     if request.user.role != 'company':
         return redirect('login')
 
-    provider = ServiceProvider.objects.filter(user=request.user).first()
+    provider = request.provider
 
     if not provider or not provider.profile_completed:
         messages.info(request, "Complete your business profile to access the dashboard.")
@@ -408,66 +401,45 @@ def provider_dashboard(request):
     requests_qs = ServiceRequest.objects.filter(service__provider=provider)
 
     # =============================
-    # REQUEST STATS
+    # REQUEST STATS & MONTHLY TREND
     # =============================
-    total_requests = requests_qs.count()
-    completed_requests = requests_qs.filter(status='completed').count()
-    pending_requests = requests_qs.filter(status='pending').count()
-    accepted_requests = requests_qs.filter(status='accepted').count()
-    rejected_requests = requests_qs.filter(status='rejected').count()
-
-    completion_rate = round((completed_requests / total_requests) * 100, 1) if total_requests else 0
+    # Stats and rating are cached per provider until a request or review changes
+    stats = cached_dashboard(
+        'provider', provider.pk,
+        lambda: dict(
+            request_stats(requests_qs, months=DASHBOARD_MONTHS),
+            avg_rating=provider.rating_average
+        )
+    )
 
-    latest_requests = requests_qs.order_by('-created_at')[:4]  # 4 latest for dashboard
+    latest_requests = requests_qs.select_related('service').order_by('-created_at')[:4]  # 4 latest for dashboard
 
     # =============================
     # RATINGS
     # =============================
-    avg_rating = provider.reviews.aggregate(avg=Avg('rating'))['avg']
-    avg_rating = round(avg_rating, 1) if avg_rating is not None else None
+    avg_rating = stats['avg_rating']
 
-    recent_reviews = provider.reviews.order_by('-created_at')[:5]
-
-    # =============================
-    # MONTHLY TREND (Last 6 Months)
-    # =============================
-    from datetime import date
-    from dateutil.relativedelta import relativedelta
-
-    today = date.today()
-    months = []
-    monthly_requests = []
-
-    for i in range(5, -1, -1):  # last 6 months
-        month_start = today.replace(day=1) - relativedelta(months=i)
-        month_end = month_start + relativedelta(months=1)
-        month_label = month_start.strftime("%b %Y")
-        months.append(month_label)
-        count = requests_qs.filter(
-            created_at__gte=month_start,
-            created_at__lt=month_end
-        ).count()
-        monthly_requests.append(count)
+    recent_reviews = provider.reviews.select_related('user').order_by('-created_at')[:5]
 
     context = {
         'provider': provider,
         'latest_requests': latest_requests,
 
         # Stats
-        'total_requests': total_requests,
-        'completed_requests': completed_requests,
-        'pending_requests': pending_requests,
-        'accepted_requests': accepted_requests,
-        'rejected_requests': rejected_requests,
-        'completion_rate': completion_rate,
+        'total_requests': stats['total_requests'],
+        'completed_requests': stats['completed_requests'],
+        'pending_requests': stats['pending_requests'],
+        'accepted_requests': stats['accepted_requests'],
+        'rejected_requests': stats['rejected_requests'],
+        'completion_rate': stats['completion_rate'],
 
         # Ratings
         'avg_rating': avg_rating,
         'recent_reviews': recent_reviews,
 
         # Chart
-        'months': json.dumps(months),
-        'monthly_requests': json.dumps(monthly_requests),
+        'months': json.dumps(stats['months']),
+        'monthly_requests': json.dumps(stats['monthly_requests']),
     }
 
     return render(request, 'Match/dashboard.html', context)
@@ -479,54 +451,33 @@ def search_services(request):
     query = request.GET.get('q')
     user_lat = request.GET.get("lat")
     user_lon = request.GET.get("lon")
+    # "radius" is the older name for max_distance
+    max_distance = request.GET.get("max_distance") or request.GET.get("radius")
 
-    # Only fetch active services
-    services = Service.objects.filter(is_active=True, is_verified=True)
-
-    # Optional: filter only providers with completed profiles
-    # services = services.filter(provider__profile_completed=True)
-
-    # Search filter
-    if query:
-        services = services.filter(title__icontains=query)
-
-    results = []
-
-    for service in services:
-        provider = service.provider
-        distance = None
-
-        try:
-            if user_lat and user_lon and provider.latitude and provider.longitude:
-                distance = haversine_distance(
-                    float(user_lat),
-                    float(user_lon),
-                    float(provider.latitude),
-                    float(provider.longitude)
-                )
-        except ValueError:
-            distance = None
+    # Off-globe or non-finite input means no origin or no radius
+    origin = parse_origin(user_lat, user_lon)
+    max_distance = parse_radius(max_distance)
 
-        results.append({
-            "service": service,
-            "distance": round(distance, 2) if distance else None
-        })
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    page_size = page_size_from(request.GET.get('page_size'), SEARCH_PAGE_SIZE)
 
-    # Sort by distance if available
-    results = sorted(
-        results,
-        key=lambda x: x["distance"] if x["distance"] is not None else 9999
-    )
+    # Active, verified services: best text matches first, within
+    # max_distance nearest first, or nearest first; only the requested
+    # page's rows are loaded (candidates cached per query and tile)
+    results = search_page(query, origin, max_distance, page, page_size)
 
     context = {
-        "services": results,
-        "query": query
+        "services": results.results,
+        "page": results,
+        "query": query,
+        "max_distance": max_distance,
     }
 
     return render(request, "Match/service_results.html", context)
 
-from .utils import send_notification_email
-
 @login_required
 def create_request(request, service_id):
     service = get_object_or_404(Service, id=service_id)
@@ -537,19 +488,20 @@ def create_request(request, service_id):
         latitude = request.POST.get('latitude')
         longitude = request.POST.get('longitude')
 
-        service_request = ServiceRequest.objects.create(
-            user=request.user,
-            service=service,
-            location=location,
-            description=description,
-            latitude=Decimal(latitude) if latitude else None,
-            longitude=Decimal(longitude) if longitude else None
-        )
+        with transaction.atomic():
+            service_request = ServiceRequest.objects.create(
+                user=request.user,
+                service=service,
+                location=location,
+                description=description,
+                latitude=Decimal(latitude) if latitude else None,
+                longitude=Decimal(longitude) if longitude else None
+            )
 
-        # Send email to service provider
-        provider_email = service.provider.user.email
-        subject = f"New Service Request for {service.title}"
-        message = f"""
+            # Email to service provider
+            provider_email = service.provider.user.email
+            subject = f"New Service Request for {service.title}"
+            message = f"""
 Hi {service.provider.user.username},
 
 You have received a new request for your service "{service.title}" from {request.user.username}.
@@ -562,7 +514,7 @@ Please log in to your dashboard to accept or reject this request.
 Thanks,
 Your Service Platform
 """
-        send_notification_email(subject, message, provider_email)
+            send_notification_email(subject, message, provider_email)
 
         messages.success(request, "Request created successfully!")
         return redirect('user_dashboard')
@@ -581,7 +533,7 @@ def profile_view(request):
     # =========================
     if user.role == "company":
 
-        provider, created = ServiceProvider.objects.get_or_create(user=user)
+        provider = request.provider or ServiceProvider.objects.get_or_create(user=user)[0]
 
         if request.method == "POST":
             provider_form = ServiceProviderUpdateForm(request.POST, instance=provider)
@@ -617,46 +569,228 @@ def profile_view(request):
 
     return render(request, "Match/profile.html", context)
 
+STATUS_FILTERS = ['pending', 'accepted', 'completed', 'rejected']
+
+
+def _provider_requests_qs(request, provider):
+    # All requests for this provider, optionally filtered by status
+    requests_qs = ServiceRequest.objects.select_related(
+        'service', 'user', 'review'
+    ).filter(service__provider=provider)
+
+    status_filter = request.GET.get('status')
+    if status_filter in STATUS_FILTERS:
+        requests_qs = requests_qs.filter(status=status_filter)
+
+    return requests_qs, status_filter
+
+
+def _my_requests_qs(request):
+    requests_qs = ServiceRequest.objects.select_related(
+        'service', 'service__provider', 'review'
+    ).filter(user=request.user)
+
+    status_filter = request.GET.get('status')
+    if status_filter in STATUS_FILTERS:
+        requests_qs = requests_qs.filter(status=status_filter)
+
+    return requests_qs, status_filter
+
+
+def _request_row(service_request):
+    review = getattr(service_request, 'review', None)
+    return {
+        'id': service_request.id,
+        'service': service_request.service.title,
+        'client': service_request.user.username,
+        'status': service_request.status,
+        'location': service_request.location,
+        'latitude': service_request.latitude,
+        'longitude': service_request.longitude,
+        'created_at': service_request.created_at.isoformat(),
+        'rating': review.rating if review else None,
+    }
+
+
 @login_required
 def provider_requests(request):
     """
-    Dedicated page showing all requests made to the provider's services.
+    Dedicated page showing requests made to the provider's services,
+    newest first, one keyset page at a time.
     Allows filtering by status and viewing details including reviews.
     """
     if request.user.role != 'company':
         return redirect('login')
 
-    provider = get_object_or_404(ServiceProvider, user=request.user)
+    provider = request.provider
+    if not provider:
+        raise Http404("No provider profile.")
 
-    # Base queryset: all requests for this provider
-    requests_qs = ServiceRequest.objects.filter(service__provider=provider).order_by('-created_at')
-
-    # Optional filter by status
-    status_filter = request.GET.get('status')
-    if status_filter in ['pending', 'accepted', 'completed', 'rejected']:
-        requests_qs = requests_qs.filter(status=status_filter)
+    requests_qs, status_filter = _provider_requests_qs(request, provider)
+    page, next_cursor = keyset_page(requests_qs, request.GET.get('cursor'))
 
     context = {
         'provider': provider,
-        'service_requests': requests_qs,
+        'service_requests': page,
         'status_filter': status_filter,
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('cursor'),
     }
 
     return render(request, 'Match/provider_requests.html', context)
 
+
+@login_required
+def provider_requests_feed(request):
+    """
+    JSON version of provider_requests for infinite scrolling.
+    """
+    if request.user.role != 'company':
+        return JsonResponse({'error': 'Providers only.'}, status=403)
+
+    provider = request.provider
+    if not provider:
+        raise Http404("No provider profile.")
+
+    requests_qs, _ = _provider_requests_qs(request, provider)
+    page, next_cursor = keyset_page(
+        requests_qs, request.GET.get('cursor'), page_size_from(request.GET.get('page_size'))
+    )
+
+    return JsonResponse({
+        'results': [_request_row(service_request) for service_request in page],
+        'next_cursor': next_cursor,
+    })
+
+
+def _nearby_page(request, provider):
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    return nearby_page(
+        provider,
+        radius_km=clamp_radius(request.GET.get('radius')),
+        sort=request.GET.get('sort', 'distance'),
+        page=page,
+        page_size=page_size_from(request.GET.get('page_size'), NEARBY_PAGE_SIZE),
+    )
+
+
+@login_required
+def nearby_requests(request):
+    """
+    Pending requests near the provider's pin in the provider's
+    categories, from any client, nearest or newest first.
+    """
+    if request.user.role != 'company':
+        return redirect('login')
+
+    provider = request.provider
+    if not provider:
+        raise Http404("No provider profile.")
+
+    return render(request, 'Match/nearby_requests.html', {
+        'provider': provider,
+        'page': _nearby_page(request, provider),
+        'radius_choices': NEARBY_RADIUS_CHOICES,
+    })
+
+
+@login_required
+def nearby_requests_feed(request):
+    """
+    JSON version of nearby_requests.
+    """
+    if request.user.role != 'company':
+        return JsonResponse({'error': 'Providers only.'}, status=403)
+
+    provider = request.provider
+    if not provider:
+        raise Http404("No provider profile.")
+
+    page = _nearby_page(request, provider)
+    return JsonResponse({
+        'results': [
+            {
+                'id': row.id,
+                'service': row.service_title,
+                'category': row.category_name,
+                'location': row.location,
+                'latitude': float(row.latitude),
+                'longitude': float(row.longitude),
+                'distance_km': round(row.distance, 3),
+                'created_at': row.created_at.isoformat(),
+            }
+            for row in page.results
+        ],
+        'page': page.page,
+        'next_page': page.page + 1 if page.has_next else None,
+        'radius_km': page.radius_km,
+        'sort': page.sort,
+    })
+
+
+
+def _map_etag(request):
+    try:
+        return Viewport(request.GET.get('bbox'), request.GET.get('zoom')).etag()
+    except ValueError:
+        return None
+
+
+@login_required
+@gzip_page
+@condition(etag_func=_map_etag)
+def provider_map(request):
+    """
+    Provider markers for a map viewport (?bbox=west,south,east,north&zoom=),
+    clustered on a grid. Unchanged tiles answer 304 from the ETag alone.
+    """
+    try:
+        viewport = Viewport(request.GET.get('bbox'), request.GET.get('zoom'))
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    return JsonResponse(viewport_clusters(viewport))
+
 @login_required
 def my_requests(request):
     if request.user.role == 'company':
         return redirect('provider_dashboard')
 
-    requests_qs = ServiceRequest.objects.select_related(
-        'service', 'service__provider'
-    ).filter(user=request.user).order_by('-created_at')
+    requests_qs, status_filter = _my_requests_qs(request)
+    page, next_cursor = keyset_page(requests_qs, request.GET.get('cursor'))
 
     return render(request, 'Match/my_requests.html', {
-        'requests': requests_qs
+        'requests': page,
+        'status_filter': status_filter,
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('cursor'),
     })
 
+
+@login_required
+def my_requests_feed(request):
+    """
+    JSON version of my_requests for infinite scrolling.
+    """
+    if request.user.role == 'company':
+        return JsonResponse({'error': 'Service seekers only.'}, status=403)
+
+    requests_qs, _ = _my_requests_qs(request)
+    page, next_cursor = keyset_page(
+        requests_qs, request.GET.get('cursor'), page_size_from(request.GET.get('page_size'))
+    )
+
+    results = []
+    for service_request in page:
+        row = _request_row(service_request)
+        row['provider'] = service_request.service.provider.company_name
+        results.append(row)
+
+    return JsonResponse({'results': results, 'next_cursor': next_cursor})
+
 @login_required
 def accept_request(request, request_id):
     if request.user.role != 'company':
@@ -666,8 +800,6 @@ def accept_request(request, request_id):
 
     if service_request.status == 'pending':
         service_request.status = 'accepted'
-        service_request.save()
-        messages.success(request, f"Request for {service_request.service.title} has been accepted.")
 
         # ===== EMAIL TO CUSTOMER =====
         customer_email = service_request.user.email
@@ -682,18 +814,13 @@ Please log in to your dashboard for details.
 Thanks,
 Your Service Platform
 """
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL, 
-            [customer_email],
-            fail_silently=False
-        )
+        with transaction.atomic():
+            service_request.save()
+            send_notification_email(subject, message, customer_email)
 
-    return redirect('provider_requests')
+        messages.success(request, f"Request for {service_request.service.title} has been accepted.")
 
-from django.core.mail import send_mail, BadHeaderError
-import logging
+    return redirect('provider_requests')
 
 @login_required
 def complete_request(request, request_id):
@@ -704,23 +831,19 @@ def complete_request(request, request_id):
 
     if service_request.status != 'completed':
         service_request.status = 'completed'
-        service_request.save()
-        messages.success(request, f"Service '{service_request.service.title}' marked as completed.")
 
         # Email notification
-        try:
-            send_mail(
+        with transaction.atomic():
+            service_request.save()
+            send_notification_email(
                 f"Your service '{service_request.service.title}' is completed",
                 f"Hi {service_request.user.username},\n\n"
                 f"The service you requested from {service_request.service.provider.company_name} has been marked as completed.\n"
                 "Please log in to provide a review.\n\nThanks,\nYour Service Platform",
-                settings.DEFAULT_FROM_EMAIL,
-                [service_request.user.email],
-                fail_silently=False
+                service_request.user.email
             )
-        except Exception as e:
-            logging.error(f"Failed to send email: {e}")
-            messages.warning(request, "Service marked as complete, but email notification failed.")
+
+        messages.success(request, f"Service '{service_request.service.title}' marked as completed.")
 
     return redirect('provider_requests')
 
@@ -761,10 +884,85 @@ def submit_review(request, request_id):
             review.service_request = service_request
             review.provider = service_request.service.provider
             review.user = request.user
-            review.save()
+            with transaction.atomic():
+                review.save()  # Also updates the provider's rating aggregates
             messages.success(request, "Thank you for your review!")
             return redirect('user_dashboard')
     else:
         form = ReviewForm()
 
-    return render(request, 'Match/rating.html', {'form': form, 'service_request': service_request})
\ No newline at end of file
+    return render(request, 'Match/rating.html', {'form': form, 'service_request': service_request})
+
+# =========================
+# METRICS
+# =========================
+@staff_member_required
+def metrics_view(request):
+    search = search_cache_stats()
+    counters = {
+        'match_search_cache_hits_total': ("Search result cache hits.", search['hits']),
+        'match_search_cache_misses_total': ("Search result cache misses.", search['misses']),
+    }
+    return HttpResponse(render_prometheus(counters), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# =========================
+# PROFILING
+# =========================
+PROFILE_FILES = {'pstats': '.pstats', 'collapsed': '.collapsed'}
+PROFILE_SORTS = ('cumulative', 'tottime', 'ncalls')
+
+
+@staff_member_required
+def profiles_view(request):
+    if request.method == 'POST':
+        views = [v.strip() for v in request.POST.get('views', '').split(',') if v.strip()]
+        usernames = [u.strip() for u in request.POST.get('users', '').split(',') if u.strip()]
+        users = list(User.objects.filter(username__in=usernames).values_list('id', flat=True))
+        try:
+            rate = min(max(float(request.POST.get('rate') or 0), 0.0), 1.0)
+        except ValueError:
+            rate = 0.0
+
+        profiling.set_toggles(views=views, users=users, rate=rate)
+        messages.success(request, "Profiling toggles updated.")
+        return redirect('profiles')
+
+    toggles = profiling.get_toggles()
+    usernames = User.objects.filter(id__in=toggles['users']).values_list('username', flat=True)
+
+    return render(request, 'Match/profiles.html', {
+        'title': "Request profiles",
+        'profiles': profiling.recent_profiles(),
+        'toggles': toggles,
+        'toggle_views': ', '.join(toggles['views']),
+        'toggle_users': ', '.join(usernames),
+        'toggle_timeout_minutes': profiling.PROFILE_TOGGLE_TIMEOUT // 60,
+    })
+
+
+@staff_member_required
+def profile_detail(request, name):
+    sort = request.GET.get('sort')
+    if sort not in PROFILE_SORTS:
+        sort = PROFILE_SORTS[0]
+
+    report = profiling.top_functions(name, sort=sort)
+    if report is None:
+        raise Http404("No such profile.")
+
+    return render(request, 'Match/profile_detail.html', {
+        'title': f"Profile {name}",
+        'name': name,
+        'report': report,
+        'sort': sort,
+        'sorts': PROFILE_SORTS,
+    })
+
+
+@staff_member_required
+def profile_download(request, name, kind):
+    path = profiling.profile_path(name, PROFILE_FILES[kind]) if kind in PROFILE_FILES else None
+    if path is None:
+        raise Http404("No such profile.")
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name)
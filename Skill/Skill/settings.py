@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -41,12 +44,25 @@ INSTALLED_APPS = [
 ]
 
 AUTH_USER_MODEL = 'Match.User'
+
+# Session users are served from a shared cache (see Match.identity);
+# ModelBackend stays listed so sessions started under it remain valid
+AUTHENTICATION_BACKENDS = [
+    'Match.identity.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 MIDDLEWARE = [
+    'Match.middleware.MetricsMiddleware',
+    'Match.middleware.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'Match.middleware.SlidingSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'Match.middleware.ProviderMiddleware',
+    'Match.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -81,6 +97,64 @@ DATABASES = {
     }
 }
 
+# Production SQLite profile, on with DB_PROFILE=production. WAL lets readers
+# run alongside the single writer. synchronous=NORMAL only fsyncs at
+# checkpoints, which is safe under WAL. busy_timeout makes writers wait
+# for the lock instead of failing. IMMEDIATE transactions take the write
+# lock up front, so a read-then-write transaction cannot fail halfway
+# with "database is locked".
+SQLITE_PRODUCTION_OPTIONS = {
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        'PRAGMA busy_timeout=5000;'
+        'PRAGMA cache_size=-20000;'
+        'PRAGMA mmap_size=134217728;'
+        'PRAGMA temp_store=MEMORY;'
+    ),
+    'transaction_mode': 'IMMEDIATE',
+}
+
+if os.environ.get('DB_PROFILE') == 'production':
+    DATABASES['default'].update({
+        'OPTIONS': SQLITE_PRODUCTION_OPTIONS,
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+    })
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+#
+# Local memory by default. Set CACHE_BACKEND=file to share cached
+# dashboards between worker processes on one host.
+
+if os.environ.get('CACHE_BACKEND') == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', str(BASE_DIR / 'cache')),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'skill-default',
+        }
+    }
+
+# Seconds a cached dashboard lives; writes invalidate it earlier
+DASHBOARD_CACHE_TIMEOUT = 300
+
+# Statements slower than this many ms go to the slow-query log (see Match.slowlog)
+SLOW_QUERY_MS = 100
+SLOW_QUERY_LOG = BASE_DIR / 'logs' / 'slow_queries.jsonl'
+
+# Request profiles (see Match.profiling); staff switch profiling on at /profiles/
+PROFILE_DIR = BASE_DIR / 'profiles'
+PROFILE_SAMPLE_RATE = 0.0
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -131,10 +205,29 @@ TEMPLATES[0]['DIRS'] = [BASE_DIR / 'templates']
 # Auto logout after 30 minutes of inactivity
 SESSION_COOKIE_AGE = 1800   # 30 minutes in seconds
 
-# Reset session timer every time the user makes a request
-SESSION_SAVE_EVERY_REQUEST = True
-
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Sliding 30-minute timeout without a session write on every request:
+# Match.middleware.SlidingSessionMiddleware re-saves the session once
+# SESSION_REFRESH_FRACTION of its lifetime has passed.
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_REFRESH_FRACTION = 0.1
+
+# Session store: db (default), cached_db, cache or signed_cookies.
+# cache needs a cache shared by every worker (CACHE_BACKEND=file).
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'db')
+if SESSION_BACKEND not in SESSION_ENGINES:
+    raise ImproperlyConfigured(
+        f"SESSION_BACKEND={SESSION_BACKEND!r}; expected one of {', '.join(SESSION_ENGINES)}."
+    )
+SESSION_ENGINE = SESSION_ENGINES[SESSION_BACKEND]
+
+# SMTP with connections pooled and reused across messages (see Match.mail)
+EMAIL_BACKEND = 'Match.mail.PooledEmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True